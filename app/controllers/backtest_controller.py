@@ -6,10 +6,12 @@ from flask import Blueprint, request, jsonify, send_file, make_response
 from app.services.backtest_service import BacktestService
 from app.services.dca_service import DCAService
 from app.services.export_service import ExportService
-from app.services.backtest_service_enhanced import EnhancedBacktestService
+from app.services.backtest_service_enhanced import EnhancedBacktestService, DEFAULT_BUY_CONDITIONS
 from app.dao.backtest_dao import BacktestDAO
 from app.dao.portfolio_dao import PortfolioDAO
 from app.dao.stock_data_dao import StockDataDAO
+from app.utils.downsample import downsample_records, resolve_max_points, without_full_series
+from app.core.config import settings
 import json
 
 
@@ -23,6 +25,21 @@ portfolio_dao = PortfolioDAO()
 stock_dao = StockDataDAO()
 
 
+def _save_result(result: dict) -> dict:
+    """
+    持久化已完成的回测结果（含完整时间序列），保存失败不影响本次响应
+    
+    Returns:
+        去掉完整时间序列后用于响应的结果
+    """
+    if result.get('status') == 'completed':
+        try:
+            backtest_dao.save_backtest(result)
+        except Exception as e:
+            print(f"Warning: Failed to save backtest {result.get('backtest_id') or result.get('dca_id')}: {e}")
+    return without_full_series(result)
+
+
 @backtest_bp.route('/api/backtest/run', methods=['POST'])
 def run_backtest():
     """执行基础回测"""
@@ -36,9 +53,8 @@ def run_backtest():
         # 执行回测
         result = backtest_service.run_backtest(data)
         
-        # 保存回测结果（简化处理，暂不保存到数据库）
-        # if result['status'] == 'completed':
-        #     backtest_dao.save_backtest_result(result)
+        # 保存回测结果
+        result = _save_result(result)
         
         return jsonify(result), 200
         
@@ -59,9 +75,8 @@ def run_periodic_dca():
         # 执行定投回测
         result = dca_service.run_periodic_dca(data)
         
-        # 保存结果（暂时注释）
-        # if result['status'] == 'completed':
-        #     backtest_dao.save_backtest(result)
+        # 保存结果
+        result = _save_result(result)
         
         return jsonify(result), 200
         
@@ -82,9 +97,8 @@ def run_conditional_dca():
         # 执行条件定投回测
         result = dca_service.run_conditional_dca(data)
         
-        # 保存结果（暂时注释）
-        # if result['status'] == 'completed':
-        #     backtest_dao.save_backtest(result)
+        # 保存结果
+        result = _save_result(result)
         
         return jsonify(result), 200
         
@@ -92,17 +106,67 @@ def run_conditional_dca():
         return jsonify({'error': str(e)}), 500
 
 
+@backtest_bp.route('/api/backtest/cache/stats', methods=['GET'])
+def get_result_cache_stats():
+    """获取回测结果缓存的命中统计"""
+    try:
+        return jsonify(backtest_service.result_cache.stats()), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @backtest_bp.route('/api/backtest/<backtest_id>', methods=['GET'])
 def get_backtest(backtest_id):
     """获取回测结果"""
     try:
+        max_points = resolve_max_points(
+            {'max_points': request.args.get('max_points', settings.chart_max_points, type=int)},
+            settings.chart_max_points
+        )
         result = backtest_dao.get_backtest(backtest_id)
         
         if not result:
             return jsonify({'error': 'Backtest not found'}), 404
         
+        # 保存的是完整时间序列，返回时按 max_points 降采样（完整数据见 /timeseries 接口）
+        for series_key in ('time_series', 'portfolio_values'):
+            if result.get(series_key):
+                result[series_key] = downsample_records(result[series_key], max_points)
+        
         return jsonify(result), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@backtest_bp.route('/api/backtest/<backtest_id>/timeseries', methods=['GET'])
+def get_backtest_time_series(backtest_id):
+    """按日期区间与字段获取回测时间序列"""
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        columns = request.args.get('columns')
+        columns = [column.strip() for column in columns.split(',') if column.strip()] if columns else None
+        
+        if not backtest_dao.backtest_exists(backtest_id):
+            return jsonify({'error': 'Backtest not found'}), 404
+        
+        time_series = backtest_dao.get_time_series(backtest_id, start_date, end_date, columns)
+        
+        return jsonify({
+            'backtest_id': backtest_id,
+            'start_date': start_date,
+            'end_date': end_date,
+            'time_series': time_series,
+            'count': len(time_series)
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -111,18 +175,21 @@ def get_backtest(backtest_id):
 def get_backtest_history():
     """获取回测历史记录"""
     try:
-        limit = request.args.get('limit', 10, type=int)
-        offset = request.args.get('offset', 0, type=int)
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+        cursor = request.args.get('cursor')
         
-        results = backtest_dao.get_backtest_history(limit, offset)
+        results, next_cursor = backtest_dao.get_backtest_history(limit, cursor)
         
         return jsonify({
             'results': results,
             'limit': limit,
-            'offset': offset,
+            'cursor': cursor,
+            'next_cursor': next_cursor,
             'total': len(results)
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -219,18 +286,14 @@ def run_enhanced_backtest():
         
         # 设置默认买入条件
         if 'buy_conditions' not in data:
-            data['buy_conditions'] = {
-                'daily_drop_threshold': -0.05,  # 日跌幅5%
-                'drawdown_threshold': -0.10,    # 回撤10%
-                'vix_threshold': 30,             # VIX > 30
-                'rsi_oversold': 30,              # RSI < 30
-                'enable_macd': True,             # 启用MACD金叉
-                'enable_support': True           # 启用支撑位
-            }
+            data['buy_conditions'] = dict(DEFAULT_BUY_CONDITIONS)
         
         # 执行增强版回测
         result = enhanced_backtest_service.run_backtest_with_transactions(data)
         
+        # 保存结果
+        result = _save_result(result)
+        
         return jsonify(result), 200
         
     except Exception as e:
@@ -0,0 +1,101 @@
+"""
+任务控制器
+异步回测任务的提交、状态查询、结果获取与取消
+"""
+from flask import Blueprint, request, jsonify
+from app.services.job_service import get_job_manager, JobQueueFullError, JOB_COMPLETED, FINISHED_STATES
+from app.services.backtest_service_enhanced import DEFAULT_BUY_CONDITIONS
+
+
+job_bp = Blueprint('job', __name__)
+
+
+@job_bp.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    提交回测任务
+    
+    请求体: {'type': 'backtest' | 'enhanced_backtest' | 'dca_periodic' | 'dca_conditional', 'config': {...}}
+    """
+    try:
+        data = request.json
+        
+        # 验证请求数据
+        if not data or not data.get('config'):
+            return jsonify({'error': 'No data provided'}), 400
+        
+        job_type = data.get('type')
+        config = data['config']
+        
+        # 设置默认买入条件
+        if job_type == 'enhanced_backtest' and 'buy_conditions' not in config:
+            config['buy_conditions'] = dict(DEFAULT_BUY_CONDITIONS)
+        
+        job_id = get_job_manager().submit(job_type, config)
+        
+        return jsonify(get_job_manager().get(job_id)), 202
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except JobQueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@job_bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """获取任务状态与进度"""
+    try:
+        job = get_job_manager().get(job_id)
+        
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify(job), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@job_bp.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """获取任务结果，未结束时返回202及当前状态"""
+    try:
+        manager = get_job_manager()
+        job = manager.get(job_id)
+        
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        if job['status'] not in FINISHED_STATES:
+            return jsonify(job), 202
+        
+        result = manager.result(job_id)
+        if job['status'] != JOB_COMPLETED and result is None:
+            return jsonify(job), 200
+        
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@job_bp.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """取消任务"""
+    try:
+        manager = get_job_manager()
+        
+        if not manager.get(job_id):
+            return jsonify({'error': 'Job not found'}), 404
+        
+        cancelled = manager.cancel(job_id)
+        
+        return jsonify({
+            'cancelled': cancelled,
+            'job': manager.get(job_id)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
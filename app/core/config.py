@@ -31,7 +31,12 @@ class Settings(BaseSettings):
     # 数据源配置
     yfinance_timeout: int = 10
     yfinance_retry_count: int = 3
+    yfinance_retry_backoff: float = 0.5
+    yfinance_retry_max_backoff: float = 8.0
+    yfinance_max_workers: int = 8
     yfinance_cache_ttl: int = 3600
+    stock_cache_dir: str = "data/cache"
+    trading_calendar_dir: str = "data/calendar"  # 不放在 stock_cache_dir 下，清理行情缓存时保留
     
     # OpenAI配置
     openai_api_key: Optional[str] = None
@@ -41,11 +46,20 @@ class Settings(BaseSettings):
     max_backtest_years: int = 5
     min_initial_amount: float = 1000.0
     max_initial_amount: float = 1000000.0
+    price_fill_policy: str = "ffill"  # 估值时缺失价格的填充策略：none / ffill / ffill_bfill
     
     # 性能配置
     calculation_timeout: int = 30
     cache_enabled: bool = True
     cache_ttl: int = 1800
+    result_cache_max_entries: int = 256
+    backtest_hot_cache_size: int = 128
+    chart_max_points: int = 500  # 接口返回时间序列的默认最大点数，0表示不降采样
+    indicator_cache_max_bytes: int = 64 * 1024 * 1024
+    job_workers: int = 2
+    job_queue_limit: int = 100
+    job_retention: int = 200
+    job_start_method: str = "spawn"
     
     # 日志配置
     log_level: str = "INFO"
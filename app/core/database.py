@@ -1,7 +1,7 @@
 """
 数据库配置和连接管理
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -37,10 +37,67 @@ def get_db():
         db.close()
 
 
-def init_db():
-    """初始化数据库，创建所有表"""
+def init_db(bind=None):
+    """初始化数据库：升级已有表的结构，创建缺失的表"""
     from app.models import portfolio, backtest  # 导入所有模型
-    Base.metadata.create_all(bind=engine)
+    bind = bind or engine
+    upgrade_schema(bind)
+    Base.metadata.create_all(bind=bind)
+
+
+def upgrade_schema(bind=None):
+    """
+    将已存在的表升级到当前模型的结构（create_all 只创建缺失的表）
+
+    补齐模型新增的列与索引；模型中改为可空的列放宽 NOT NULL 约束，
+    SQLite 不支持修改列约束，按新结构重建表并复制数据。不删除或修改其他列。
+    """
+    bind = bind or engine
+    existing = set(inspect(bind).get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name in existing:
+            _upgrade_table(bind, table)
+
+
+def _upgrade_table(bind, table):
+    inspector = inspect(bind)
+    db_columns = {column['name']: column for column in inspector.get_columns(table.name)}
+    quote = bind.dialect.identifier_preparer.quote
+    relaxed = [column for column in table.columns
+               if column.nullable and column.name in db_columns and not db_columns[column.name]['nullable']]
+
+    with bind.begin() as conn:
+        for column in table.columns:
+            if column.name not in db_columns:
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+
+        if relaxed and bind.dialect.name == 'sqlite':
+            _rebuild_sqlite_table(conn, table, [index['name'] for index in inspector.get_indexes(table.name)])
+        else:
+            for column in relaxed:
+                conn.execute(text(f"ALTER TABLE {quote(table.name)} ALTER COLUMN {quote(column.name)} DROP NOT NULL"))
+
+    for index in table.indexes:
+        index.create(bind, checkfirst=True)
+
+
+def _rebuild_sqlite_table(conn, table, index_names):
+    """按模型重建 SQLite 表：旧表改名后新建表、复制数据、删除旧表"""
+    quote = conn.dialect.identifier_preparer.quote
+    legacy = f"{table.name}_legacy"
+    columns = ', '.join(quote(column.name) for column in table.columns)
+
+    # 索引随旧表改名后仍占用原名，先删除，新表建表时重新创建
+    for name in index_names:
+        conn.execute(text(f"DROP INDEX IF EXISTS {quote(name)}"))
+    # 改名时不改写其他表中指向本表的外键，新表建好后外键仍指向原表名
+    conn.execute(text("PRAGMA legacy_alter_table=ON"))
+    conn.execute(text(f"ALTER TABLE {quote(table.name)} RENAME TO {quote(legacy)}"))
+    table.create(conn)
+    conn.execute(text(f"INSERT INTO {quote(table.name)} ({columns}) SELECT {columns} FROM {quote(legacy)}"))
+    conn.execute(text(f"DROP TABLE {quote(legacy)}"))
+    conn.execute(text("PRAGMA legacy_alter_table=OFF"))
 
 
 def drop_db():
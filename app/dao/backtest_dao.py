@@ -1,18 +1,122 @@
 """
 回测结果数据访问对象
 """
-from typing import Optional, List
-from sqlalchemy.orm import Session
-from app.models.backtest import BacktestResult, BacktestConfig
+import base64
+import json
+import pickle
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import or_, and_, insert
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.backtest import BacktestResult, BacktestConfig, BacktestTimeSeries, TIMESERIES_FIELDS
+from app.utils.downsample import FULL_SERIES_KEY, without_full_series
+
+
+# 回测结果中有独立列的字段
+_JSON_FIELDS = ('config_summary', 'performance_summary', 'risk_metrics',
+                'annual_returns', 'monthly_returns', 'drawdown_periods')
+
+# 不写入 details 的字段（已有独立列或单独处理），时间序列字段另见 _SERIES_KEYS
+_COLUMN_FIELDS = set(_JSON_FIELDS) | {
+    'backtest_id', 'portfolio_id', 'status', 'error', 'created_at',
+    'portfolio_composition', FULL_SERIES_KEY
+}
+
+# 结果中的每日时间序列字段：基础回测与定投为 time_series，增强回测为 portfolio_values
+_SERIES_KEYS = ('time_series', 'portfolio_values')
+
+
+def compress_json(value: Any) -> str:
+    """序列化为 zlib 压缩后 base64 编码的 JSON 字符串"""
+    raw = json.dumps(value, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.b64encode(zlib.compress(raw, 6)).decode('ascii')
+
+
+def decompress_json(value: Optional[str]) -> Any:
+    """compress_json 的逆操作"""
+    if value is None:
+        return None
+    return json.loads(zlib.decompress(base64.b64decode(value)).decode('utf-8'))
+
+
+def _timeseries_rows(backtest_id: str, time_series: List[Dict]) -> Optional[List[Dict]]:
+    """
+    将时间序列转换为 backtest_timeseries 表的行
+
+    Returns:
+        行列表；序列中有表外字段、日期缺失或重复时返回None（改为压缩存储以保留全部字段）
+    """
+    known = set(TIMESERIES_FIELDS)
+    known.add('date')
+    rows = []
+    dates = set()
+    for point in time_series:
+        date = point.get('date') if isinstance(point, dict) else None
+        if not isinstance(date, str) or date in dates or not known.issuperset(point):
+            return None
+        dates.add(date)
+        row = dict.fromkeys(TIMESERIES_FIELDS)
+        row.update(point)
+        row['backtest_id'] = backtest_id
+        rows.append(row)
+    return rows
+
+
+def _series_key(result: Dict) -> str:
+    """结果中每日时间序列所在的字段名"""
+    for key in _SERIES_KEYS:
+        if key in result:
+            return key
+    return _SERIES_KEYS[0]
+
+
+def _parse_datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if value:
+        return datetime.fromisoformat(str(value))
+    return datetime.utcnow()
 
 
 class BacktestDAO:
-    """回测数据访问对象"""
-    
-    def __init__(self, db: Optional[Session] = None):
+    """
+    回测数据访问对象
+
+    完整回测结果持久化到 backtest_results 表（其余明细压缩存储），每日时间序列写入 backtest_timeseries 表，
+    最近读写的结果以序列化形式保存在有界的 LRU 热缓存中，每次读取返回独立的副本。
+    """
+
+    def __init__(self, db: Optional[Session] = None, session_factory: Optional[sessionmaker] = None,
+                 hot_cache_size: Optional[int] = None):
+        """
+        Args:
+            db: 外部传入的会话，传入时所有操作使用该会话
+            session_factory: 会话工厂，未传入 db 时每次操作新建会话，默认 SessionLocal
+            hot_cache_size: 热缓存最多保存的结果数
+        """
         self.db = db
-        self.results_cache = {}  # 内存缓存
-    
+        self.session_factory = session_factory or SessionLocal
+        self.hot_cache_size = settings.backtest_hot_cache_size if hot_cache_size is None else hot_cache_size
+        self.results_cache: 'OrderedDict[str, bytes]' = OrderedDict()  # 热缓存（pickle 序列化的结果）
+        self._cache_lock = threading.Lock()
+
+    @contextmanager
+    def _session(self):
+        if self.db is not None:
+            yield self.db
+            return
+        session = self.session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
     def save_backtest_result(self, result_data: dict) -> BacktestResult:
         """保存回测结果"""
         result = BacktestResult(**result_data)
@@ -21,13 +125,13 @@ class BacktestDAO:
             self.db.commit()
             self.db.refresh(result)
         return result
-    
+
     def get_backtest_result(self, backtest_id: str) -> Optional[BacktestResult]:
         """获取回测结果"""
         if self.db:
             return self.db.query(BacktestResult).filter(BacktestResult.backtest_id == backtest_id).first()
         return None
-    
+
     def save_backtest_config(self, config_data: dict) -> BacktestConfig:
         """保存回测配置"""
         config = BacktestConfig(**config_data)
@@ -36,12 +140,241 @@ class BacktestDAO:
             self.db.commit()
             self.db.refresh(config)
         return config
-    
-    def get_backtest(self, backtest_id: str):
-        """获取回测结果（内存版本）"""
-        return self.results_cache.get(backtest_id)
-    
-    def get_backtest_history(self, limit: int = 10, offset: int = 0):
-        """获取回测历史（内存版本）"""
-        results = list(self.results_cache.values())
-        return results[offset:offset + limit]
\ No newline at end of file
+
+    def save_backtest(self, result: Dict) -> str:
+        """
+        持久化服务层返回的完整回测结果
+
+        接口返回的时间序列是降采样后的，结果中带有完整序列（FULL_SERIES_KEY）时保存完整序列。
+        增强回测的 portfolio_values 与 time_series 一样写入时间序列表，读取时还原为原字段名。
+
+        Args:
+            result: 回测结果字典（run_backtest / run_periodic_dca 等的返回值，定投结果以 dca_id 作为ID）
+
+        Returns:
+            backtest_id
+        """
+        backtest_id = result.get('backtest_id') or result['dca_id']
+        series_key = _series_key(result)
+        time_series = result.get(FULL_SERIES_KEY, result.get(series_key))
+        stored = dict(without_full_series(result))
+        if time_series is not None:
+            stored[series_key] = time_series
+        performance = result.get('performance_summary') or {}
+        risk = result.get('risk_metrics') or {}
+        details = {key: value for key, value in result.items() if key not in _COLUMN_FIELDS and key != series_key}
+
+        record = BacktestResult(
+            backtest_id=backtest_id,
+            portfolio_id=result.get('portfolio_id'),
+            config_summary=result.get('config_summary') or {},
+            total_return=performance.get('total_return_pct'),
+            annualized_return=performance.get('annualized_return_pct'),
+            volatility=risk.get('volatility_annual_pct'),
+            max_drawdown=risk.get('max_drawdown_pct'),
+            sharpe_ratio=risk.get('sharpe_ratio'),
+            sortino_ratio=risk.get('sortino_ratio'),
+            performance_summary=result.get('performance_summary'),
+            risk_metrics=result.get('risk_metrics'),
+            portfolio_decomposition=result.get('portfolio_composition'),
+            annual_returns=result.get('annual_returns'),
+            monthly_returns=result.get('monthly_returns'),
+            drawdown_periods=result.get('drawdown_periods'),
+            details=compress_json(details) if details else None,
+            series_key=series_key,
+            status=result.get('status', 'completed'),
+            error_message=result.get('error'),
+            created_at=_parse_datetime(result.get('created_at')),
+            completed_at=datetime.utcnow()
+        )
+
+        # 时间序列优先逐日写入 backtest_timeseries 表，按区间、按列读取时无需解码整段历史
+        rows = None
+        if time_series is not None:
+            rows = _timeseries_rows(backtest_id, time_series)
+            if rows is None:
+                record.time_series = compress_json(time_series)
+
+        with self._session() as session:
+            try:
+                session.add(record)
+                session.flush()
+                if rows:
+                    # 一次 executemany 批量插入，不为每行创建 ORM 对象
+                    session.execute(insert(BacktestTimeSeries), rows)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+
+        self._cache_put(backtest_id, stored)
+        return backtest_id
+
+    def get_backtest(self, backtest_id: str) -> Optional[Dict]:
+        """获取完整回测结果（先查热缓存，再查数据库），不存在时返回None；返回的字典可由调用方修改"""
+        with self._cache_lock:
+            cached = self.results_cache.get(backtest_id)
+            if cached is not None:
+                self.results_cache.move_to_end(backtest_id)
+        if cached is not None:
+            return pickle.loads(cached)
+
+        with self._session() as session:
+            record = session.query(BacktestResult).filter(BacktestResult.backtest_id == backtest_id).first()
+            if record is None:
+                return None
+            result = self._to_result(record)
+            series_key = record.series_key or _SERIES_KEYS[0]
+            if series_key not in result:
+                result[series_key] = self._query_time_series(session, backtest_id)
+
+        self._cache_put(backtest_id, result)
+        return result
+
+    def backtest_exists(self, backtest_id: str) -> bool:
+        """回测结果是否存在"""
+        with self._cache_lock:
+            if backtest_id in self.results_cache:
+                return True
+        with self._session() as session:
+            return session.query(BacktestResult.id).filter(BacktestResult.backtest_id == backtest_id).first() is not None
+
+    def get_time_series(self, backtest_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                        columns: Optional[Sequence[str]] = None) -> List[Dict]:
+        """
+        按日期区间、按列读取回测时间序列
+
+        Args:
+            backtest_id: 回测ID
+            start_date: 起始日期（含），YYYY-MM-DD
+            end_date: 结束日期（含），YYYY-MM-DD
+            columns: 需要的字段，见 TIMESERIES_FIELDS，默认全部
+
+        Returns:
+            [{'date': ..., 字段: 值}, ...]，按日期升序，省略空值字段
+        """
+        columns = tuple(columns) if columns else TIMESERIES_FIELDS
+        unknown = [column for column in columns if column not in TIMESERIES_FIELDS]
+        if unknown:
+            raise ValueError(f"Unsupported time series columns: {unknown}")
+
+        with self._session() as session:
+            blob = session.query(BacktestResult.time_series).filter(
+                BacktestResult.backtest_id == backtest_id).scalar()
+            if blob is None:
+                return self._query_time_series(session, backtest_id, start_date, end_date, columns)
+
+        # 未写入时间序列表的结果（压缩存储）退回到整段解码后筛选
+        return [
+            {'date': point['date'], **{column: point[column] for column in columns if point.get(column) is not None}}
+            for point in decompress_json(blob) or []
+            if (start_date is None or point['date'] >= start_date) and (end_date is None or point['date'] <= end_date)
+        ]
+
+    def _query_time_series(self, session: Session, backtest_id: str, start_date: Optional[str] = None,
+                           end_date: Optional[str] = None,
+                           columns: Sequence[str] = TIMESERIES_FIELDS) -> List[Dict]:
+        """查询时间序列表（日期为 YYYY-MM-DD 字符串，字典序即时间顺序）"""
+        query = session.query(BacktestTimeSeries.date, *(getattr(BacktestTimeSeries, c) for c in columns)) \
+            .filter(BacktestTimeSeries.backtest_id == backtest_id)
+        if start_date:
+            query = query.filter(BacktestTimeSeries.date >= start_date)
+        if end_date:
+            query = query.filter(BacktestTimeSeries.date <= end_date)
+
+        time_series = []
+        for row in query.order_by(BacktestTimeSeries.date).all():
+            point = {'date': row[0]}
+            for column, value in zip(columns, row[1:]):
+                if value is not None:
+                    point[column] = value
+            time_series.append(point)
+        return time_series
+
+    def get_backtest_history(self, limit: int = 10, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        按创建时间倒序获取回测历史摘要（键集分页，不读取时间序列与明细）
+
+        Args:
+            limit: 每页条数
+            cursor: 上一页返回的游标，首页为None
+
+        Returns:
+            (摘要列表, 下一页游标)；没有更多记录时游标为None
+        """
+        query_columns = (
+            BacktestResult.id, BacktestResult.backtest_id, BacktestResult.status,
+            BacktestResult.config_summary, BacktestResult.total_return, BacktestResult.annualized_return,
+            BacktestResult.volatility, BacktestResult.max_drawdown, BacktestResult.sharpe_ratio,
+            BacktestResult.created_at
+        )
+
+        with self._session() as session:
+            query = session.query(*query_columns)
+            if cursor:
+                created_at, row_id = self._decode_cursor(cursor)
+                query = query.filter(or_(
+                    BacktestResult.created_at < created_at,
+                    and_(BacktestResult.created_at == created_at, BacktestResult.id < row_id)
+                ))
+            rows = query.order_by(BacktestResult.created_at.desc(), BacktestResult.id.desc()).limit(limit + 1).all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        summaries = [
+            {
+                'backtest_id': row.backtest_id,
+                'status': row.status,
+                'config_summary': row.config_summary,
+                'total_return_pct': row.total_return,
+                'annualized_return_pct': row.annualized_return,
+                'volatility_annual_pct': row.volatility,
+                'max_drawdown_pct': row.max_drawdown,
+                'sharpe_ratio': row.sharpe_ratio,
+                'created_at': row.created_at.isoformat() if row.created_at else None
+            }
+            for row in rows
+        ]
+        next_cursor = self._encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+        return summaries, next_cursor
+
+    def _to_result(self, record: BacktestResult) -> Dict:
+        """由数据库记录还原回测结果字典"""
+        result = {'backtest_id': record.backtest_id, 'status': record.status}
+        if record.portfolio_id is not None:
+            result['portfolio_id'] = record.portfolio_id
+        for field in _JSON_FIELDS:
+            value = getattr(record, field)
+            if value is not None:
+                result[field] = value
+        if record.portfolio_decomposition is not None:
+            result['portfolio_composition'] = record.portfolio_decomposition
+        result.update(decompress_json(record.details) or {})
+        if record.time_series is not None:
+            result[record.series_key or _SERIES_KEYS[0]] = decompress_json(record.time_series)
+        if record.error_message is not None:
+            result['error'] = record.error_message
+        result['created_at'] = record.created_at.isoformat() if record.created_at else None
+        return result
+
+    def _cache_put(self, backtest_id: str, result: Dict):
+        if self.hot_cache_size <= 0:
+            return
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._cache_lock:
+            self.results_cache[backtest_id] = payload
+            self.results_cache.move_to_end(backtest_id)
+            while len(self.results_cache) > self.hot_cache_size:
+                self.results_cache.popitem(last=False)
+
+    @staticmethod
+    def _encode_cursor(created_at: datetime, row_id: int) -> str:
+        return f"{created_at.isoformat()}_{row_id}"
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            created_at, row_id = cursor.rsplit('_', 1)
+            return datetime.fromisoformat(created_at), int(row_id)
+        except ValueError:
+            raise ValueError(f"Invalid cursor: {cursor}")
@@ -0,0 +1,289 @@
+"""
+列式行情存储
+按股票代码保存日线数据，每列一个 .npy 文件，读取时使用内存映射按日期切片
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只能做进程内互斥
+    fcntl = None
+
+
+# 读取时元数据指向的版本目录已被清理，重新读取元数据的次数
+READ_RETRIES = 3
+
+# 列名及其存储类型，Date 为距 1970-01-01 的天数
+COLUMN_DTYPES = {
+    'Date': np.int64,
+    'Open': np.float64,
+    'High': np.float64,
+    'Low': np.float64,
+    'Close': np.float64,
+    'Volume': np.int64,
+}
+
+
+def empty_columns() -> Dict[str, np.ndarray]:
+    """创建空的行情列"""
+    return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+
+
+class PriceStore:
+    """
+    列式行情存储
+
+    目录结构:
+        <root>/<symbol>/meta.json        元数据（当前版本、覆盖区间索引）
+        <root>/<symbol>/v<version>/*.npy 每列一个文件
+
+    每次写入生成新的版本目录，再原子替换 meta.json，
+    读取方始终看到一组完整一致的列文件。写入在进程内加线程锁、跨进程对 meta.lock 加文件锁，
+    多个工作进程共享同一目录时不会互相覆盖；磁盘上保留上一个版本，读取到旧元数据的读取方仍能打开列文件，
+    版本目录已被清理时重新读取元数据。
+
+    覆盖区间索引记录已从数据源获取过的日期区间 [start, end)，
+    相邻或重叠的区间会被合并，任意子区间都可以直接从缓存读取。
+    """
+
+    def __init__(self, root_dir: str, ttl: int):
+        self.root_dir = root_dir
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def read(self, symbol: str, start_day: int, end_day: int) -> Optional[Dict[str, np.ndarray]]:
+        """
+        读取缓存的行情列
+
+        Args:
+            symbol: 股票代码
+            start_day: 开始日期（天数，包含）
+            end_day: 结束日期（天数，不包含）
+
+        Returns:
+            {列名: 数组} 的只读内存映射切片，区间未被完全覆盖时返回None
+        """
+        if self.missing_ranges(symbol, start_day, end_day):
+            return None
+        return self.read_range(symbol, start_day, end_day)
+
+    def read_range(self, symbol: str, start_day: int, end_day: int) -> Dict[str, np.ndarray]:
+        """
+        按日期切片读取已存储的行情列（不检查覆盖区间）
+
+        Returns:
+            {列名: 数组}，无数据时各列为空数组
+        """
+        for attempt in range(READ_RETRIES):
+            meta = self._load_meta(symbol)
+            if not meta or not meta['version']:
+                return empty_columns()
+            try:
+                columns = self._load_columns(symbol, meta['version'])
+                break
+            except FileNotFoundError:
+                # 读取元数据后又发生了两次写入，该版本已被清理
+                if attempt == READ_RETRIES - 1:
+                    raise
+
+        dates = columns['Date']
+        lo = int(np.searchsorted(dates, start_day, side='left'))
+        hi = int(np.searchsorted(dates, end_day, side='left'))
+        return {name: values[lo:hi] for name, values in columns.items()}
+
+    def missing_ranges(self, symbol: str, start_day: int, end_day: int) -> List[Tuple[int, int]]:
+        """
+        计算请求区间中未被有效缓存覆盖的部分
+
+        Returns:
+            缺失区间列表 [(start, end), ...]，均为左闭右开
+        """
+        meta = self._load_meta(symbol)
+        coverage = self._fresh_coverage(meta['coverage']) if meta else []
+
+        gaps = []
+        cursor = start_day
+        for covered_start, covered_end, _ in coverage:
+            if covered_end <= cursor:
+                continue
+            if covered_start >= end_day:
+                break
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start))
+            cursor = max(cursor, covered_end)
+            if cursor >= end_day:
+                break
+        if cursor < end_day:
+            gaps.append((cursor, end_day))
+        return gaps
+
+    def write(self, symbol: str, columns: Dict[str, np.ndarray], start_day: int, end_day: int):
+        """
+        合并写入行情列，同一日期以新数据为准
+
+        Args:
+            symbol: 股票代码
+            columns: {列名: 数组}，必须包含 Date
+            start_day: 本次获取的开始日期（天数，包含）
+            end_day: 本次获取的结束日期（天数，不包含）
+        """
+        new_columns = self._normalize_columns(columns)
+
+        with self._write_lock(symbol):
+            meta = self._load_meta(symbol) or {'version': 0, 'coverage': []}
+            old_columns = self._load_columns(symbol, meta['version']) if meta['version'] else None
+
+            if old_columns is not None and len(old_columns['Date']):
+                merged = {
+                    name: np.concatenate([new_columns[name], np.asarray(old_columns[name])])
+                    for name in COLUMN_DTYPES
+                }
+                # np.unique 取首次出现的位置，新数据排在前面因此优先保留
+                _, keep = np.unique(merged['Date'], return_index=True)
+                merged = {name: values[keep] for name, values in merged.items()}
+            else:
+                order = np.argsort(new_columns['Date'], kind='stable')
+                merged = {name: values[order] for name, values in new_columns.items()}
+
+            version = meta['version'] + 1
+            version_dir = self._version_dir(symbol, version)
+            os.makedirs(version_dir, exist_ok=True)
+            for name, values in merged.items():
+                np.save(os.path.join(version_dir, f"{name}.npy"), np.ascontiguousarray(values))
+
+            meta = {
+                'version': version,
+                'rows': int(len(merged['Date'])),
+                'coverage': self._add_coverage(meta['coverage'], start_day, end_day),
+            }
+            self._save_meta(symbol, meta)
+            self._remove_old_versions(symbol, version)
+
+    def mark_covered(self, symbol: str, start_day: int, end_day: int):
+        """将确认没有交易数据的区间（如周末、节假日、上市之前）记入覆盖索引，不写入数据"""
+        with self._write_lock(symbol):
+            meta = self._load_meta(symbol) or {'version': 0, 'rows': 0, 'coverage': []}
+            meta['coverage'] = self._add_coverage(meta['coverage'], start_day, end_day)
+            self._save_meta(symbol, meta)
+
+    def get_version(self, symbol: str) -> int:
+        """获取股票数据版本号，每次写入递增，未缓存时为0"""
+        meta = self._load_meta(symbol)
+        return meta['version'] if meta else 0
+
+    def _fresh_coverage(self, coverage: List) -> List:
+        """过滤掉已过期的覆盖区间"""
+        now = time.time()
+        return [interval for interval in coverage if (now - interval[2]) < self.ttl]
+
+    def _add_coverage(self, coverage: List, start_day: int, end_day: int) -> List:
+        """
+        向覆盖索引加入新区间并合并相邻/重叠区间
+
+        过期区间直接丢弃；合并后的区间取较早的获取时间，保证不会延长任何数据的有效期
+        """
+        intervals = self._fresh_coverage(coverage)
+        intervals.append([int(start_day), int(end_day), time.time()])
+        intervals.sort(key=lambda interval: interval[0])
+
+        merged = []
+        for interval_start, interval_end, fetched_at in intervals:
+            if merged and interval_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], interval_end)
+                merged[-1][2] = min(merged[-1][2], fetched_at)
+            else:
+                merged.append([interval_start, interval_end, fetched_at])
+        return merged
+
+    def _normalize_columns(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """补齐缺失列并转换为存储类型"""
+        dates = np.asarray(columns['Date'], dtype=np.int64)
+        normalized = {'Date': dates}
+        for name, dtype in COLUMN_DTYPES.items():
+            if name == 'Date':
+                continue
+            if name in columns:
+                values = np.asarray(columns[name], dtype=np.float64)
+                if dtype is np.int64:
+                    values = np.nan_to_num(values, nan=0.0).astype(np.int64)
+                normalized[name] = values
+            else:
+                fill = 0 if dtype is np.int64 else np.nan
+                normalized[name] = np.full(len(dates), fill, dtype=dtype)
+        return normalized
+
+    @contextmanager
+    def _write_lock(self, symbol: str):
+        """
+        写入锁：进程内线程锁 + 跨进程文件锁
+
+        meta.json 通过替换文件更新，文件锁加在单独的 meta.lock 上，保证所有进程锁的是同一个文件。
+        """
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            symbol_dir = self._symbol_dir(symbol)
+            os.makedirs(symbol_dir, exist_ok=True)
+            with open(os.path.join(symbol_dir, 'meta.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _load_columns(self, symbol: str, version: int) -> Dict[str, np.ndarray]:
+        """
+        以内存映射方式打开某一版本的全部列
+
+        Raises:
+            FileNotFoundError: 版本目录不存在
+        """
+        version_dir = self._version_dir(symbol, version)
+        return {
+            name: np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode='r')
+            for name in COLUMN_DTYPES
+        }
+
+    def _load_meta(self, symbol: str) -> Optional[Dict]:
+        """读取元数据"""
+        meta_file = os.path.join(self._symbol_dir(symbol), 'meta.json')
+        try:
+            with open(meta_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save_meta(self, symbol: str, meta: Dict):
+        """原子写入元数据"""
+        symbol_dir = self._symbol_dir(symbol)
+        os.makedirs(symbol_dir, exist_ok=True)
+        meta_file = os.path.join(symbol_dir, 'meta.json')
+        tmp_file = f"{meta_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_file, meta_file)
+
+    def _remove_old_versions(self, symbol: str, current_version: int):
+        """清理更早的版本目录，保留当前与上一个版本（已打开的内存映射不受影响）"""
+        symbol_dir = self._symbol_dir(symbol)
+        keep = {f"v{current_version}", f"v{current_version - 1}"}
+        for entry in os.listdir(symbol_dir):
+            if entry.startswith('v') and entry not in keep:
+                shutil.rmtree(os.path.join(symbol_dir, entry), ignore_errors=True)
+
+    def _symbol_dir(self, symbol: str) -> str:
+        """股票代码对应的目录（对 ^GSPC 等特殊字符转义）"""
+        return os.path.join(self.root_dir, quote(symbol, safe=''))
+
+    def _version_dir(self, symbol: str, version: int) -> str:
+        return os.path.join(self._symbol_dir(symbol), f"v{version}")
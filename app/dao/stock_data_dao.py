@@ -2,27 +2,37 @@
 股票数据访问对象
 负责从外部数据源获取股票数据
 """
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 import yfinance as yf
 import pandas as pd
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
-import json
-import os
-import hashlib
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
 from app.core.config import settings
+from app.dao.price_store import PriceStore, empty_columns
+from app.utils.trading_calendar import get_trading_calendar
+from app.utils.date_utils import (
+    to_day_number, index_to_day_numbers, day_numbers_to_strings,
+    day_numbers_to_index
+)
 
 
 class StockDataDAO:
     """股票数据访问对象"""
     
-    def __init__(self):
-        self.cache_dir = "data/cache"
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or settings.stock_cache_dir
         self.cache_ttl = settings.yfinance_cache_ttl
         self.timeout = settings.yfinance_timeout
         self.retry_count = settings.yfinance_retry_count
+        self.retry_backoff = settings.yfinance_retry_backoff
+        self.retry_max_backoff = settings.yfinance_retry_max_backoff
+        self.max_workers = settings.yfinance_max_workers
         
-        # 确保缓存目录存在
-        os.makedirs(self.cache_dir, exist_ok=True)
+        # 列式行情缓存（目录不存在时自动创建）
+        self.price_store = PriceStore(self.cache_dir, self.cache_ttl)
+        self.trading_calendar = get_trading_calendar()
     
     def get_stock_data(self, symbol: str, start_date: str, end_date: str) -> List[Dict]:
         """
@@ -36,67 +46,115 @@ class StockDataDAO:
         Returns:
             股票历史数据列表
         """
-        # 尝试从缓存获取
-        cached_data = self._get_from_cache(symbol, start_date, end_date)
-        if cached_data is not None:
-            return cached_data
+        return self._columns_to_records(self.get_stock_columns(symbol, start_date, end_date))
+    
+    def get_stock_columns(self, symbol: str, start_date: str, end_date: str) -> Dict[str, np.ndarray]:
+        """
+        获取股票历史数据（列式格式）
+        
+        Args:
+            symbol: 股票代码
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD，不包含)
         
-        # 从Yahoo Finance获取数据
+        Returns:
+            {列名: 数组}，Date 为 int64 天数，OHLC 为 float64，Volume 为 int64
+        """
         try:
-            ticker = yf.Ticker(symbol)
-            
-            # 获取历史数据
-            hist = ticker.history(
-                start=start_date,
-                end=end_date,
-                interval="1d",
-                timeout=self.timeout
-            )
+            if not settings.cache_enabled:
+                columns = self._fetch_history_columns(symbol, start_date, end_date)
+            else:
+                columns = self._get_columns_with_coverage(symbol, start_date, end_date)
             
-            if hist.empty:
+            if len(columns['Date']) == 0:
                 raise ValueError(f"No data available for {symbol} in the specified period")
             
-            # 转换为字典列表
-            data = []
-            # 重置索引，让Date成为一列
-            if hist.index.name:
-                hist = hist.reset_index()
-            
-            for idx, row in hist.iterrows():
-                # 获取日期
-                if 'Date' in hist.columns:
-                    date_value = row['Date']
-                elif 'index' in hist.columns:
-                    date_value = row['index']
-                else:
-                    date_value = idx
-                
-                # 格式化日期
-                if hasattr(date_value, 'strftime'):
-                    date_str = date_value.strftime('%Y-%m-%d')
-                else:
-                    date_str = str(date_value)[:10]  # 取前10个字符作为日期
-                    
-                data.append({
-                    'Date': date_str,
-                    'Open': float(row['Open']),
-                    'High': float(row['High']),
-                    'Low': float(row['Low']),
-                    'Close': float(row['Close']),
-                    'Volume': int(row['Volume']) if pd.notna(row['Volume']) else 0
-                })
-            
-            # 缓存数据
-            self._save_to_cache(symbol, start_date, end_date, data)
-            
-            return data
+            return columns
             
         except Exception as e:
             raise Exception(f"Failed to fetch data for {symbol}: {str(e)}")
     
+    def get_data_version(self, symbol: str) -> Optional[int]:
+        """
+        获取股票行情的数据版本号（每次写入缓存时递增）
+        
+        Returns:
+            版本号；未启用缓存或尚无缓存数据时为None（数据内容无法由版本号确定）
+        """
+        if not settings.cache_enabled:
+            return None
+        version = self.price_store.get_version(symbol)
+        return version or None
+    
+    def _get_columns_with_coverage(self, symbol: str, start_date: str, end_date: str) -> Dict[str, np.ndarray]:
+        """
+        基于覆盖区间索引读取数据，只从数据源补齐缺失的区间
+        
+        例如已缓存 2019-01-01..2025-01-01 时，请求 2020-01-01..2024-12-31 直接命中缓存；
+        请求 2018-06-01..2025-06-01 只会获取两端缺失的部分
+        """
+        start_day, end_day = to_day_number(start_date), to_day_number(end_date)
+        gaps = self.price_store.missing_ranges(symbol, start_day, end_day)
+        
+        if gaps == [(start_day, end_day)]:
+            # 完全未命中：直接返回数据源结果，同时写入缓存
+            columns = self._fetch_history_columns(symbol, start_date, end_date)
+            if len(columns['Date']):
+                self.price_store.write(symbol, columns, start_day, end_day)
+            return columns
+        
+        for gap_start, gap_end in gaps:
+            if not self._has_sessions(gap_start, gap_end):
+                # 不含交易日的区间（周末、节假日）不可能有交易数据，无需请求
+                self.price_store.mark_covered(symbol, gap_start, gap_end)
+                continue
+            
+            gap_start_str, gap_end_str = day_numbers_to_strings(np.array([gap_start, gap_end]))
+            gap_columns = self._fetch_history_columns(symbol, gap_start_str, gap_end_str)
+            
+            # 请求成功即记录覆盖：区间内没有数据（如上市之前）时同样不再重复请求；
+            # 数据源偶尔在请求失败时也返回空结果，覆盖记录过期后会重新获取
+            if len(gap_columns['Date']):
+                self.price_store.write(symbol, gap_columns, gap_start, gap_end)
+            else:
+                self.price_store.mark_covered(symbol, gap_start, gap_end)
+        
+        return self.price_store.read_range(symbol, start_day, end_day)
+    
+    def _fetch_history_columns(self, symbol: str, start_date: str, end_date: str) -> Dict[str, np.ndarray]:
+        """从Yahoo Finance获取历史数据（列式格式），无数据时返回空列"""
+        ticker = yf.Ticker(symbol)
+        
+        # 获取历史数据（网络错误和限流时重试）
+        hist = self._call_with_retry(lambda: ticker.history(
+            start=start_date,
+            end=end_date,
+            interval="1d",
+            timeout=self.timeout
+        ))
+        
+        if hist.empty:
+            return empty_columns()
+        
+        return self._history_to_columns(hist)
+    
+    def _has_sessions(self, start_day: int, end_day: int) -> bool:
+        """判断 [start_day, end_day) 是否包含交易日，超出交易日历范围时按是否包含工作日判断"""
+        sessions = self.trading_calendar.sessions
+        if start_day < sessions[0] or end_day > sessions[-1] + 1:
+            return self._has_weekday(start_day, end_day)
+        return len(self.trading_calendar.sessions_in_range(start_day, end_day - 1)) > 0
+    
+    @staticmethod
+    def _has_weekday(start_day: int, end_day: int) -> bool:
+        """判断 [start_day, end_day) 是否包含工作日（1970-01-01 为周四）"""
+        if end_day - start_day >= 3:
+            return True
+        return any((day + 3) % 7 < 5 for day in range(start_day, end_day))
+    
     def get_multiple_stocks_dataframes(self, symbols: List[str], start_date: str, end_date: str) -> Dict[str, pd.DataFrame]:
         """
-        获取多只股票的历史数据（DataFrame格式）
+        获取多只股票的历史数据（DataFrame格式，与列表格式共用缓存）
         
         Args:
             symbols: 股票代码列表
@@ -106,22 +164,29 @@ class StockDataDAO:
         Returns:
             股票数据字典 {symbol: DataFrame}
         """
-        result = {}
-        for symbol in symbols:
-            try:
-                ticker = yf.Ticker(symbol)
-                data = ticker.history(
-                    start=start_date,
-                    end=end_date,
-                    interval="1d",
-                    timeout=self.timeout
-                )
-                if not data.empty:
-                    result[symbol] = data
-            except Exception as e:
-                print(f"Warning: Failed to fetch data for {symbol}: {e}")
-                continue
-        return result
+        columns, errors = self.get_multiple_stocks_columns(symbols, start_date, end_date)
+        for symbol, error in errors.items():
+            print(f"Warning: Failed to fetch data for {symbol}: {error}")
+        
+        return {symbol: self._columns_to_dataframe(columns[symbol]) for symbol in symbols if symbol in columns}
+    
+    def get_multiple_stocks_columns(self, symbols: List[str], start_date: str,
+                                    end_date: str) -> Tuple[Dict[str, Dict[str, np.ndarray]], Dict[str, str]]:
+        """
+        并发获取多只股票的历史数据（列式格式）
+        
+        Args:
+            symbols: 股票代码列表
+            start_date: 开始日期
+            end_date: 结束日期
+        
+        Returns:
+            (成功的数据 {symbol: columns}, 失败原因 {symbol: error})
+        """
+        return self._fetch_parallel(
+            symbols,
+            lambda symbol: self.get_stock_columns(symbol, start_date, end_date)
+        )
     
     def get_multiple_stocks_data(self, symbols: List[str], start_date: str, end_date: str) -> Dict[str, List[Dict]]:
         """
@@ -133,21 +198,63 @@ class StockDataDAO:
             end_date: 结束日期
         
         Returns:
-            股票数据字典 {symbol: data}
+            股票数据字典 {symbol: data}，获取失败的股票对应空列表
         """
-        result = {}
+        columns, errors = self.get_multiple_stocks_columns(symbols, start_date, end_date)
         
+        result = {}
         for symbol in symbols:
-            try:
-                data = self.get_stock_data(symbol, start_date, end_date)
-                result[symbol] = data
-            except Exception as e:
+            if symbol in columns:
+                result[symbol] = self._columns_to_records(columns[symbol])
+            else:
                 # 记录错误但继续处理其他股票
-                print(f"Error fetching {symbol}: {e}")
+                print(f"Error fetching {symbol}: {errors.get(symbol)}")
                 result[symbol] = []
         
         return result
     
+    def _fetch_parallel(self, symbols: List[str], fetch: Callable[[str], object]) -> Tuple[Dict, Dict[str, str]]:
+        """
+        使用线程池并发获取多只股票数据，并发数受 yfinance_max_workers 限制
+        
+        Returns:
+            (成功结果 {symbol: result}, 失败原因 {symbol: error})
+        """
+        unique_symbols = list(dict.fromkeys(symbols))
+        results, errors = {}, {}
+        
+        def run(symbol: str):
+            try:
+                results[symbol] = fetch(symbol)
+            except Exception as e:
+                errors[symbol] = str(e)
+        
+        worker_count = min(self.max_workers, len(unique_symbols))
+        if worker_count <= 1:
+            for symbol in unique_symbols:
+                run(symbol)
+        else:
+            with ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="stock-fetch") as executor:
+                list(executor.map(run, unique_symbols))
+        
+        return results, errors
+    
+    def _call_with_retry(self, func: Callable):
+        """
+        调用数据源，失败时按带随机抖动的指数退避重试
+        
+        第 n 次重试前等待 uniform(0, min(max_backoff, backoff * 2^n)) 秒，
+        避免多个并发请求在限流后同时重试
+        """
+        for attempt in range(self.retry_count + 1):
+            try:
+                return func()
+            except Exception:
+                if attempt >= self.retry_count:
+                    raise
+                delay = min(self.retry_max_backoff, self.retry_backoff * (2 ** attempt))
+                time.sleep(random.uniform(0, delay))
+    
     def validate_symbol(self, symbol: str) -> bool:
         """
         验证股票代码是否有效
@@ -235,35 +342,35 @@ class StockDataDAO:
         
         return results
     
-    def _get_cache_key(self, symbol: str, start_date: str, end_date: str) -> str:
-        """生成缓存键"""
-        key_str = f"{symbol}_{start_date}_{end_date}"
-        return hashlib.md5(key_str.encode()).hexdigest()
+    def _history_to_columns(self, hist: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """将yfinance返回的DataFrame转换为列式数据"""
+        return {
+            'Date': index_to_day_numbers(hist.index),
+            'Open': hist['Open'].to_numpy(dtype=np.float64),
+            'High': hist['High'].to_numpy(dtype=np.float64),
+            'Low': hist['Low'].to_numpy(dtype=np.float64),
+            'Close': hist['Close'].to_numpy(dtype=np.float64),
+            'Volume': hist['Volume'].fillna(0).to_numpy(dtype=np.int64)
+        }
     
-    def _get_from_cache(self, symbol: str, start_date: str, end_date: str) -> Optional[List[Dict]]:
-        """从缓存获取数据"""
-        if not settings.cache_enabled:
-            return None
-        
-        cache_key = self._get_cache_key(symbol, start_date, end_date)
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
-        
-        if os.path.exists(cache_file):
-            # 检查缓存是否过期
-            file_time = os.path.getmtime(cache_file)
-            if (datetime.now().timestamp() - file_time) < self.cache_ttl:
-                with open(cache_file, 'r') as f:
-                    return json.load(f)
-        
-        return None
+    def _columns_to_dataframe(self, columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """将列式数据转换为以日期为索引的DataFrame"""
+        return pd.DataFrame(
+            {name: np.asarray(columns[name]) for name in ('Open', 'High', 'Low', 'Close', 'Volume')},
+            index=day_numbers_to_index(columns['Date'])
+        )
     
-    def _save_to_cache(self, symbol: str, start_date: str, end_date: str, data: List[Dict]):
-        """保存数据到缓存"""
-        if not settings.cache_enabled:
-            return
-        
-        cache_key = self._get_cache_key(symbol, start_date, end_date)
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
-        
-        with open(cache_file, 'w') as f:
-            json.dump(data, f)
\ No newline at end of file
+    def _columns_to_records(self, columns: Dict[str, np.ndarray]) -> List[Dict]:
+        """将列式数据转换为字典列表（仅在API边界使用）"""
+        dates = day_numbers_to_strings(columns['Date'])
+        return [
+            {'Date': d, 'Open': o, 'High': h, 'Low': l, 'Close': c, 'Volume': v}
+            for d, o, h, l, c, v in zip(
+                dates,
+                columns['Open'].tolist(),
+                columns['High'].tolist(),
+                columns['Low'].tolist(),
+                columns['Close'].tolist(),
+                columns['Volume'].tolist()
+            )
+        ]
@@ -13,6 +13,7 @@ from app.core.database import init_db
 # Import controllers
 from app.controllers.backtest_controller import backtest_bp
 from app.controllers.portfolio_controller import portfolio_bp
+from app.controllers.job_controller import job_bp
 
 
 def create_app():
@@ -21,6 +22,9 @@ def create_app():
                 template_folder='../templates',
                 static_folder='static')
     
+    # 初始化数据库（建表）
+    init_db()
+    
     # 配置CORS
     CORS(app, origins=settings.cors_origins)
     
@@ -32,6 +36,7 @@ def create_app():
     # 注册蓝图
     app.register_blueprint(backtest_bp)
     app.register_blueprint(portfolio_bp)
+    app.register_blueprint(job_bp)
     
     # 首页路由 - 直接显示高级配置页面
     @app.route('/')
@@ -73,9 +78,6 @@ app = create_app()
 
 
 if __name__ == '__main__':
-    # 初始化数据库
-    init_db()
-    
     # 运行应用
     app.run(
         host=settings.app_host,
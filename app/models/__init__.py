@@ -2,6 +2,6 @@
 数据模型包
 """
 from app.models.portfolio import Portfolio
-from app.models.backtest import BacktestResult, BacktestConfig
+from app.models.backtest import BacktestResult, BacktestConfig, BacktestTimeSeries
 
-__all__ = ["Portfolio", "BacktestResult", "BacktestConfig"]
\ No newline at end of file
+__all__ = ["Portfolio", "BacktestResult", "BacktestConfig", "BacktestTimeSeries"]
\ No newline at end of file
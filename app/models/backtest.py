@@ -2,7 +2,7 @@
 回测结果数据模型
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, JSON, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -40,8 +40,9 @@ class BacktestResult(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     backtest_id = Column(String(50), unique=True, index=True, nullable=False)
-    portfolio_id = Column(String(50), ForeignKey("portfolios.portfolio_id"), nullable=False)
-    config_id = Column(Integer, ForeignKey("backtest_configs.id"), nullable=False)
+    # 直接提交配置的回测没有对应的已保存组合与配置
+    portfolio_id = Column(String(50), ForeignKey("portfolios.portfolio_id"), nullable=True)
+    config_id = Column(Integer, ForeignKey("backtest_configs.id"), nullable=True)
     
     # 配置摘要
     config_summary = Column(JSON, nullable=False)
@@ -61,7 +62,9 @@ class BacktestResult(Base):
     annual_returns = Column(JSON)
     monthly_returns = Column(JSON)
     drawdown_periods = Column(JSON)
-    time_series = Column(Text)  # 大数据，存储为压缩的JSON字符串
+    time_series = Column(Text)  # 无法写入 backtest_timeseries 表的时间序列，存储为压缩的JSON字符串
+    details = Column(Text)  # 其余结果字段（基准对比、交易记录等），压缩的JSON字符串
+    series_key = Column(String(20))  # 时间序列在结果中的字段名：time_series（默认）或 portfolio_values（增强回测）
     
     # 状态和时间
     status = Column(String(20), default="processing")  # processing, completed, failed
@@ -70,6 +73,11 @@ class BacktestResult(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime)
     
+    # 历史记录按 (created_at, id) 做键集分页
+    __table_args__ = (
+        Index("ix_backtest_results_created_at_id", "created_at", "id"),
+    )
+    
     def __repr__(self):
         return f"<BacktestResult(id={self.id}, backtest_id={self.backtest_id}, status={self.status})>"
     
@@ -98,4 +106,41 @@ class BacktestResult(Base):
             "calculation_time_ms": self.calculation_time_ms,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
-        }
\ No newline at end of file
+        }
+
+
+# backtest_timeseries 表中的数值列（时间序列记录中的同名字段）
+TIMESERIES_FIELDS = (
+    'value', 'daily_return', 'cumulative_return', 'invested', 'return_pct',
+    'cash', 'holdings_value', 'triggered', 'rebalanced'
+)
+
+
+class BacktestTimeSeries(Base):
+    """回测每日时间序列模型（每个回测每个交易日一行）"""
+    __tablename__ = "backtest_timeseries"
+    
+    backtest_id = Column(String(50), ForeignKey("backtest_results.backtest_id"), primary_key=True)
+    date = Column(String(10), primary_key=True)  # YYYY-MM-DD
+    
+    value = Column(Float)
+    daily_return = Column(Float)
+    cumulative_return = Column(Float)
+    invested = Column(Float)  # 定投累计投入
+    return_pct = Column(Float)  # 定投收益率
+    cash = Column(Float)
+    holdings_value = Column(Float)
+    triggered = Column(Boolean)  # 条件定投是否触发
+    rebalanced = Column(Boolean)  # 是否再平衡日
+    
+    def __repr__(self):
+        return f"<BacktestTimeSeries(backtest_id={self.backtest_id}, date={self.date})>"
+    
+    def to_dict(self):
+        """转换为字典（省略空值字段）"""
+        record = {"date": self.date}
+        for field in TIMESERIES_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                record[field] = value
+        return record
@@ -2,9 +2,12 @@
 交易记录模型
 """
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Optional, Dict, Any
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Iterator, List, Tuple, Union
 from enum import Enum
+import numpy as np
+
+from app.utils.date_utils import day_numbers_to_strings
 
 
 class TransactionType(Enum):
@@ -61,6 +64,220 @@ class Transaction:
         }
 
 
+# 交易类型与买入原因在交易明细表中的编号
+TRANSACTION_TYPES = tuple(TransactionType)
+BUY_REASONS = tuple(BuyReason)
+_TRANSACTION_TYPE_IDS = {member: i for i, member in enumerate(TRANSACTION_TYPES)}
+_BUY_REASON_IDS = {member: i for i, member in enumerate(BUY_REASONS)}
+_EPOCH = datetime(1970, 1, 1)
+
+
+class TransactionLedger:
+    """
+    列式交易明细
+
+    数值字段保存在按需倍增扩容的 NumPy 数组中，股票代码、原因描述与详细信息放在旁表，
+    按原因汇总使用 bincount；序列化结果会被缓存，每条记录最多转换一次。
+    遍历时按行生成 Transaction 对象，兼容逐条处理的调用方。
+    """
+
+    _NUMERIC_COLUMNS = {
+        'day': np.int64,
+        'symbol_id': np.int32,
+        'type_id': np.int8,
+        'reason_id': np.int8,
+        'shares': np.float64,
+        'price': np.float64,
+        'amount': np.float64,
+        'value_before': np.float64,
+        'value_after': np.float64,
+    }
+
+    def __init__(self, capacity: int = 64):
+        self._size = 0
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in self._NUMERIC_COLUMNS.items()}
+        self.symbols: List[str] = []
+        self._symbol_ids: Dict[str, int] = {}
+        self._reasons: List[str] = []
+        self._details: List[Dict[str, Any]] = []
+        self._records: Optional[List[Dict[str, Any]]] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, day: int, symbol: str, transaction_type: TransactionType, shares: float,
+               price: float, amount: float, reason: str, reason_code: BuyReason,
+               details: Dict[str, Any], portfolio_value_before: float, portfolio_value_after: float):
+        """
+        追加一条交易
+
+        Args:
+            day: 交易日（距 1970-01-01 的天数）
+        """
+        if self._size == len(self._columns['day']):
+            self._grow()
+
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self._symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+
+        i = self._size
+        row = {
+            'day': day,
+            'symbol_id': symbol_id,
+            'type_id': _TRANSACTION_TYPE_IDS[transaction_type],
+            'reason_id': _BUY_REASON_IDS[reason_code],
+            'shares': shares,
+            'price': price,
+            'amount': amount,
+            'value_before': portfolio_value_before,
+            'value_after': portfolio_value_after,
+        }
+        for name, value in row.items():
+            self._columns[name][i] = value
+        self._reasons.append(reason)
+        self._details.append(details)
+        self._size += 1
+        self._records = None
+
+    def column(self, name: str) -> np.ndarray:
+        """数值列的只读视图（长度为交易笔数）"""
+        view = self._columns[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def row(self, i: int) -> Transaction:
+        """第 i 条交易"""
+        if not 0 <= i < self._size:
+            raise IndexError("Transaction index out of range")
+        columns = self._columns
+        return Transaction(
+            date=_EPOCH + timedelta(days=int(columns['day'][i])),
+            symbol=self.symbols[columns['symbol_id'][i]],
+            transaction_type=TRANSACTION_TYPES[columns['type_id'][i]],
+            shares=float(columns['shares'][i]),
+            price=float(columns['price'][i]),
+            amount=float(columns['amount'][i]),
+            reason=self._reasons[i],
+            reason_code=BUY_REASONS[columns['reason_id'][i]],
+            details=self._details[i],
+            portfolio_value_before=float(columns['value_before'][i]),
+            portfolio_value_after=float(columns['value_after'][i])
+        )
+
+    def __getitem__(self, i: int) -> Transaction:
+        return self.row(i + self._size if i < 0 else i)
+
+    def __iter__(self) -> Iterator[Transaction]:
+        return (self.row(i) for i in range(self._size))
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """转换为字典列表（格式同 Transaction.to_dict），结果缓存至下一次追加"""
+        if self._records is None:
+            n = self._size
+            columns = {name: self._columns[name][:n].tolist() for name in self._NUMERIC_COLUMNS}
+            dates = day_numbers_to_strings(self._columns['day'][:n])
+            type_values = [member.value for member in TRANSACTION_TYPES]
+            reason_values = [member.value for member in BUY_REASONS]
+            self._records = [
+                {
+                    'date': dates[i],
+                    'symbol': self.symbols[columns['symbol_id'][i]],
+                    'type': type_values[columns['type_id'][i]],
+                    'shares': round(columns['shares'][i], 4),
+                    'price': round(columns['price'][i], 2),
+                    'amount': round(columns['amount'][i], 2),
+                    'reason': self._reasons[i],
+                    'reason_code': reason_values[columns['reason_id'][i]],
+                    'details': self._details[i],
+                    'portfolio_value_before': round(columns['value_before'][i], 2),
+                    'portfolio_value_after': round(columns['value_after'][i], 2)
+                }
+                for i in range(n)
+            ]
+        return self._records
+
+    def summarize(self) -> Dict[str, Any]:
+        """
+        交易汇总：买入/卖出笔数与金额，以及按买入原因分组的笔数与金额
+
+        按原因分组的统计只包含汇总值，明细见 to_records()
+        """
+        if self._size == 0:
+            return {}
+
+        type_ids = self.column('type_id')
+        amounts = self.column('amount')
+        buys = type_ids == _TRANSACTION_TYPE_IDS[TransactionType.BUY]
+        sells = type_ids == _TRANSACTION_TYPE_IDS[TransactionType.SELL]
+
+        buy_reasons = self.column('reason_id')[buys]
+        counts = np.bincount(buy_reasons, minlength=len(BUY_REASONS))
+        totals = np.bincount(buy_reasons, weights=amounts[buys], minlength=len(BUY_REASONS))
+
+        # 按原因首次出现的顺序输出
+        _, first_seen = np.unique(buy_reasons, return_index=True)
+        reason_ids = buy_reasons[np.sort(first_seen)]
+        reason_stats = {
+            BUY_REASONS[reason_id].value: {
+                'count': int(counts[reason_id]),
+                'total_amount': float(totals[reason_id])
+            }
+            for reason_id in reason_ids
+        }
+
+        return {
+            'total_transactions': self._size,
+            'buy_count': int(buys.sum()),
+            'sell_count': int(sells.sum()),
+            'total_buy_amount': float(amounts[buys].sum()),
+            'total_sell_amount': float(amounts[sells].sum()),
+            'reason_statistics': reason_stats
+        }
+
+    @classmethod
+    def from_transactions(cls, transactions: List[Transaction]) -> 'TransactionLedger':
+        """由 Transaction 列表构建"""
+        ledger = cls(capacity=max(len(transactions), 1))
+        for t in transactions:
+            ledger.append(
+                day=(t.date - _EPOCH).days if isinstance(t.date, datetime) else int(t.date),
+                symbol=t.symbol,
+                transaction_type=t.transaction_type,
+                shares=t.shares,
+                price=t.price,
+                amount=t.amount,
+                reason=t.reason,
+                reason_code=t.reason_code,
+                details=t.details,
+                portfolio_value_before=t.portfolio_value_before,
+                portfolio_value_after=t.portfolio_value_after
+            )
+        return ledger
+
+    def _grow(self):
+        capacity = max(2 * len(self._columns['day']), 16)
+        for name, values in self._columns.items():
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self._size] = values[:self._size]
+            self._columns[name] = grown
+
+
+# 条件买入信号按此优先级判断，同一天满足多个条件时取第一个
+BUY_SIGNAL_PRIORITY = (
+    BuyReason.PRICE_DROP,
+    BuyReason.DRAWDOWN,
+    BuyReason.VIX_HIGH,
+    BuyReason.RSI_OVERSOLD,
+    BuyReason.MACD_GOLDEN_CROSS,
+    BuyReason.SUPPORT_LEVEL,
+)
+
+# 未触发买入信号时的原因编号
+NO_SIGNAL = -1
+
+
 class TransactionAnalyzer:
     """交易分析器"""
     
@@ -77,118 +294,158 @@ class TransactionAnalyzer:
         Returns:
             (是否买入, 原因描述, 原因代码, 详细信息)
         """
+        prev_price = price_history[-2] if len(price_history) >= 2 else np.nan
+        indicator_arrays = {name: np.array([value], dtype=np.float64) for name, value in indicators.items()}
+        
+        _, reason_codes, trigger_values = TransactionAnalyzer.evaluate_buy_signals(
+            np.array([current_price], dtype=np.float64),
+            np.array([prev_price], dtype=np.float64),
+            indicator_arrays,
+            config
+        )
+        
+        if reason_codes[0] == NO_SIGNAL:
+            return (False, "", BuyReason.CUSTOM, {})
+        
+        reason_code = BUY_SIGNAL_PRIORITY[reason_codes[0]]
+        reason, details = TransactionAnalyzer.describe_buy_signal(
+            reason_code, current_price, trigger_values[0], indicators, config
+        )
+        return (True, reason, reason_code, details)
+    
+    @staticmethod
+    def evaluate_buy_signals(
+        close: np.ndarray,
+        prev_close: np.ndarray,
+        indicators: Dict[str, np.ndarray],
+        config: Dict[str, Any]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        批量检查买入信号
+        
+        各输入为形状相同的数组（如 日期 × 股票），NaN 视为条件不满足。
+        indicators 中缺少某项指标时跳过对应条件，与逐条检查的行为一致。
+        
+        Args:
+            close: 当日收盘价
+            prev_close: 上一交易日收盘价
+            indicators: {'drawdown', 'vix', 'rsi', 'macd', 'macd_signal',
+                         'prev_macd', 'prev_signal', 'support_level'} 中的任意项
+            config: 买入条件配置
+        
+        Returns:
+            (是否触发, 原因编号, 触发值)
+            原因编号为 BUY_SIGNAL_PRIORITY 中的下标，未触发为 NO_SIGNAL；
+            触发值依次为日收益率、回撤、VIX、RSI、MACD、支撑位
+        """
+        close = np.asarray(close, dtype=np.float64)
+        reason_codes = np.full(close.shape, NO_SIGNAL, dtype=np.int8)
+        trigger_values = np.full(close.shape, np.nan, dtype=np.float64)
+        
+        def apply(code: int, hit: np.ndarray, values: np.ndarray):
+            # 只填充尚未被更高优先级条件命中的位置
+            hit = hit & (reason_codes == NO_SIGNAL)
+            reason_codes[hit] = code
+            trigger_values[hit] = np.broadcast_to(values, close.shape)[hit]
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 1. 日内跌幅
+            daily_return = (close - prev_close) / prev_close
+            apply(0, daily_return <= config.get('daily_drop_threshold', -0.05), daily_return)
+            
+            # 2. 回撤
+            if 'drawdown' in indicators:
+                drawdown = np.asarray(indicators['drawdown'], dtype=np.float64)
+                apply(1, drawdown <= config.get('drawdown_threshold', -0.10), drawdown)
+            
+            # 3. VIX指标
+            if 'vix' in indicators:
+                vix = np.asarray(indicators['vix'], dtype=np.float64)
+                apply(2, vix > config.get('vix_threshold', 30), vix)
+            
+            # 4. RSI超卖
+            if 'rsi' in indicators:
+                rsi = np.asarray(indicators['rsi'], dtype=np.float64)
+                apply(3, rsi < config.get('rsi_oversold', 30), rsi)
+            
+            # 5. MACD金叉：MACD从下向上穿过Signal线
+            if 'macd' in indicators and 'macd_signal' in indicators:
+                macd = np.asarray(indicators['macd'], dtype=np.float64)
+                signal = np.asarray(indicators['macd_signal'], dtype=np.float64)
+                prev_macd = np.asarray(indicators.get('prev_macd', 0), dtype=np.float64)
+                prev_signal = np.asarray(indicators.get('prev_signal', 0), dtype=np.float64)
+                apply(4, (prev_macd <= prev_signal) & (macd > signal), macd)
+            
+            # 6. 支撑位（2%范围内）
+            if 'support_level' in indicators:
+                support = np.asarray(indicators['support_level'], dtype=np.float64)
+                apply(5, close <= support * 1.02, support)
+        
+        return reason_codes != NO_SIGNAL, reason_codes, trigger_values
+    
+    @staticmethod
+    def describe_buy_signal(
+        reason_code: BuyReason,
+        current_price: float,
+        trigger_value: float,
+        indicators: Dict[str, Any],
+        config: Dict[str, Any]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        生成买入信号的原因描述和详细信息（仅对实际成交的信号调用）
+        
+        Returns:
+            (原因描述, 详细信息)
+        """
         details = {}
         
-        # 1. 检查日内跌幅
-        if len(price_history) >= 2:
-            daily_return = (current_price - price_history[-2]) / price_history[-2]
+        if reason_code == BuyReason.PRICE_DROP:
             drop_threshold = config.get('daily_drop_threshold', -0.05)
-            if daily_return <= drop_threshold:  # 跌幅超过阈值
-                details['daily_return'] = f"{daily_return:.2%}"
-                details['trigger_threshold'] = f"{drop_threshold:.1%}"
-                return (True, 
-                       f"当日跌幅{daily_return:.2%}，触发买入",
-                       BuyReason.PRICE_DROP,
-                       details)
-        
-        # 2. 检查回撤
-        if 'drawdown' in indicators:
-            drawdown = indicators['drawdown']
+            details['daily_return'] = f"{trigger_value:.2%}"
+            details['trigger_threshold'] = f"{drop_threshold:.1%}"
+            return f"当日跌幅{trigger_value:.2%}，触发买入", details
+        
+        if reason_code == BuyReason.DRAWDOWN:
             drawdown_threshold = config.get('drawdown_threshold', -0.10)
-            if drawdown <= drawdown_threshold:  # 回撤超过阈值
-                details['drawdown'] = f"{drawdown:.2%}"
-                details['trigger_threshold'] = f"{drawdown_threshold:.1%}"
-                return (True,
-                       f"回撤{drawdown:.2%}，触发买入",
-                       BuyReason.DRAWDOWN,
-                       details)
-        
-        # 3. 检查VIX指标
-        if 'vix' in indicators:
-            vix = indicators['vix']
+            details['drawdown'] = f"{trigger_value:.2%}"
+            details['trigger_threshold'] = f"{drawdown_threshold:.1%}"
+            return f"回撤{trigger_value:.2%}，触发买入", details
+        
+        if reason_code == BuyReason.VIX_HIGH:
             vix_threshold = config.get('vix_threshold', 30)
-            if vix > vix_threshold:
-                details['vix'] = f"{vix:.2f}"
-                details['trigger_threshold'] = str(vix_threshold)
-                return (True,
-                       f"VIX指数{vix:.2f}超过阈值{vix_threshold}",
-                       BuyReason.VIX_HIGH,
-                       details)
-        
-        # 4. 检查RSI超卖
-        if 'rsi' in indicators:
-            rsi = indicators['rsi']
+            details['vix'] = f"{trigger_value:.2f}"
+            details['trigger_threshold'] = str(vix_threshold)
+            return f"VIX指数{trigger_value:.2f}超过阈值{vix_threshold}", details
+        
+        if reason_code == BuyReason.RSI_OVERSOLD:
             rsi_threshold = config.get('rsi_oversold', 30)
-            if rsi < rsi_threshold:  # RSI低于阈值视为超卖
-                details['rsi'] = f"{rsi:.2f}"
-                details['trigger_threshold'] = str(rsi_threshold)
-                return (True,
-                       f"RSI指标{rsi:.2f}，超卖信号",
-                       BuyReason.RSI_OVERSOLD,
-                       details)
-        
-        # 5. 检查MACD金叉
-        if 'macd' in indicators and 'macd_signal' in indicators:
-            macd = indicators['macd']
-            signal = indicators['macd_signal']
-            prev_macd = indicators.get('prev_macd', 0)
-            prev_signal = indicators.get('prev_signal', 0)
-            
-            # 金叉：MACD从下向上穿过Signal线
-            if prev_macd <= prev_signal and macd > signal:
-                details['macd'] = f"{macd:.4f}"
-                details['signal'] = f"{signal:.4f}"
-                return (True,
-                       f"MACD金叉信号",
-                       BuyReason.MACD_GOLDEN_CROSS,
-                       details)
-        
-        # 6. 检查支撑位
-        if 'support_level' in indicators:
-            support = indicators['support_level']
-            if current_price <= support * 1.02:  # 接近支撑位（2%范围内）
-                details['price'] = f"{current_price:.2f}"
-                details['support_level'] = f"{support:.2f}"
-                return (True,
-                       f"价格{current_price:.2f}接近支撑位{support:.2f}",
-                       BuyReason.SUPPORT_LEVEL,
-                       details)
-        
-        return (False, "", BuyReason.CUSTOM, {})
+            details['rsi'] = f"{trigger_value:.2f}"
+            details['trigger_threshold'] = str(rsi_threshold)
+            return f"RSI指标{trigger_value:.2f}，超卖信号", details
+        
+        if reason_code == BuyReason.MACD_GOLDEN_CROSS:
+            details['macd'] = f"{trigger_value:.4f}"
+            details['signal'] = f"{indicators['macd_signal']:.4f}"
+            return f"MACD金叉信号", details
+        
+        if reason_code == BuyReason.SUPPORT_LEVEL:
+            details['price'] = f"{current_price:.2f}"
+            details['support_level'] = f"{trigger_value:.2f}"
+            return f"价格{current_price:.2f}接近支撑位{trigger_value:.2f}", details
+        
+        return "", details
     
     @staticmethod
-    def analyze_transactions(transactions: list) -> Dict[str, Any]:
-        """分析交易记录"""
-        if not transactions:
-            return {}
-        
-        buy_transactions = [t for t in transactions if t.transaction_type == TransactionType.BUY]
-        sell_transactions = [t for t in transactions if t.transaction_type == TransactionType.SELL]
-        
-        # 按原因分组统计
-        reason_stats = {}
-        for t in buy_transactions:
-            reason = t.reason_code.value
-            if reason not in reason_stats:
-                reason_stats[reason] = {
-                    'count': 0,
-                    'total_amount': 0,
-                    'transactions': []
-                }
-            reason_stats[reason]['count'] += 1
-            reason_stats[reason]['total_amount'] += t.amount
-            reason_stats[reason]['transactions'].append(t.to_dict())
+    def analyze_transactions(transactions: Union[TransactionLedger, list]) -> Dict[str, Any]:
+        """
+        分析交易记录
         
-        # 计算收益
-        total_buy_amount = sum(t.amount for t in buy_transactions)
-        total_sell_amount = sum(t.amount for t in sell_transactions)
+        Args:
+            transactions: 交易明细表或 Transaction 列表
         
-        return {
-            'total_transactions': len(transactions),
-            'buy_count': len(buy_transactions),
-            'sell_count': len(sell_transactions),
-            'total_buy_amount': total_buy_amount,
-            'total_sell_amount': total_sell_amount,
-            'reason_statistics': reason_stats,
-            'all_transactions': [t.to_dict() for t in transactions]
-        }
\ No newline at end of file
+        Returns:
+            交易汇总（见 TransactionLedger.summarize），无交易时为空字典
+        """
+        if not isinstance(transactions, TransactionLedger):
+            transactions = TransactionLedger.from_transactions(list(transactions))
+        return transactions.summarize()
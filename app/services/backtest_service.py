@@ -3,11 +3,15 @@
 处理回测业务逻辑
 """
 import uuid
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime
 from app.dao.stock_data_dao import StockDataDAO
+from app.services.market_data import MarketData
+from app.services.job_service import report_progress, PROGRESS_COMPUTING
 from app.utils.financial_calculator import FinancialCalculator
 from app.services.rebalancing_service import RebalancingService
+from app.utils.result_cache import ResultCache, make_result_key
+from app.utils.downsample import downsample_records, downsampled_series, resolve_max_points
 from app.core.config import settings
 
 
@@ -18,6 +22,7 @@ class BacktestService:
         self.stock_dao = StockDataDAO()
         self.calculator = FinancialCalculator()
         self.rebalancing_service = RebalancingService()
+        self.result_cache = ResultCache(settings.result_cache_max_entries, settings.cache_ttl)
     
     def run_backtest(self, portfolio_config: Dict) -> Dict:
         """
@@ -31,7 +36,8 @@ class BacktestService:
                     'end_date': '2020-12-31',
                     'initial_amount': 10000.0,
                     'rebalance_frequency': 'quarterly',
-                    'benchmark': 'SPY'  # 可选基准
+                    'benchmark': 'SPY',  # 可选基准
+                    'max_points': 500  # 可选，返回时间序列的最大点数（LTTB降采样），0为完整序列
                 }
         
         Returns:
@@ -41,13 +47,25 @@ class BacktestService:
             # 1. 验证配置
             self._validate_config(portfolio_config)
             
-            # 2. 获取股票数据
             symbols = [asset['symbol'] for asset in portfolio_config['assets']]
-            stock_data = self.stock_dao.get_multiple_stocks_data(
-                symbols,
+            benchmark = portfolio_config.get('benchmark')
+            load_symbols = symbols + [benchmark] if benchmark and benchmark not in symbols else symbols
+            
+            # 相同配置且行情数据未变化时直接返回缓存结果
+            cache_key = self._result_cache_key(portfolio_config, load_symbols)
+            if cache_key is not None:
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    return self._from_cached_result(cached, portfolio_config)
+            
+            # 2. 获取股票数据（资产与基准一次并发获取，整个请求共用）
+            market_data = MarketData.load(
+                self.stock_dao,
+                load_symbols,
                 portfolio_config['start_date'],
                 portfolio_config['end_date']
             )
+            report_progress(PROGRESS_COMPUTING)
             
             # 3. 构建权重字典
             weights = {
@@ -58,14 +76,9 @@ class BacktestService:
             # 4. 应用再平衡策略（如果指定）
             rebalance_frequency = portfolio_config.get('rebalance_frequency', 'none')
             if rebalance_frequency and rebalance_frequency != 'none':
-                # 获取DataFrame格式的数据用于再平衡计算
-                stock_dataframes = self.stock_dao.get_multiple_stocks_dataframes(
-                    symbols,
-                    portfolio_config['start_date'],
-                    portfolio_config['end_date']
-                )
+                # 再平衡计算与组合计算共用同一份对齐价格面板，不再重复获取
                 portfolio_values = self.rebalancing_service.apply_rebalancing(
-                    stock_dataframes,
+                    market_data.panel(symbols),
                     weights,
                     portfolio_config['initial_amount'],
                     rebalance_frequency
@@ -73,7 +86,7 @@ class BacktestService:
             else:
                 # 不再平衡，使用原有计算方法
                 portfolio_values = self.calculator.calculate_portfolio_values(
-                    stock_data,
+                    market_data.panel(symbols),
                     weights,
                     portfolio_config['initial_amount']
                 )
@@ -85,14 +98,15 @@ class BacktestService:
             annual_returns = self.calculator.calculate_annual_returns(portfolio_values)
             
             # 7. 计算基准对比（如果指定）
+            max_points = resolve_max_points(portfolio_config, settings.chart_max_points)
             benchmark_comparison = None
-            if 'benchmark' in portfolio_config and portfolio_config['benchmark']:
+            if benchmark:
                 benchmark_comparison = self._calculate_benchmark_comparison(
-                    portfolio_config['benchmark'],
-                    portfolio_config['start_date'],
-                    portfolio_config['end_date'],
+                    benchmark,
+                    market_data,
                     portfolio_config['initial_amount'],
-                    portfolio_values
+                    portfolio_values,
+                    max_points
                 )
             
             # 8. 构建返回结果
@@ -124,10 +138,16 @@ class BacktestService:
                 'portfolio_composition': portfolio_config['assets'],
                 'annual_returns': annual_returns,
                 'benchmark_comparison': benchmark_comparison,
-                'time_series': portfolio_values[:100],  # 限制返回数据量
+                # 降采样限制返回数据量，完整序列仅用于持久化
+                **downsampled_series(portfolio_values, max_points),
                 'created_at': datetime.utcnow().isoformat()
             }
             
+            # 加载数据可能更新了版本号，按加载后的版本写入缓存
+            cache_key = self._result_cache_key(portfolio_config, load_symbols)
+            if cache_key is not None:
+                self.result_cache.put(cache_key, result)
+            
             return result
             
         except Exception as e:
@@ -138,6 +158,31 @@ class BacktestService:
                 'created_at': datetime.utcnow().isoformat()
             }
     
+    def _result_cache_key(self, config: Dict, symbols: List[str]) -> Optional[str]:
+        """
+        结果缓存键：规范化配置 + 各股票的行情数据版本
+        
+        Returns:
+            缓存键；未启用缓存或有股票尚无数据版本时为None（不读写结果缓存）
+        """
+        if not settings.cache_enabled:
+            return None
+        data_versions = {}
+        for symbol in symbols:
+            version = self.stock_dao.get_data_version(symbol)
+            if not isinstance(version, int):
+                return None
+            data_versions[symbol] = version
+        return make_result_key('backtest', config, data_versions)
+    
+    def _from_cached_result(self, cached: Dict, config: Dict) -> Dict:
+        """基于缓存结果生成本次请求的结果（新的回测ID与创建时间；缓存返回的是独立副本，可直接修改）"""
+        result = cached
+        result['backtest_id'] = f"bt_{uuid.uuid4().hex[:12]}"
+        result['portfolio_composition'] = config['assets']
+        result['created_at'] = datetime.utcnow().isoformat()
+        return result
+    
     def _validate_config(self, config: Dict):
         """验证配置"""
         # 验证必需字段
@@ -165,15 +210,16 @@ class BacktestService:
         if config['initial_amount'] > settings.max_initial_amount:
             raise ValueError(f"Maximum initial amount is ${settings.max_initial_amount}")
     
-    def _calculate_benchmark_comparison(self, benchmark_symbol: str, start_date: str, 
-                                       end_date: str, initial_amount: float, 
-                                       portfolio_values: List[Dict]) -> Dict:
+    def _calculate_benchmark_comparison(self, benchmark_symbol: str, market_data: MarketData,
+                                       initial_amount: float, 
+                                       portfolio_values: List[Dict],
+                                       max_points: Optional[int] = None) -> Dict:
         """计算基准对比"""
         try:
-            # 获取基准数据
-            benchmark_data = self.stock_dao.get_stock_data(benchmark_symbol, start_date, end_date)
+            # 基准数据已随资产数据一起获取
+            benchmark_data = market_data.dataframes([benchmark_symbol]).get(benchmark_symbol)
             
-            if benchmark_data.empty:
+            if benchmark_data is None or benchmark_data.empty:
                 return None
             
             # 计算基准净值
@@ -181,11 +227,15 @@ class BacktestService:
             initial_price = benchmark_data.iloc[0]['Close']
             shares = initial_amount / initial_price
             
+            prev_value = initial_amount
             for _, row in benchmark_data.iterrows():
+                value = row['Close'] * shares
                 benchmark_values.append({
                     'date': row.name.strftime('%Y-%m-%d'),
-                    'value': row['Close'] * shares
+                    'value': value,
+                    'daily_return': (value - prev_value) / prev_value * 100 if prev_value > 0 else 0
                 })
+                prev_value = value
             
             # 计算基准指标
             benchmark_metrics = self.calculator.calculate_risk_metrics(benchmark_values)
@@ -205,7 +255,7 @@ class BacktestService:
                 'tracking_error_pct': self._calculate_tracking_error(portfolio_values, benchmark_values),
                 'information_ratio': self._calculate_information_ratio(portfolio_values, benchmark_values),
                 'correlation': self._calculate_correlation(portfolio_values, benchmark_values),
-                'benchmark_time_series': benchmark_values[:100]  # 限制数据量
+                'benchmark_time_series': downsample_records(benchmark_values, max_points)  # 降采样限制数据量
             }
         except Exception as e:
             print(f"Benchmark comparison error: {e}")
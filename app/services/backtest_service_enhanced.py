@@ -8,22 +8,58 @@ import pandas as pd
 import numpy as np
 
 from app.dao.stock_data_dao import StockDataDAO
+from app.services.market_data import MarketData
+from app.services.job_service import report_progress, PROGRESS_COMPUTING
 from app.utils.financial_calculator import FinancialCalculator
-from app.utils.technical_indicators import TechnicalIndicators
+from app.utils.indicator_pipeline import IndicatorPipeline
+from app.utils.indicator_cache import IndicatorCache
+from app.utils.date_utils import index_to_day_numbers
 from app.services.rebalancing_service import RebalancingService
-from app.models.transaction import Transaction, TransactionType, BuyReason, TransactionAnalyzer
+from app.utils.price_panel import PricePanel
+from app.models.transaction import (
+    TransactionLedger, TransactionType, BuyReason, TransactionAnalyzer, BUY_SIGNAL_PRIORITY
+)
 from app.core.config import settings
 
 
+# 请求未指定买入条件时使用的默认值
+DEFAULT_BUY_CONDITIONS = {
+    'daily_drop_threshold': -0.05,  # 日跌幅5%
+    'drawdown_threshold': -0.10,    # 回撤10%
+    'vix_threshold': 30,             # VIX > 30
+    'rsi_oversold': 30,              # RSI < 30
+    'enable_macd': True,             # 启用MACD金叉
+    'enable_support': True           # 启用支撑位
+}
+
+
+class BacktestRunContext:
+    """
+    单次回测运行的状态
+    
+    每次调用创建一个新的上下文并沿调用链传递，服务对象本身不保存运行状态，
+    同一个服务实例可以被多个线程同时调用
+    """
+    
+    def __init__(self, portfolio_config: Dict):
+        self.portfolio_config = portfolio_config
+        self.transactions = TransactionLedger()
+
+
 class EnhancedBacktestService:
-    """增强版回测服务 - 支持交易记录和买入信号分析"""
+    """
+    增强版回测服务 - 支持交易记录和买入信号分析
+    
+    服务对象只持有无状态组件与线程安全的缓存，可在多线程服务器中共享
+    """
     
     def __init__(self):
         self.stock_dao = StockDataDAO()
         self.calculator = FinancialCalculator()
         self.rebalancing_service = RebalancingService()
         self.transaction_analyzer = TransactionAnalyzer()
-        self.transactions = []
+        self.indicator_pipeline = IndicatorPipeline()
+        self.indicator_cache = IndicatorCache(settings.indicator_cache_max_bytes)
     
     def run_backtest_with_transactions(self, portfolio_config: Dict) -> Dict:
         """
@@ -47,7 +83,7 @@ class EnhancedBacktestService:
                 }
         """
         try:
-            self.transactions = []  # 清空交易记录
+            run = BacktestRunContext(portfolio_config)
             
             # 1. 验证配置
             self._validate_config(portfolio_config)
@@ -55,25 +91,25 @@ class EnhancedBacktestService:
             # 2. 获取股票数据
             symbols = [asset['symbol'] for asset in portfolio_config['assets']]
             
-            # 使用现有的get_multiple_stocks_dataframes方法
-            stock_dataframes_raw = self.stock_dao.get_multiple_stocks_dataframes(
+            market_data = MarketData.load(
+                self.stock_dao,
                 symbols,
                 portfolio_config['start_date'],
                 portfolio_config['end_date']
             )
+            report_progress(PROGRESS_COMPUTING)
             
-            # 计算技术指标
+            # 计算技术指标（返回追加指标列的新DataFrame，不修改请求共享的数据）
+            # 指标结果按数据版本缓存，只调整买入阈值时不重新计算
             stock_dataframes = {}
-            for symbol, df in stock_dataframes_raw.items():
+            for symbol, df in market_data.dataframes(symbols).items():
                 if df is not None and not df.empty:
-                    df = self._calculate_indicators(df)
-                    stock_dataframes[symbol] = df
+                    stock_dataframes[symbol] = self._calculate_indicators(
+                        df, symbol, self.stock_dao.get_data_version(symbol)
+                    )
             
             # 3. 模拟交易过程
-            portfolio_values = self._simulate_trading(
-                stock_dataframes,
-                portfolio_config
-            )
+            portfolio_values = self._simulate_trading(stock_dataframes, run)
             
             # 4. 计算风险收益指标
             risk_metrics = self.calculator.calculate_risk_metrics(portfolio_values)
@@ -82,7 +118,7 @@ class EnhancedBacktestService:
             annual_returns = self.calculator.calculate_annual_returns(portfolio_values)
             
             # 6. 分析交易记录
-            transaction_analysis = self.transaction_analyzer.analyze_transactions(self.transactions)
+            transaction_analysis = self.transaction_analyzer.analyze_transactions(run.transactions)
             
             # 7. 构建返回结果
             backtest_id = f"bt_{uuid.uuid4().hex[:12]}"
@@ -110,7 +146,7 @@ class EnhancedBacktestService:
                     'sortino_ratio': risk_metrics.get('sortino_ratio', 0)
                 },
                 'transaction_summary': transaction_analysis,
-                'transactions': [t.to_dict() for t in self.transactions],
+                'transactions': run.transactions.to_records(),
                 'portfolio_values': portfolio_values,
                 'annual_returns': annual_returns,
                 'created_at': datetime.utcnow().isoformat()
@@ -126,42 +162,33 @@ class EnhancedBacktestService:
                 'created_at': datetime.utcnow().isoformat()
             }
     
-    def _calculate_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """计算技术指标"""
-        # RSI
-        df['RSI'] = TechnicalIndicators.calculate_rsi(df['Close'])
-        
-        # MACD
-        macd_result = TechnicalIndicators.calculate_macd(df['Close'])
-        df['MACD'] = macd_result['macd']
-        df['MACD_Signal'] = macd_result['signal']
-        df['MACD_Histogram'] = macd_result['histogram']
-        
-        # Bollinger Bands
-        bb_result = TechnicalIndicators.calculate_bollinger_bands(df['Close'])
-        df['BB_Upper'] = bb_result['upper']
-        df['BB_Middle'] = bb_result['middle']
-        df['BB_Lower'] = bb_result['lower']
-        
-        # 支撑位和阻力位
-        df['Support'] = df['Low'].rolling(window=20).min()
-        df['Resistance'] = df['High'].rolling(window=20).max()
-        
-        # 日收益率
-        df['Daily_Return'] = df['Close'].pct_change()
+    def _calculate_indicators(self, df: pd.DataFrame, symbol: Optional[str] = None,
+                              data_version: Optional[int] = None) -> pd.DataFrame:
+        """
+        计算技术指标（RSI、MACD、布林带、支撑/阻力位、日收益率、回撤，一次流水线完成）
         
-        # 回撤
-        df['Peak'] = df['Close'].cummax()
-        df['Drawdown'] = (df['Close'] - df['Peak']) / df['Peak']
+        提供股票代码和数据版本时使用指标缓存，否则直接计算
+        """
+        if symbol is None or data_version is None:
+            return self.indicator_pipeline.compute_frame(df)
         
-        return df
+        block = self.indicator_cache.get_or_compute(
+            symbol,
+            data_version,
+            self.indicator_pipeline.cache_key,
+            index_to_day_numbers(df.index),
+            lambda: self.indicator_pipeline.compute_block(df)
+        )
+        return self.indicator_pipeline.attach(df, block)
     
     def _simulate_trading(
         self,
         stock_dataframes: Dict[str, pd.DataFrame],
-        portfolio_config: Dict
+        run: BacktestRunContext
     ) -> List[Dict]:
-        """模拟交易过程"""
+        """模拟交易过程，交易记录写入本次运行的上下文"""
+        portfolio_config = run.portfolio_config
+        transactions = run.transactions
         initial_amount = portfolio_config['initial_amount']
         weights = {
             asset['symbol']: asset['weight'] / 100.0
@@ -169,32 +196,36 @@ class EnhancedBacktestService:
         }
         buy_conditions = portfolio_config.get('buy_conditions', {})
         
-        # 获取所有交易日期
-        all_dates = set()
-        for df in stock_dataframes.values():
-            all_dates.update(df.index)
-        all_dates = sorted(all_dates)
+        # 所有交易日期及逐日信号输入预先对齐为 (日期 × 股票) 数组
+        panel = PricePanel.from_dataframes(stock_dataframes)
+        signal_inputs = self._prepare_signal_inputs(panel, stock_dataframes)
+        days = panel.dates
+        date_strings = panel.date_strings()
+        close = panel.close
+        valid = panel.valid
+        if not valid.any():
+            raise ValueError("No price data available for the selected assets and period")
+        prev_close = signal_inputs['prev_close']
         
         # 初始化投资组合
         cash = initial_amount
-        holdings = {symbol: 0 for symbol in stock_dataframes.keys()}
+        holdings = np.zeros(len(panel.symbols))
         portfolio_values = []
         
         # 初始买入
-        first_date = all_dates[0]
         for symbol, weight in weights.items():
             if symbol in stock_dataframes:
-                df = stock_dataframes[symbol]
-                if first_date in df.index:
-                    price = df.loc[first_date, 'Close']
+                j = panel.symbol_index(symbol)
+                if valid[0, j]:
+                    price = close[0, j]
                     amount_to_invest = initial_amount * weight
                     shares = amount_to_invest / price
-                    holdings[symbol] = shares
+                    holdings[j] = shares
                     cash -= amount_to_invest
                     
                     # 记录初始买入
-                    self._record_transaction(
-                        date=first_date,
+                    transactions.append(
+                        day=days[0],
                         symbol=symbol,
                         transaction_type=TransactionType.BUY,
                         shares=shares,
@@ -207,92 +238,109 @@ class EnhancedBacktestService:
                         portfolio_value_after=initial_amount  # 第一天不变
                     )
         
-        # 遍历每个交易日
-        for date in all_dates:
-            # 计算当前投资组合价值
-            portfolio_value = cash
-            for symbol, shares in holdings.items():
-                if symbol in stock_dataframes and date in stock_dataframes[symbol].index:
-                    price = stock_dataframes[symbol].loc[date, 'Close']
-                    portfolio_value += shares * price
+        # 整段序列一次性计算买入信号，只需遍历有信号的交易日
+        indicators = {name: values for name, values in signal_inputs.items() if name != 'prev_close'}
+        signal_mask, reason_codes, trigger_values = self.transaction_analyzer.evaluate_buy_signals(
+            close, prev_close, indicators, buy_conditions
+        )
+        signal_mask &= valid
+        signal_rows = np.nonzero(signal_mask.any(axis=1))[0]
+        
+        # 每个信号日交易后的持仓与现金快照，第0个为初始建仓后的状态
+        holdings_snapshots = [holdings.copy()]
+        cash_snapshots = [cash]
+        
+        # 持仓估值价格：当日无报价的股票按填充策略沿用之前的价格
+        prices = panel.valuation_prices(settings.price_fill_policy)
+        
+        for t in signal_rows:
+            # 计算当前投资组合价值（买入前）
+            portfolio_value = cash + float(np.dot(holdings, prices[t]))
             
-            # 检查每个资产的买入信号
-            for symbol in stock_dataframes.keys():
-                if date in stock_dataframes[symbol].index:
-                    df = stock_dataframes[symbol]
-                    current_row = df.loc[date]
-                    
-                    # 准备指标数据
-                    indicators = {
-                        'rsi': current_row.get('RSI', 50),
-                        'macd': current_row.get('MACD', 0),
-                        'macd_signal': current_row.get('MACD_Signal', 0),
-                        'support_level': current_row.get('Support', 0),
-                        'drawdown': current_row.get('Drawdown', 0)
-                    }
-                    
-                    # 获取历史价格
-                    price_history = df['Close'][:date].values.tolist()
-                    
-                    # 检查买入信号
-                    should_buy, reason, reason_code, details = self.transaction_analyzer.check_buy_signals(
-                        current_row['Close'],
-                        price_history,
-                        indicators,
-                        buy_conditions
-                    )
-                    
-                    # 如果触发买入信号且有现金
-                    if should_buy and cash > 100:  # 至少100美元才买入
-                        # 计算买入金额（使用剩余现金的一部分）
-                        buy_amount = min(cash * 0.2, cash)  # 每次最多使用20%的现金
-                        shares_to_buy = buy_amount / current_row['Close']
-                        
-                        # 更新持仓和现金
-                        holdings[symbol] += shares_to_buy
-                        cash -= buy_amount
-                        
-                        # 记录交易
-                        self._record_transaction(
-                            date=date,
-                            symbol=symbol,
-                            transaction_type=TransactionType.BUY,
-                            shares=shares_to_buy,
-                            price=current_row['Close'],
-                            amount=buy_amount,
-                            reason=reason,
-                            reason_code=reason_code,
-                            details=details,
-                            portfolio_value_before=portfolio_value,
-                            portfolio_value_after=portfolio_value  # 买入后立即更新
-                        )
+            for j in np.nonzero(signal_mask[t])[0]:
+                # 如果有现金（至少100美元才买入）
+                if cash <= 100:
+                    break
+                
+                price = close[t, j]
+                
+                # 计算买入金额（使用剩余现金的一部分）
+                buy_amount = min(cash * 0.2, cash)  # 每次最多使用20%的现金
+                shares_to_buy = buy_amount / price
+                
+                # 更新持仓和现金
+                holdings[j] += shares_to_buy
+                cash -= buy_amount
+                
+                # 仅对实际成交的信号生成描述
+                reason_code = BUY_SIGNAL_PRIORITY[reason_codes[t, j]]
+                reason, details = self.transaction_analyzer.describe_buy_signal(
+                    reason_code,
+                    price,
+                    trigger_values[t, j],
+                    {name: values[t, j] for name, values in indicators.items()},
+                    buy_conditions
+                )
+                
+                # 记录交易
+                transactions.append(
+                    day=days[t],
+                    symbol=panel.symbols[j],
+                    transaction_type=TransactionType.BUY,
+                    shares=shares_to_buy,
+                    price=price,
+                    amount=buy_amount,
+                    reason=reason,
+                    reason_code=reason_code,
+                    details=details,
+                    portfolio_value_before=portfolio_value,
+                    portfolio_value_after=portfolio_value  # 买入后立即更新
+                )
             
-            # 记录每日投资组合价值
+            holdings_snapshots.append(holdings.copy())
+            cash_snapshots.append(cash)
+        
+        # 每日净值按当日交易前的持仓计算，记录的现金为当日交易后的余额
+        rows = np.arange(len(days))
+        before = np.searchsorted(signal_rows, rows, side='left')
+        after = np.searchsorted(signal_rows, rows, side='right')
+        holdings_snapshots = np.array(holdings_snapshots)
+        cash_snapshots = np.array(cash_snapshots)
+        
+        values = cash_snapshots[before] + np.einsum('tn,tn->t', holdings_snapshots[before], prices)
+        cash_after = cash_snapshots[after]
+        
+        # 记录每日投资组合价值
+        for t in range(len(days)):
             portfolio_values.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'value': portfolio_value,
-                'cash': cash,
-                'holdings_value': portfolio_value - cash
+                'date': date_strings[t],
+                'value': float(values[t]),
+                'cash': float(cash_after[t]),
+                'holdings_value': float(values[t] - cash_after[t])
             })
         
         return portfolio_values
     
-    def _record_transaction(self, **kwargs):
-        """记录交易"""
-        transaction = Transaction(
-            date=kwargs['date'],
-            symbol=kwargs['symbol'],
-            transaction_type=kwargs['transaction_type'],
-            shares=kwargs['shares'],
-            price=kwargs['price'],
-            amount=kwargs['amount'],
-            reason=kwargs['reason'],
-            reason_code=kwargs['reason_code'],
-            details=kwargs['details'],
-            portfolio_value_before=kwargs['portfolio_value_before'],
-            portfolio_value_after=kwargs['portfolio_value_after']
-        )
-        self.transactions.append(transaction)
+    def _prepare_signal_inputs(self, panel: PricePanel,
+                               stock_dataframes: Dict[str, pd.DataFrame]) -> Dict[str, np.ndarray]:
+        """
+        将买入信号所需的指标列按面板日期对齐
+        
+        Returns:
+            {名称: (日期 × 股票) 数组}，prev_close 为该股票自身上一个交易日的收盘价
+        """
+        prev_close_frames = {
+            symbol: df['Close'].shift(1).to_frame('Prev_Close')
+            for symbol, df in stock_dataframes.items()
+        }
+        return {
+            'prev_close': panel.align_frames(prev_close_frames, 'Prev_Close'),
+            'rsi': panel.align_frames(stock_dataframes, 'RSI'),
+            'macd': panel.align_frames(stock_dataframes, 'MACD'),
+            'macd_signal': panel.align_frames(stock_dataframes, 'MACD_Signal'),
+            'support_level': panel.align_frames(stock_dataframes, 'Support'),
+            'drawdown': panel.align_frames(stock_dataframes, 'Drawdown')
+        }
     
     def _validate_config(self, config: Dict):
         """验证配置"""
@@ -3,12 +3,18 @@
 处理定期定投和条件定投的业务逻辑
 """
 import uuid
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
-import pandas as pd
 import numpy as np
 from app.dao.stock_data_dao import StockDataDAO
+from app.services.market_data import MarketData
+from app.services.job_service import report_progress, PROGRESS_COMPUTING
 from app.utils.financial_calculator import FinancialCalculator
+from app.utils.price_panel import PricePanel, as_price_panel
+from app.utils.trading_calendar import get_trading_calendar
+from app.utils.rolling import rolling_max
+from app.utils.downsample import downsampled_series, resolve_max_points
+from app.utils.date_utils import strings_to_day_numbers, day_numbers_to_strings
 from app.utils.technical_indicators import TechnicalIndicators
 from app.core.config import settings
 
@@ -20,6 +26,7 @@ class DCAService:
         self.stock_dao = StockDataDAO()
         self.calculator = FinancialCalculator()
         self.indicators = TechnicalIndicators()
+        self.trading_calendar = get_trading_calendar()
     
     def run_periodic_dca(self, dca_config: Dict) -> Dict:
         """
@@ -36,7 +43,8 @@ class DCAService:
                     'frequency': 'monthly',  # monthly/weekly/biweekly
                     'frequency_config': {
                         'day_of_month': 1  # 每月第几天
-                    }
+                    },
+                    'max_points': 500  # 可选，返回时间序列的最大点数（LTTB降采样），0为完整序列
                 }
         
         Returns:
@@ -45,15 +53,18 @@ class DCAService:
         try:
             # 1. 获取股票数据
             symbols = [asset['symbol'] for asset in dca_config['assets']]
-            stock_data = self.stock_dao.get_multiple_stocks_data(
+            market_data = MarketData.load(
+                self.stock_dao,
                 symbols,
                 dca_config['start_date'],
                 dca_config['end_date']
             )
+            report_progress(PROGRESS_COMPUTING)
             
             # 检查是否有有效数据
-            if not stock_data or all(not data for data in stock_data.values()):
+            if not market_data.has_data():
                 raise ValueError("No valid stock data retrieved")
+            stock_data = market_data.panel(symbols)
             
             # 2. 生成投资日期列表
             investment_dates = self._generate_investment_dates(
@@ -89,7 +100,10 @@ class DCAService:
                 },
                 'performance': metrics,
                 'investment_schedule': investment_dates[:20],  # 前20次投资
-                'time_series': results['time_series'][:100],  # 限制返回数据量
+                # 降采样限制返回数据量，完整序列仅用于持久化
+                **downsampled_series(
+                    results['time_series'], resolve_max_points(dca_config, settings.chart_max_points)
+                ),
                 'created_at': datetime.utcnow().isoformat()
             }
             
@@ -130,15 +144,18 @@ class DCAService:
         try:
             # 1. 获取股票数据
             symbols = [asset['symbol'] for asset in dca_config['assets']]
-            stock_data = self.stock_dao.get_multiple_stocks_data(
+            market_data = MarketData.load(
+                self.stock_dao,
                 symbols,
                 dca_config['start_date'],
                 dca_config['end_date']
             )
+            report_progress(PROGRESS_COMPUTING)
             
             # 检查是否有有效数据
-            if not stock_data or all(not data for data in stock_data.values()):
+            if not market_data.has_data():
                 raise ValueError("No valid stock data retrieved")
+            stock_data = market_data.panel(symbols)
             
             # 2. 检测触发条件
             triggers = self._detect_condition_triggers(
@@ -172,7 +189,10 @@ class DCAService:
                 },
                 'performance': metrics,
                 'triggers': triggers[:20],  # 前20次触发
-                'time_series': results['time_series'][:100],
+                # 降采样限制返回数据量，完整序列仅用于持久化
+                **downsampled_series(
+                    results['time_series'], resolve_max_points(dca_config, settings.chart_max_points)
+                ),
                 'created_at': datetime.utcnow().isoformat()
             }
             
@@ -186,270 +206,201 @@ class DCAService:
     
     def _generate_investment_dates(self, start_date: str, end_date: str, 
                                   frequency: str, config: Dict) -> List[str]:
-        """生成投资日期列表"""
-        dates = []
-        current = pd.to_datetime(start_date)
-        end = pd.to_datetime(end_date)
-        
-        if frequency == 'monthly':
-            day_of_month = config.get('day_of_month', 1)
-            while current <= end:
-                # 设置为每月特定日期
-                investment_date = current.replace(day=min(day_of_month, 
-                                                         current.days_in_month))
-                if investment_date >= pd.to_datetime(start_date) and investment_date <= end:
-                    dates.append(investment_date.strftime('%Y-%m-%d'))
-                current = current + pd.DateOffset(months=1)
-                
-        elif frequency == 'weekly':
-            while current <= end:
-                dates.append(current.strftime('%Y-%m-%d'))
-                current = current + pd.DateOffset(weeks=1)
-                
-        elif frequency == 'biweekly':
-            while current <= end:
-                dates.append(current.strftime('%Y-%m-%d'))
-                current = current + pd.DateOffset(weeks=2)
-                
-        elif frequency == 'daily':
-            while current <= end:
-                # 只在交易日投资
-                if current.weekday() < 5:  # 周一到周五
-                    dates.append(current.strftime('%Y-%m-%d'))
-                current = current + pd.DateOffset(days=1)
-        
-        return dates
+        """生成投资日期列表（遇周末或休市顺延到下一个交易日）"""
+        return self.trading_calendar.schedule_strings(
+            start_date,
+            end_date,
+            frequency,
+            config.get('day_of_month', 1)
+        )
     
-    def _calculate_dca_returns(self, stock_data: Dict, assets: List[Dict], 
+    def _calculate_dca_returns(self, stock_data: Union[PricePanel, Dict], assets: List[Dict], 
                               initial_amount: float, investment_amount: float,
                               investment_dates: List[str]) -> Dict:
         """计算定投收益"""
-        # 初始化持仓
-        shares = {asset['symbol']: 0 for asset in assets}
-        weights = {asset['symbol']: asset['weight'] / 100.0 for asset in assets}
+        panel = as_price_panel(stock_data)
         
-        total_invested = initial_amount
-        results = []
+        # 投资日映射到面板中当日或之后第一个有价格的交易日
+        contributions = np.zeros(len(panel))
+        rows, found = self._locate_dates(panel, sorted(set(investment_dates)))
+        np.add.at(contributions, rows[found], investment_amount)
         
-        # 获取所有日期的价格数据
-        all_dates = set()
-        for symbol, data in stock_data.items():
-            for row in data:
-                all_dates.add(row['Date'])
-        all_dates = sorted(list(all_dates))
+        return self._simulate_dca(panel, assets, initial_amount, contributions)
+    
+    def _detect_condition_triggers(self, stock_data: Union[PricePanel, Dict], conditions: List[Dict],
+                                  start_date: str, end_date: str) -> List[Dict]:
+        """
+        检测条件触发
         
-        # 构建价格字典
-        price_dict = {}
-        for date in all_dates:
-            price_dict[date] = {}
-            for symbol, data in stock_data.items():
-                for row in data:
-                    if row['Date'] == date:
-                        price_dict[date][symbol] = row['Close']
-                        break
+        各条件的命中日先整体向量化算出，再按 (日期, 条件顺序) 单次扫描处理冷却期，
+        冷却期以距上一次触发（任意类型）的自然日天数判断。
+        """
+        # 计算组合整体表现
+        days, prices = self._portfolio_price_arrays(as_price_panel(stock_data))
+        if len(prices) < 2:
+            return []
         
-        # 初始投资
-        if initial_amount > 0 and all_dates:
-            first_date = all_dates[0]
-            for symbol, weight in weights.items():
-                if symbol in price_dict[first_date]:
-                    investment = initial_amount * weight
-                    shares[symbol] = investment / price_dict[first_date][symbol]
+        current_prices = prices[1:]
+        prev_prices = prices[:-1]
         
-        # 执行定投
-        for date in all_dates:
-            # 检查是否是投资日
-            if date in investment_dates:
-                # 按权重买入
-                for symbol, weight in weights.items():
-                    if symbol in price_dict[date]:
-                        investment = investment_amount * weight
-                        shares[symbol] += investment / price_dict[date][symbol]
-                total_invested += investment_amount
-            
-            # 计算当前组合价值
-            portfolio_value = 0
-            for symbol, num_shares in shares.items():
-                if symbol in price_dict[date]:
-                    portfolio_value += num_shares * price_dict[date][symbol]
+        # 每个条件：命中行号（对应 prices[1:]）、触发值、阈值、冷却天数
+        candidates = []
+        for order, condition in enumerate(conditions):
+            if condition['type'] == 'price_drop':
+                drop_pct = (prev_prices - current_prices) / prev_prices * 100
+                threshold = condition['config']['drop_percentage']
+                hits = np.nonzero(drop_pct >= threshold)[0]
+                candidates.append((order, hits, drop_pct[hits], threshold,
+                                   condition['config'].get('cooldown_days', 0)))
             
-            results.append({
-                'date': date,
-                'invested': total_invested,
-                'value': portfolio_value,
-                'return_pct': ((portfolio_value - total_invested) / total_invested * 100) 
-                            if total_invested > 0 else 0
-            })
+            elif condition['type'] == 'drawdown':
+                # 回看期内最高价（含当日）
+                lookback = condition['config'].get('lookback_days', 252)
+                max_prices = np.maximum(rolling_max(prices, lookback + 1, min_periods=1)[1:], 0)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    drawdown = (max_prices - current_prices) / max_prices * 100
+                threshold = condition['config']['drawdown_threshold']
+                hits = np.nonzero(drawdown >= threshold)[0]
+                candidates.append((order, hits, drawdown[hits], threshold, 7))
         
-        return {
-            'time_series': results,
-            'final_shares': shares,
-            'total_invested': total_invested
-        }
-    
-    def _detect_condition_triggers(self, stock_data: Dict, conditions: List[Dict],
-                                  start_date: str, end_date: str) -> List[Dict]:
-        """检测条件触发"""
-        triggers = []
+        if not candidates:
+            return []
         
-        # 计算组合整体表现
-        portfolio_prices = self._calculate_portfolio_prices(stock_data)
+        # 按日期、再按条件顺序排列所有命中
+        rows = np.concatenate([hits for _, hits, _, _, _ in candidates])
+        orders = np.concatenate([np.full(len(hits), order) for order, hits, _, _, _ in candidates])
+        values = np.concatenate([hit_values for _, _, hit_values, _, _ in candidates])
+        by_order = {order: (threshold, cooldown) for order, _, _, threshold, cooldown in candidates}
+        sequence = np.lexsort((orders, rows))
         
-        for i in range(1, len(portfolio_prices)):
-            date = portfolio_prices[i]['date']
-            current_price = portfolio_prices[i]['price']
-            prev_price = portfolio_prices[i-1]['price']
+        date_strings = day_numbers_to_strings(days[1:][rows[sequence]])
+        triggers = []
+        last_day = None
+        for (row, order, value), date in zip(
+            zip(rows[sequence].tolist(), orders[sequence].tolist(), values[sequence].tolist()), date_strings
+        ):
+            threshold, cooldown = by_order[order]
+            day = int(days[row + 1])
+            if last_day is not None and day - last_day < cooldown:
+                continue
             
-            for condition in conditions:
-                if condition['type'] == 'price_drop':
-                    drop_pct = (prev_price - current_price) / prev_price * 100
-                    threshold = condition['config']['drop_percentage']
-                    
-                    if drop_pct >= threshold:
-                        # 检查冷却期
-                        cooldown = condition['config'].get('cooldown_days', 0)
-                        if not triggers or self._check_cooldown(date, triggers[-1]['date'], cooldown):
-                            triggers.append({
-                                'date': date,
-                                'type': 'price_drop',
-                                'trigger_value': drop_pct,
-                                'threshold': threshold,
-                                'amount': condition['config']['amount']
-                            })
-                
-                elif condition['type'] == 'drawdown':
-                    # 计算回撤
-                    lookback = condition['config'].get('lookback_days', 252)
-                    max_price = self._get_max_price(portfolio_prices, i, lookback)
-                    drawdown = (max_price - current_price) / max_price * 100
-                    threshold = condition['config']['drawdown_threshold']
-                    
-                    if drawdown >= threshold:
-                        if not triggers or self._check_cooldown(date, triggers[-1]['date'], 7):
-                            triggers.append({
-                                'date': date,
-                                'type': 'drawdown',
-                                'trigger_value': drawdown,
-                                'threshold': threshold,
-                                'amount': condition['config'].get('amount', 1000)
-                            })
+            condition = conditions[order]
+            triggers.append({
+                'date': date,
+                'type': condition['type'],
+                'trigger_value': value,
+                'threshold': threshold,
+                'amount': (condition['config']['amount'] if condition['type'] == 'price_drop'
+                           else condition['config'].get('amount', 1000))
+            })
+            last_day = day
         
         return triggers
     
-    def _calculate_conditional_dca_returns(self, stock_data: Dict, assets: List[Dict],
+    def _calculate_conditional_dca_returns(self, stock_data: Union[PricePanel, Dict], assets: List[Dict],
                                           initial_amount: float, triggers: List[Dict]) -> Dict:
         """计算条件定投收益"""
-        # 初始化持仓
-        shares = {asset['symbol']: 0 for asset in assets}
-        weights = {asset['symbol']: asset['weight'] / 100.0 for asset in assets}
+        panel = as_price_panel(stock_data)
         
-        total_invested = initial_amount
-        results = []
+        # 将触发器转换为日期字典（同一日期以最后一次触发为准）
+        trigger_dict = {t['date']: t for t in triggers}
+        trigger_dates = list(trigger_dict.keys())
         
-        # 获取所有日期的价格数据
-        all_dates = set()
-        for symbol, data in stock_data.items():
-            for row in data:
-                all_dates.add(row['Date'])
-        all_dates = sorted(list(all_dates))
+        contributions = np.zeros(len(panel))
+        triggered = np.zeros(len(panel), dtype=bool)
+        rows, found = self._locate_dates(panel, trigger_dates)
+        contributions[rows[found]] = [trigger_dict[date]['amount'] for date, hit in zip(trigger_dates, found) if hit]
+        triggered[rows[found]] = True
         
-        # 构建价格字典
-        price_dict = {}
-        for date in all_dates:
-            price_dict[date] = {}
-            for symbol, data in stock_data.items():
-                for row in data:
-                    if row['Date'] == date:
-                        price_dict[date][symbol] = row['Close']
-                        break
+        results = self._simulate_dca(panel, assets, initial_amount, contributions)
+        for point, flag in zip(results['time_series'], triggered.tolist()):
+            point['triggered'] = flag
+        return results
+    
+    def _locate_dates(self, panel: PricePanel, dates: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        用 searchsorted 将日期批量映射到面板中当日或之后的第一行
         
-        # 初始投资
-        if initial_amount > 0 and all_dates:
-            first_date = all_dates[0]
-            for symbol, weight in weights.items():
-                if symbol in price_dict[first_date]:
-                    investment = initial_amount * weight
-                    shares[symbol] = investment / price_dict[first_date][symbol]
+        Returns:
+            (行号, 是否落在面板范围内)
+        """
+        days = strings_to_day_numbers(dates) if dates else np.empty(0, dtype=np.int64)
+        rows = np.searchsorted(panel.dates, days, side='left')
+        return rows, rows < len(panel)
+    
+    def _simulate_dca(self, panel: PricePanel, assets: List[Dict], initial_amount: float,
+                      contributions: np.ndarray) -> Dict:
+        """
+        向量化计算定投持仓与净值
         
-        # 将触发器转换为日期字典
-        trigger_dict = {t['date']: t for t in triggers}
+        每笔投入按权重买入当日有价格的股票，累计持股由 cumsum 得到，
+        每日净值为累计持股与当日价格的逐行点积。
         
-        # 执行条件定投
-        for date in all_dates:
-            # 检查是否触发条件
-            if date in trigger_dict:
-                trigger = trigger_dict[date]
-                investment_amount = trigger['amount']
-                
-                # 按权重买入
-                for symbol, weight in weights.items():
-                    if symbol in price_dict[date]:
-                        investment = investment_amount * weight
-                        shares[symbol] += investment / price_dict[date][symbol]
-                total_invested += investment_amount
-            
-            # 计算当前组合价值
-            portfolio_value = 0
-            for symbol, num_shares in shares.items():
-                if symbol in price_dict[date]:
-                    portfolio_value += num_shares * price_dict[date][symbol]
-            
-            results.append({
+        Args:
+            panel: 价格面板
+            assets: 资产配置
+            initial_amount: 首个交易日的初始投资
+            contributions: 每个交易日的投入金额，形状 (D,)，不投资为0
+        """
+        weights = {asset['symbol']: asset['weight'] / 100.0 for asset in assets}
+        final_shares = {asset['symbol']: 0 for asset in assets}
+        if panel.empty:
+            return {'time_series': [], 'final_shares': final_shares, 'total_invested': initial_amount}
+        
+        # 面板列顺序的权重，不在配置中的股票权重为0
+        weight_vector = np.array([weights.get(symbol, 0.0) for symbol in panel.symbols])
+        prices = np.where(panel.valid, panel.close, np.inf)
+        
+        # 每个交易日的买入金额（首日包含初始投资），无价格的股票不买入
+        spend = contributions.astype(np.float64)
+        if initial_amount > 0:
+            spend[0] += initial_amount
+        shares_bought = spend[:, None] * weight_vector[None, :] / prices
+        shares = np.cumsum(shares_bought, axis=0)
+        
+        invested = initial_amount + np.cumsum(contributions)
+        values = np.einsum('tn,tn->t', shares, panel.valuation_prices(settings.price_fill_policy))
+        return_pct = np.zeros_like(values)
+        np.divide(values - invested, invested, out=return_pct, where=invested > 0)
+        return_pct *= 100
+        
+        results = [
+            {
                 'date': date,
                 'invested': total_invested,
-                'value': portfolio_value,
-                'return_pct': ((portfolio_value - total_invested) / total_invested * 100) 
-                            if total_invested > 0 else 0,
-                'triggered': date in trigger_dict
-            })
+                'value': value,
+                'return_pct': pct
+            }
+            for date, total_invested, value, pct in zip(
+                panel.date_strings(), invested.tolist(), values.tolist(), return_pct.tolist()
+            )
+        ]
+        
+        for j, symbol in enumerate(panel.symbols):
+            if symbol in final_shares:
+                final_shares[symbol] = float(shares[-1, j])
         
         return {
             'time_series': results,
-            'final_shares': shares,
-            'total_invested': total_invested
+            'final_shares': final_shares,
+            'total_invested': float(invested[-1])
         }
     
-    def _calculate_portfolio_prices(self, stock_data: Dict) -> List[Dict]:
-        """计算投资组合加权价格序列"""
-        # 简化处理：等权重计算
-        all_dates = set()
-        for symbol, data in stock_data.items():
-            for row in data:
-                all_dates.add(row['Date'])
-        all_dates = sorted(list(all_dates))
+    def _portfolio_price_arrays(self, panel: PricePanel) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        投资组合加权价格序列（数组形式）
         
-        portfolio_prices = []
-        for date in all_dates:
-            total_price = 0
-            count = 0
-            for symbol, data in stock_data.items():
-                for row in data:
-                    if row['Date'] == date:
-                        total_price += row['Close']
-                        count += 1
-                        break
-            if count > 0:
-                portfolio_prices.append({
-                    'date': date,
-                    'price': total_price / count
-                })
+        Returns:
+            (日期天数, 价格)，仅包含至少一只股票有价格的交易日
+        """
+        # 简化处理：等权重计算（当日有价格的股票取平均）
+        if panel.empty:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
         
-        return portfolio_prices
-    
-    def _check_cooldown(self, current_date: str, last_trigger_date: str, cooldown_days: int) -> bool:
-        """检查冷却期"""
-        current = pd.to_datetime(current_date)
-        last = pd.to_datetime(last_trigger_date)
-        return (current - last).days >= cooldown_days
-    
-    def _get_max_price(self, prices: List[Dict], current_idx: int, lookback_days: int) -> float:
-        """获取回看期内的最高价格"""
-        start_idx = max(0, current_idx - lookback_days)
-        max_price = 0
-        for i in range(start_idx, current_idx + 1):
-            if prices[i]['price'] > max_price:
-                max_price = prices[i]['price']
-        return max_price
+        counts = panel.valid.sum(axis=1)
+        totals = np.where(panel.valid, panel.close, 0.0).sum(axis=1)
+        has_price = counts > 0
+        return panel.dates[has_price], totals[has_price] / counts[has_price]
     
     def _calculate_dca_metrics(self, results: Dict) -> Dict:
         """计算定投统计指标"""
@@ -0,0 +1,482 @@
+"""
+异步回测任务服务
+提交回测任务后立即返回任务ID，由常驻工作进程池执行，调用方轮询状态与结果。
+任务在父进程的本地队列中排队，只派发给空闲的工作进程；
+运行中的任务被取消或超时时终止对应的工作进程并补充一个新进程，不影响其他任务。
+任务执行中由工作进程经同一管道回传粗粒度进度（数据加载完成、计算完成、结束）。
+
+任务状态只保存在提交任务的 Web 进程内存中：部署时 Web 服务只能运行一个进程（可多线程），
+多进程部署时轮询请求可能落到其他进程而查不到任务。
+"""
+import atexit
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.utils.downsample import without_full_series
+
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+JOB_TIMEOUT = 'timeout'
+
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED, JOB_TIMEOUT)
+
+
+class JobQueueFullError(Exception):
+    """排队任务数达到上限"""
+
+
+# ---------- 工作进程内执行的任务函数 ----------
+
+# 工作进程内的服务实例（每个进程首次使用时创建）
+_worker_services: Dict[str, Any] = {}
+
+# 工作进程当前执行的任务 (连接, 任务ID)，供 report_progress 使用
+_current_job: Optional[tuple] = None
+
+# 任务进度阶段：排队/加载行情数据时为0，数据加载完成开始计算、计算完成开始保存结果，完成时为1
+PROGRESS_COMPUTING = 0.25
+PROGRESS_SAVING = 0.75
+
+
+def _service(name: str):
+    if name not in _worker_services:
+        if name == 'backtest':
+            from app.services.backtest_service import BacktestService
+            _worker_services[name] = BacktestService()
+        elif name == 'enhanced':
+            from app.services.backtest_service_enhanced import EnhancedBacktestService
+            _worker_services[name] = EnhancedBacktestService()
+        elif name == 'dca':
+            from app.services.dca_service import DCAService
+            _worker_services[name] = DCAService()
+        elif name == 'dao':
+            from app.dao.backtest_dao import BacktestDAO
+            _worker_services[name] = BacktestDAO(hot_cache_size=0)
+    return _worker_services[name]
+
+
+def _save_result(result: Dict) -> Dict:
+    """
+    持久化已完成的回测结果（含完整时间序列），之后可按 backtest_id 查询；保存失败不影响任务结果
+
+    Returns:
+        去掉完整时间序列后作为任务结果的字典
+    """
+    if isinstance(result, dict) and result.get('status') == 'completed':
+        report_progress(PROGRESS_SAVING)
+        try:
+            _service('dao').save_backtest(result)
+        except Exception as e:
+            print(f"Warning: Failed to save backtest {result.get('backtest_id') or result.get('dca_id')}: {e}")
+    return without_full_series(result) if isinstance(result, dict) else result
+
+
+def run_backtest_job(config: Dict) -> Dict:
+    return _save_result(_service('backtest').run_backtest(config))
+
+
+def run_enhanced_backtest_job(config: Dict) -> Dict:
+    return _save_result(_service('enhanced').run_backtest_with_transactions(config))
+
+
+def run_periodic_dca_job(config: Dict) -> Dict:
+    return _save_result(_service('dca').run_periodic_dca(config))
+
+
+def run_conditional_dca_job(config: Dict) -> Dict:
+    return _save_result(_service('dca').run_conditional_dca(config))
+
+
+DEFAULT_JOB_HANDLERS: Dict[str, Callable[[Dict], Dict]] = {
+    'backtest': run_backtest_job,
+    'enhanced_backtest': run_enhanced_backtest_job,
+    'dca_periodic': run_periodic_dca_job,
+    'dca_conditional': run_conditional_dca_job,
+}
+
+
+def report_progress(fraction: float):
+    """在任务函数中报告进度（0~1），不在工作进程中调用时忽略"""
+    if _current_job is not None:
+        conn, job_id = _current_job
+        conn.send(('progress', job_id, min(max(float(fraction), 0.0), 1.0)))
+
+
+def _worker_main(conn, handlers: Dict[str, Callable[[Dict], Dict]]):
+    """工作进程主循环：接收任务、执行并回传结果，收到 None 时退出"""
+    global _current_job
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+
+        job_id, job_type, payload = task
+        _current_job = (conn, job_id)
+        try:
+            result = handlers[job_type](payload)
+            conn.send(('done', job_id, result))
+        except Exception as e:
+            conn.send(('error', job_id, str(e)))
+        finally:
+            _current_job = None
+
+
+# ---------- 父进程中的任务管理 ----------
+
+class Job:
+    """任务记录"""
+
+    def __init__(self, job_type: str, payload: Dict):
+        self.job_id = f"job_{uuid.uuid4().hex[:12]}"
+        self.job_type = job_type
+        self.payload = payload
+        self.status = JOB_QUEUED
+        self.progress = 0.0
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> Dict:
+        """任务状态（不含结果）"""
+        return {
+            'job_id': self.job_id,
+            'type': self.job_type,
+            'status': self.status,
+            'progress': round(self.progress, 4),
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class _Worker:
+    """工作进程句柄"""
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.job_id: Optional[str] = None
+        self.deadline: Optional[float] = None
+        self.kill_reason: Optional[str] = None
+
+
+class JobManager:
+    """
+    任务管理器
+
+    Examples:
+        manager = JobManager()
+        job_id = manager.submit('enhanced_backtest', config)
+        manager.get(job_id)      # {'status': 'running', 'progress': ...}
+        manager.result(job_id)   # 完成后为回测结果
+    """
+
+    def __init__(self, handlers: Optional[Dict[str, Callable[[Dict], Dict]]] = None,
+                 max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                 queue_limit: Optional[int] = None, retention: Optional[int] = None,
+                 start_method: Optional[str] = None):
+        """
+        Args:
+            handlers: {任务类型: 任务函数}，任务函数须为模块级函数（可被子进程导入）
+            max_workers: 工作进程数
+            timeout: 单个任务的最长运行秒数，默认使用 calculation_timeout
+            queue_limit: 最多排队的任务数
+            retention: 最多保留的已结束任务数（超出时丢弃最早的）
+            start_method: 工作进程启动方式（spawn / fork / forkserver）
+        """
+        self.handlers = handlers or DEFAULT_JOB_HANDLERS
+        self.max_workers = max_workers or settings.job_workers
+        self.timeout = timeout or settings.calculation_timeout
+        self.queue_limit = queue_limit or settings.job_queue_limit
+        self.retention = retention or settings.job_retention
+        self._context = multiprocessing.get_context(start_method or settings.job_start_method)
+
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._pending: deque = deque()
+        self._workers: List[_Worker] = []
+        self._lock = threading.RLock()
+        self._monitor: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def submit(self, job_type: str, payload: Dict) -> str:
+        """
+        提交任务
+
+        Returns:
+            任务ID
+
+        Raises:
+            ValueError: 任务类型不支持
+            JobQueueFullError: 排队任务过多
+        """
+        if job_type not in self.handlers:
+            raise ValueError(f"Unsupported job type: {job_type}")
+
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("Job manager has been shut down")
+            if len(self._pending) >= self.queue_limit:
+                raise JobQueueFullError(f"Too many queued jobs (limit {self.queue_limit})")
+
+            job = Job(job_type, payload)
+            self._jobs[job.job_id] = job
+            self._pending.append(job.job_id)
+            self._ensure_started()
+            self._dispatch()
+            return job.job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """任务状态，任务不存在时返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def result(self, job_id: str) -> Optional[Dict]:
+        """任务结果，未完成或不存在时返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.result if job else None
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消任务：排队中的直接移出队列，运行中的终止其工作进程
+
+        Returns:
+            是否取消成功（已结束或不存在的任务返回False）
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+
+            if job.status == JOB_QUEUED:
+                self._pending.remove(job_id)
+            else:
+                for worker in self._workers:
+                    if worker.job_id == job_id:
+                        worker.kill_reason = JOB_CANCELLED
+            self._finish(job, JOB_CANCELLED, error='Job cancelled')
+            return True
+
+    def shutdown(self):
+        """停止所有工作进程，未结束的任务标记为取消"""
+        with self._lock:
+            self._stopped = True
+            for job in self._jobs.values():
+                if not job.finished:
+                    self._finish(job, JOB_CANCELLED, error='Job manager shut down')
+            self._pending.clear()
+            workers, self._workers = self._workers, []
+
+        self._stop_workers(workers)
+        if self._monitor is not None and self._monitor is not threading.current_thread():
+            self._monitor.join(timeout=2)
+
+    def _stop_workers(self, workers: List[_Worker]):
+        """通知工作进程退出，未及时退出的强制终止（不持有锁）"""
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in workers:
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+            worker.conn.close()
+
+    def _ensure_started(self):
+        if self._monitor is None:
+            self._workers = [self._spawn_worker() for _ in range(self.max_workers)]
+            self._monitor = threading.Thread(target=self._monitor_loop, name='job-monitor', daemon=True)
+            self._monitor.start()
+
+    def _spawn_worker(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, self.handlers), daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _dispatch(self):
+        """把排队任务派发给空闲的工作进程（调用方持有锁）"""
+        for worker in self._workers:
+            if not self._pending:
+                break
+            if worker.job_id is not None or worker.kill_reason is not None:
+                continue
+
+            while self._pending:
+                job = self._jobs.get(self._pending.popleft())
+                if job is not None and job.status == JOB_QUEUED:
+                    break
+            else:
+                break
+
+            worker.conn.send((job.job_id, job.job_type, job.payload))
+            worker.job_id = job.job_id
+            worker.deadline = time.monotonic() + self.timeout
+            job.status = JOB_RUNNING
+            job.started_at = datetime.utcnow()
+
+    def _monitor_loop(self):
+        """接收工作进程消息，处理超时、取消与进程异常退出"""
+        while True:
+            with self._lock:
+                if self._stopped:
+                    return
+                conns = [worker.conn for worker in self._workers]
+
+            try:
+                ready = wait(conns, timeout=0.1)
+            except (OSError, ValueError):
+                # 关闭过程中连接已被释放
+                ready = []
+
+            for conn in ready:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    message = None
+                with self._lock:
+                    if not self._stopped:
+                        self._handle_message(conn, message)
+
+            with self._lock:
+                if self._stopped:
+                    return
+                retired = self._reap_workers()
+                self._dispatch()
+
+            if retired:
+                self._replace_workers(retired)
+
+    def _handle_message(self, conn, message: Optional[tuple]):
+        worker = next((w for w in self._workers if w.conn is conn), None)
+        if worker is None:
+            return
+        if message is None:
+            # 工作进程异常退出
+            worker.kill_reason = worker.kill_reason or JOB_FAILED
+            return
+
+        kind, job_id, value = message
+        job = self._jobs.get(job_id)
+        if kind == 'progress':
+            if job is not None and job.status == JOB_RUNNING:
+                job.progress = value
+            return
+
+        worker.job_id = None
+        worker.deadline = None
+        if job is None or job.status != JOB_RUNNING:
+            return
+        if kind == 'done':
+            failed = isinstance(value, dict) and value.get('status') == 'failed'
+            self._finish(job, JOB_FAILED if failed else JOB_COMPLETED, result=value,
+                         error=value.get('error') if failed else None)
+        else:
+            self._finish(job, JOB_FAILED, error=value)
+
+    def _reap_workers(self) -> List[_Worker]:
+        """
+        摘除超时、被取消或已退出的工作进程并结束其任务（调用方持有锁）
+
+        Returns:
+            被摘除的工作进程，由 _replace_workers 在锁外终止并补充
+        """
+        now = time.monotonic()
+        retired = []
+        for worker in self._workers:
+            if worker.kill_reason is None and worker.deadline is not None and now > worker.deadline:
+                worker.kill_reason = JOB_TIMEOUT
+            if worker.kill_reason is None and not worker.process.is_alive():
+                worker.kill_reason = JOB_FAILED
+            if worker.kill_reason is None:
+                continue
+
+            job = self._jobs.get(worker.job_id) if worker.job_id else None
+            if job is not None and not job.finished:
+                if worker.kill_reason == JOB_TIMEOUT:
+                    self._finish(job, JOB_TIMEOUT, error=f"Job exceeded {self.timeout} seconds")
+                else:
+                    self._finish(job, JOB_FAILED, error='Worker process exited unexpectedly')
+            retired.append(worker)
+
+        if retired:
+            self._workers = [worker for worker in self._workers if worker not in retired]
+        return retired
+
+    def _replace_workers(self, retired: List[_Worker]):
+        """终止被摘除的工作进程并补充同样数量的新进程（不持有锁，进程回收与启动期间不阻塞提交和查询）"""
+        for worker in retired:
+            worker.process.terminate()
+            worker.process.join()
+            worker.conn.close()
+        spawned = [self._spawn_worker() for _ in retired]
+
+        with self._lock:
+            if not self._stopped:
+                self._workers.extend(spawned)
+                self._dispatch()
+                return
+        self._stop_workers(spawned)
+
+    def _finish(self, job: Job, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        if status == JOB_COMPLETED:
+            job.progress = 1.0
+        self._trim_finished()
+
+    def _trim_finished(self):
+        """只保留最近 retention 个已结束的任务"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.retention, 0)]:
+            del self._jobs[job_id]
+
+
+_default_manager: Optional[JobManager] = None
+_default_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """
+    获取进程内共享的任务管理器（首次提交任务时才启动工作进程）
+
+    每个 Web 进程各有一个管理器，任务只能在提交它的进程中查询，见模块说明。
+    """
+    global _default_manager
+    if _default_manager is None:
+        with _default_manager_lock:
+            if _default_manager is None:
+                _default_manager = JobManager()
+                atexit.register(_default_manager.shutdown)
+    return _default_manager
@@ -0,0 +1,85 @@
+"""
+请求级行情数据
+每次回测请求只获取一次数据，各计算引擎共享同一份数据的不同视图
+"""
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from app.dao.price_store import empty_columns
+from app.dao.stock_data_dao import StockDataDAO
+from app.utils.date_utils import day_numbers_to_index
+from app.utils.price_panel import PricePanel
+
+
+class MarketData:
+    """单次请求内共享的行情数据"""
+
+    def __init__(self, stock_columns: Dict[str, Dict[str, np.ndarray]]):
+        """
+        Args:
+            stock_columns: 列式股票数据 {symbol: {'Date': int64天数数组, 'Close': 数组, ...}}
+        """
+        self.stock_columns = stock_columns
+        self._dataframes: Optional[Dict[str, pd.DataFrame]] = None
+        self._panels: Dict[tuple, PricePanel] = {}
+
+    @classmethod
+    def load(cls, stock_dao: StockDataDAO, symbols: List[str],
+             start_date: str, end_date: str) -> 'MarketData':
+        """
+        通过缓存获取一次请求所需的全部股票数据（多只股票并发获取，保持列式格式）
+
+        Args:
+            stock_dao: 股票数据访问对象
+            symbols: 股票代码列表（可包含基准）
+            start_date: 开始日期
+            end_date: 结束日期
+        """
+        columns, errors = stock_dao.get_multiple_stocks_columns(symbols, start_date, end_date)
+        stock_columns = {}
+        for symbol in symbols:
+            if symbol in columns:
+                stock_columns[symbol] = columns[symbol]
+            else:
+                # 记录错误但继续处理其他股票
+                print(f"Error fetching {symbol}: {errors.get(symbol)}")
+                stock_columns[symbol] = empty_columns()
+        return cls(stock_columns)
+
+    def has_data(self) -> bool:
+        """是否至少有一只股票获取到数据"""
+        return any(len(columns['Date']) for columns in self.stock_columns.values())
+
+    def dataframes(self, symbols: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+        """
+        DataFrame视图 {symbol: DataFrame}，以日期为索引，仅包含有数据的股票
+
+        同一请求内只构建一次
+        """
+        if self._dataframes is None:
+            self._dataframes = {}
+            for symbol, columns in self.stock_columns.items():
+                if not len(columns['Date']):
+                    continue
+                self._dataframes[symbol] = pd.DataFrame(
+                    {name: np.asarray(values) for name, values in columns.items() if name != 'Date'},
+                    index=day_numbers_to_index(columns['Date'])
+                )
+
+        if symbols is None:
+            return self._dataframes
+        return {symbol: self._dataframes[symbol] for symbol in symbols if symbol in self._dataframes}
+
+    def panel(self, symbols: Optional[List[str]] = None) -> PricePanel:
+        """
+        对齐价格面板（日期 × 股票），日期索引为所选股票日期的并集
+
+        同一请求内相同股票组合只构建一次
+        """
+        key = tuple(symbols) if symbols is not None else tuple(self.stock_columns.keys())
+        if key not in self._panels:
+            self._panels[key] = PricePanel.from_columns(
+                {symbol: self.stock_columns[symbol] for symbol in key if symbol in self.stock_columns}
+            )
+        return self._panels[key]
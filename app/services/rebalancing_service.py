@@ -2,22 +2,24 @@
 再平衡服务
 处理投资组合再平衡逻辑
 """
-from typing import Dict, List
-from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
 import pandas as pd
 import numpy as np
+from app.core.config import settings
+from app.utils.price_panel import PricePanel, as_price_panel
+from app.utils.trading_calendar import TradingCalendar
 
 
 class RebalancingService:
     """再平衡服务"""
     
-    def apply_rebalancing(self, stock_data: Dict[str, pd.DataFrame], weights: Dict[str, float],
+    def apply_rebalancing(self, stock_data: Union[PricePanel, Dict[str, pd.DataFrame]], weights: Dict[str, float],
                           initial_amount: float, frequency: str) -> List[Dict]:
         """
         应用再平衡策略
         
         Args:
-            stock_data: 股票价格数据
+            stock_data: 价格面板，或股票价格数据 {symbol: DataFrame}
             weights: 目标权重
             initial_amount: 初始金额
             frequency: 再平衡频率 ('none', 'yearly', 'quarterly', 'monthly')
@@ -25,178 +27,143 @@ class RebalancingService:
         Returns:
             包含再平衡后的投资组合价值序列
         """
+        panel = as_price_panel(stock_data)
+        
         if frequency == 'none' or not frequency:
-            return self._calculate_no_rebalance(stock_data, weights, initial_amount)
+            return self._calculate_no_rebalance(panel, weights, initial_amount)
         elif frequency == 'yearly':
-            return self._calculate_yearly_rebalance(stock_data, weights, initial_amount)
+            return self._calculate_yearly_rebalance(panel, weights, initial_amount)
         elif frequency == 'quarterly':
-            return self._calculate_quarterly_rebalance(stock_data, weights, initial_amount)
+            return self._calculate_quarterly_rebalance(panel, weights, initial_amount)
         elif frequency == 'monthly':
-            return self._calculate_monthly_rebalance(stock_data, weights, initial_amount)
+            return self._calculate_monthly_rebalance(panel, weights, initial_amount)
         else:
-            return self._calculate_no_rebalance(stock_data, weights, initial_amount)
+            return self._calculate_no_rebalance(panel, weights, initial_amount)
     
-    def _calculate_no_rebalance(self, stock_data: Dict[str, pd.DataFrame], 
+    def _calculate_no_rebalance(self, panel: PricePanel, 
                                 weights: Dict[str, float], initial_amount: float) -> List[Dict]:
         """不再平衡策略"""
-        portfolio_values = []
-        
-        # 初始化每只股票的股数
-        shares = {}
-        first_date = None
-        
-        for symbol, data in stock_data.items():
-            if data.empty:
-                continue
-            if first_date is None:
-                first_date = data.index[0]
-            initial_price = data.iloc[0]['Close']
-            shares[symbol] = (initial_amount * weights[symbol] / 100) / initial_price
-        
-        # 计算每日组合价值
-        date_sets = []
-        for data in stock_data.values():
-            if not data.empty:
-                date_sets.append(set(data.index))
-        
-        if not date_sets:
+        if panel.empty:
             return []
         
-        all_dates = sorted(set.union(*date_sets))
-        
-        for date in all_dates:
-            portfolio_value = 0
-            for symbol, data in stock_data.items():
-                if date in data.index:
-                    price = data.loc[date, 'Close']
-                    portfolio_value += shares.get(symbol, 0) * price
-            
-            # 计算日收益率
-            daily_return = 0
-            if portfolio_values:
-                prev_value = portfolio_values[-1]['value']
-                if prev_value > 0:
-                    daily_return = (portfolio_value - prev_value) / prev_value
-            
-            portfolio_values.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'value': portfolio_value,
-                'daily_return': daily_return
-            })
-        
-        return portfolio_values
+        values, _ = self.calculate_rebalance_value_arrays(panel, weights, initial_amount, 'none')
+        return self._to_records(panel, values)
     
-    def _calculate_yearly_rebalance(self, stock_data: Dict[str, pd.DataFrame],
+    def _calculate_yearly_rebalance(self, panel: PricePanel,
                                    weights: Dict[str, float], initial_amount: float) -> List[Dict]:
         """年度再平衡策略"""
-        return self._calculate_periodic_rebalance(stock_data, weights, initial_amount, 'yearly')
+        return self._calculate_periodic_rebalance(panel, weights, initial_amount, 'yearly')
     
-    def _calculate_quarterly_rebalance(self, stock_data: Dict[str, pd.DataFrame],
+    def _calculate_quarterly_rebalance(self, panel: PricePanel,
                                       weights: Dict[str, float], initial_amount: float) -> List[Dict]:
         """季度再平衡策略"""
-        return self._calculate_periodic_rebalance(stock_data, weights, initial_amount, 'quarterly')
+        return self._calculate_periodic_rebalance(panel, weights, initial_amount, 'quarterly')
     
-    def _calculate_monthly_rebalance(self, stock_data: Dict[str, pd.DataFrame],
+    def _calculate_monthly_rebalance(self, panel: PricePanel,
                                     weights: Dict[str, float], initial_amount: float) -> List[Dict]:
         """月度再平衡策略"""
-        return self._calculate_periodic_rebalance(stock_data, weights, initial_amount, 'monthly')
+        return self._calculate_periodic_rebalance(panel, weights, initial_amount, 'monthly')
     
-    def _calculate_periodic_rebalance(self, stock_data: Dict[str, pd.DataFrame],
+    def _calculate_periodic_rebalance(self, panel: PricePanel,
                                      weights: Dict[str, float], initial_amount: float,
                                      frequency: str) -> List[Dict]:
         """周期性再平衡计算"""
-        portfolio_values = []
-        rebalance_history = []
-        
-        # 获取所有日期
-        date_sets = []
-        for symbol, data in stock_data.items():
-            if not data.empty:
-                date_sets.append(set(data.index))
-        
-        if not date_sets:
+        if panel.empty:
             return []
         
-        all_dates = sorted(set.union(*date_sets))
+        values, rebalanced = self.calculate_rebalance_value_arrays(panel, weights, initial_amount, frequency)
+        return self._to_records(panel, values, rebalanced)
+    
+    def calculate_rebalance_value_arrays(self, panel: PricePanel, weights: Dict[str, float],
+                                         initial_amount: float,
+                                         frequency: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        向量化计算再平衡组合净值
         
-        if not all_dates:
-            return []
+        再平衡日（所在月/季/年与前一交易日不同的首个交易日）将日期划分为若干区段，
+        区段内持股不变。每个区段按"每1元净值对应的持股"计算，区段起点净值为
+        前一区段持股在再平衡日的价值，通过累乘得到，因此总计算量与买入持有相同。
         
-        # 初始化
-        current_value = initial_amount
-        shares = self._initialize_shares(stock_data, weights, initial_amount)
-        last_rebalance_date = all_dates[0]
-        
-        for date in all_dates:
-            # 计算当前组合价值
-            portfolio_value = 0
-            for symbol, data in stock_data.items():
-                if date in data.index:
-                    price = data.loc[date, 'Close']
-                    portfolio_value += shares.get(symbol, 0) * price
-            
-            # 检查是否需要再平衡
-            if self._should_rebalance(date, last_rebalance_date, frequency):
-                # 执行再平衡
-                shares = self._rebalance_portfolio(stock_data, weights, portfolio_value, date)
-                last_rebalance_date = date
-                rebalance_history.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'value_before': portfolio_value,
-                    'action': 'rebalanced'
-                })
-            
-            # 计算日收益率
-            daily_return = 0
-            if portfolio_values:
-                prev_value = portfolio_values[-1]['value']
-                if prev_value > 0:
-                    daily_return = (portfolio_value - prev_value) / prev_value
-            
-            portfolio_values.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'value': portfolio_value,
-                'daily_return': daily_return,
-                'rebalanced': date == last_rebalance_date
-            })
-        
-        return portfolio_values
+        Args:
+            panel: 价格面板
+            weights: 目标权重（百分比）
+            initial_amount: 初始金额
+            frequency: 再平衡频率 ('none', 'yearly', 'quarterly', 'monthly')
+        
+        Returns:
+            (净值数组, 再平衡标记数组)；首日与各再平衡日标记为True
+        """
+        if panel.empty:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=bool)
+        
+        prices = panel.valuation_prices(settings.price_fill_policy)
+        shares = self._initialize_shares(panel, weights, initial_amount)
+        
+        boundaries = self._rebalance_boundaries(panel, frequency)
+        rebalanced = np.zeros(len(panel), dtype=bool)
+        rebalanced[0] = True
+        if not len(boundaries):
+            return prices @ shares, rebalanced
+        rebalanced[boundaries] = True
+        
+        # 各区段每1元净值对应的持股：首段为初始持股/初始金额，之后按再平衡日价格买入
+        unit_shares = np.zeros((len(boundaries) + 1, len(panel.symbols)))
+        if initial_amount > 0:
+            unit_shares[0] = shares / initial_amount
+        target = self._target_weights(panel, weights)
+        boundary_valid = panel.valid[boundaries]
+        np.divide(np.where(boundary_valid, target, 0.0), panel.close[boundaries],
+                  out=unit_shares[1:], where=boundary_valid)
+        
+        # 区段起点净值：上一区段持股在再平衡日的价值（增长倍数累乘）
+        growth = np.einsum('kn,kn->k', unit_shares[:-1], prices[boundaries])
+        segment_start_values = initial_amount * np.concatenate(([1.0], np.cumprod(growth)))
+        
+        # 每个交易日所属区段，区段内净值 = 起点净值 × (单位持股 · 当日价格)
+        segments = np.zeros(len(panel), dtype=np.int64)
+        segments[boundaries] = 1
+        segments = np.cumsum(segments)
+        values = segment_start_values[segments] * np.einsum('tn,tn->t', prices, unit_shares[segments])
+        
+        # 再平衡日记录调仓前的组合价值
+        values[boundaries] = segment_start_values[1:]
+        return values, rebalanced
     
-    def _initialize_shares(self, stock_data: Dict[str, pd.DataFrame],
-                          weights: Dict[str, float], initial_amount: float) -> Dict[str, float]:
-        """初始化股票份额"""
-        shares = {}
-        for symbol, data in stock_data.items():
-            if not data.empty:
-                initial_price = data.iloc[0]['Close']
-                shares[symbol] = (initial_amount * weights[symbol] / 100) / initial_price
-        return shares
+    def _rebalance_boundaries(self, panel: PricePanel, frequency: str) -> np.ndarray:
+        """由日期索引计算再平衡日所在行号（周期编号发生变化的行）"""
+        periods = TradingCalendar.period_codes(panel.dates, frequency)
+        if periods is None:
+            return np.empty(0, dtype=np.int64)
+        return np.nonzero(np.diff(periods) > 0)[0] + 1
     
-    def _should_rebalance(self, current_date, last_rebalance_date, frequency: str) -> bool:
-        """判断是否应该再平衡"""
-        if frequency == 'yearly':
-            return current_date.year > last_rebalance_date.year
-        elif frequency == 'quarterly':
-            current_quarter = (current_date.month - 1) // 3
-            last_quarter = (last_rebalance_date.month - 1) // 3
-            return (current_date.year > last_rebalance_date.year or 
-                   (current_date.year == last_rebalance_date.year and current_quarter > last_quarter))
-        elif frequency == 'monthly':
-            return (current_date.year > last_rebalance_date.year or
-                   (current_date.year == last_rebalance_date.year and current_date.month > last_rebalance_date.month))
-        return False
+    def _to_records(self, panel: PricePanel, values: np.ndarray,
+                    rebalanced: Optional[np.ndarray] = None) -> List[Dict]:
+        """将净值数组转换为接口返回的字典列表（日收益率为小数）"""
+        prev_values = values[:-1]
+        daily_returns = np.zeros_like(values)
+        np.divide(values[1:] - prev_values, prev_values, out=daily_returns[1:], where=prev_values > 0)
+        
+        records = [
+            {'date': date, 'value': value, 'daily_return': daily_return}
+            for date, value, daily_return in zip(panel.date_strings(), values.tolist(), daily_returns.tolist())
+        ]
+        if rebalanced is not None:
+            for record, flag in zip(records, rebalanced.tolist()):
+                record['rebalanced'] = flag
+        return records
     
-    def _rebalance_portfolio(self, stock_data: Dict[str, pd.DataFrame],
-                           weights: Dict[str, float], total_value: float,
-                           date) -> Dict[str, float]:
-        """执行再平衡"""
-        new_shares = {}
-        for symbol, weight in weights.items():
-            if symbol in stock_data and date in stock_data[symbol].index:
-                current_price = stock_data[symbol].loc[date, 'Close']
-                target_value = total_value * weight / 100
-                new_shares[symbol] = target_value / current_price
-        return new_shares
+    def _target_weights(self, panel: PricePanel, weights: Dict[str, float]) -> np.ndarray:
+        """按面板列顺序排列的目标权重（小数）"""
+        return np.array([weights.get(symbol, 0.0) / 100 for symbol in panel.symbols])
+    
+    def _initialize_shares(self, panel: PricePanel,
+                          weights: Dict[str, float], initial_amount: float) -> np.ndarray:
+        """初始化股票份额（按各股票首个有效价格买入）"""
+        first_prices = panel.first_valid_prices()
+        has_data = ~np.isnan(first_prices)
+        shares = np.zeros(len(panel.symbols))
+        shares[has_data] = initial_amount * self._target_weights(panel, weights)[has_data] / first_prices[has_data]
+        return shares
     
     def calculate_rebalancing_metrics(self, portfolio_values_with_rebalance: List[Dict],
                                      portfolio_values_without_rebalance: List[Dict]) -> Dict:
@@ -0,0 +1,55 @@
+"""
+日期工具函数
+统一使用 int64 天数（距 1970-01-01 的天数）表示交易日期
+"""
+from typing import Iterable, List, Union
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+
+DateLike = Union[str, date, datetime, pd.Timestamp, np.datetime64]
+
+
+def to_day_number(value: DateLike) -> int:
+    """
+    将单个日期转换为天数
+
+    Args:
+        value: 日期字符串 (YYYY-MM-DD...) 或日期对象
+
+    Returns:
+        距 1970-01-01 的天数
+    """
+    if isinstance(value, np.datetime64):
+        return int(value.astype('datetime64[D]').astype(np.int64))
+    return int(np.datetime64(str(value)[:10], 'D').astype(np.int64))
+
+
+def strings_to_day_numbers(values: Iterable[str]) -> np.ndarray:
+    """将日期字符串序列批量转换为 int64 天数数组"""
+    return np.array([str(v)[:10] for v in values], dtype='datetime64[D]').astype(np.int64)
+
+
+def index_to_day_numbers(index: pd.DatetimeIndex) -> np.ndarray:
+    """
+    将 DatetimeIndex 转换为 int64 天数数组
+
+    带时区的索引按交易所本地日期处理（yfinance 返回的即为交易所时区）
+    """
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.values.astype('datetime64[D]').astype(np.int64)
+
+
+def day_numbers_to_strings(days: np.ndarray) -> List[str]:
+    """将 int64 天数数组批量格式化为 YYYY-MM-DD 字符串列表"""
+    days = np.asarray(days, dtype=np.int64)
+    return np.datetime_as_string(days.astype('datetime64[D]'), unit='D').tolist()
+
+
+def day_numbers_to_index(days: np.ndarray) -> pd.DatetimeIndex:
+    """将 int64 天数数组转换为 DatetimeIndex"""
+    days = np.asarray(days, dtype=np.int64)
+    return pd.DatetimeIndex(days.astype('datetime64[D]').astype('datetime64[ns]'), name='Date')
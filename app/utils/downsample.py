@@ -0,0 +1,132 @@
+"""
+时间序列降采样
+Largest-Triangle-Three-Buckets（LTTB）：把序列分成等宽的桶，每个桶保留与前一个已选点、
+下一个桶均值构成三角形面积最大的点，在点数大幅减少时保留曲线形状。
+另外强制保留最大回撤的峰值点与谷值点，图表上的回撤幅度与降采样前一致。
+"""
+from typing import Dict, List, Optional
+import numpy as np
+
+
+# 服务结果中保存完整（未降采样）时间序列的字段：供持久化写入逐日时间序列表，接口返回前移除
+FULL_SERIES_KEY = 'full_time_series'
+
+
+def lttb_indices(y: np.ndarray, n_out: int, x: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    LTTB 降采样，返回保留点的下标
+
+    Args:
+        y: 序列值 (n,)
+        n_out: 保留的点数（含首尾两点）
+        x: 横坐标 (n,)，默认按等间距的序号
+
+    Returns:
+        升序下标数组，长度为 min(n, n_out)
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out <= 2:
+        return np.array([0, n - 1])[:max(n_out, 0)]
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # 首尾两点之外的 n-2 个点分成 n_out-2 个桶，edges[i]..edges[i+1] 为第 i 个桶
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(np.int64)
+    edges[-1] = n - 1
+
+    # 各桶均值用前缀和一次算出；最后一个桶的“下一个桶”为末尾点
+    x_sums = np.concatenate(([0.0], np.cumsum(x)))
+    y_sums = np.concatenate(([0.0], np.cumsum(y)))
+    widths = edges[1:] - edges[:-1]
+    x_means = np.append((x_sums[edges[1:]] - x_sums[edges[:-1]]) / widths, x[-1])
+    y_means = np.append((y_sums[edges[1:]] - y_sums[edges[:-1]]) / widths, y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        # 以上一个已选点、本桶各点、下一个桶均值为顶点的三角形面积（的两倍）
+        areas = np.abs((x[a] - x_means[i + 1]) * (by - y[a]) - (x[a] - bx) * (y_means[i + 1] - y[a]))
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def drawdown_extremes(y: np.ndarray) -> Optional[tuple]:
+    """
+    最大回撤的峰值点与谷值点下标
+
+    Returns:
+        (峰值下标, 谷值下标)；序列为空或全部为NaN时返回None
+    """
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) == 0 or np.isnan(y).all():
+        return None
+    peaks = np.fmax.accumulate(y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdowns = np.where(peaks > 0, (y - peaks) / peaks, 0.0)
+    trough = int(np.nanargmin(drawdowns))
+    peak = int(np.nanargmax(y[:trough + 1]))
+    return peak, trough
+
+
+def resolve_max_points(config: Dict, default: int) -> int:
+    """
+    读取请求中的 max_points 选项
+
+    Raises:
+        ValueError: max_points 不是非负整数
+    """
+    max_points = config.get('max_points', default)
+    if isinstance(max_points, bool) or not isinstance(max_points, int) or max_points < 0:
+        raise ValueError("max_points must be a non-negative integer")
+    return max_points
+
+
+def downsample_records(records: List[Dict], max_points: Optional[int], value_key: str = 'value') -> List[Dict]:
+    """
+    对接口返回的时间序列记录降采样
+
+    Args:
+        records: 按日期升序的记录列表
+        max_points: 最多返回的点数，为空或不大于0时返回完整序列
+        value_key: 参与降采样的数值字段
+
+    Returns:
+        保留的记录（原记录对象，按日期升序）
+    """
+    if not max_points or max_points <= 0 or len(records) <= max_points:
+        return records
+
+    values = np.nan_to_num(np.array([record.get(value_key, np.nan) for record in records], dtype=np.float64))
+    extremes = drawdown_extremes(values)
+    if extremes is None or max_points < 4:
+        keep = lttb_indices(values, max_points)
+    else:
+        # 为峰值、谷值预留两个位置，若 LTTB 已选中则不重复
+        keep = np.union1d(lttb_indices(values, max_points - 2), np.array(extremes))
+    return [records[i] for i in keep.tolist()]
+
+
+def downsampled_series(records: List[Dict], max_points: Optional[int], key: str = 'time_series') -> Dict:
+    """
+    生成结果中的时间序列字段
+
+    Returns:
+        {key: 降采样后的序列}；有点被省略时另附 {FULL_SERIES_KEY: 完整序列}
+    """
+    sampled = downsample_records(records, max_points)
+    if len(sampled) == len(records):
+        return {key: records}
+    return {key: sampled, FULL_SERIES_KEY: records}
+
+
+def without_full_series(result: Dict) -> Dict:
+    """去掉结果中的完整时间序列（接口响应、任务结果使用）"""
+    if FULL_SERIES_KEY not in result:
+        return result
+    return {key: value for key, value in result.items() if key != FULL_SERIES_KEY}
@@ -4,7 +4,9 @@
 """
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Union
+from app.core.config import settings
+from app.utils.price_panel import PricePanel, as_price_panel
 
 
 class FinancialCalculator:
@@ -77,25 +79,10 @@ class FinancialCalculator:
         if len(values) < 2:
             return (0.0, 0, 0)
         
-        peak = values[0]
-        peak_idx = 0
-        max_dd = 0.0
-        max_dd_peak_idx = 0
-        max_dd_trough_idx = 0
-        
-        for i, value in enumerate(values):
-            if value > peak:
-                peak = value
-                peak_idx = i
-            
-            drawdown = ((peak - value) / peak) * 100 if peak > 0 else 0
-            
-            if drawdown > max_dd:
-                max_dd = drawdown
-                max_dd_peak_idx = peak_idx
-                max_dd_trough_idx = i
-        
-        return (-max_dd, max_dd_peak_idx, max_dd_trough_idx)
+        max_drawdown, peak_idx, trough_idx = self._max_drawdown_arrays(
+            np.asarray(values, dtype=np.float64)[None, :]
+        )
+        return (float(max_drawdown[0]), int(peak_idx[0]), int(trough_idx[0]))
     
     def calculate_sharpe_ratio(self, returns: List[float], risk_free_rate: float = 0.0) -> float:
         """
@@ -112,7 +99,7 @@ class FinancialCalculator:
             return 0.0
         
         # 计算超额收益
-        excess_returns = [r - risk_free_rate/252 for r in returns]  # 假设日收益率
+        excess_returns = np.asarray(returns, dtype=np.float64) - risk_free_rate/252  # 假设日收益率
         
         mean_excess_return = np.mean(excess_returns)
         std_excess_return = np.std(excess_returns, ddof=1)
@@ -138,85 +125,103 @@ class FinancialCalculator:
         if len(returns) < 2:
             return 0.0
         
-        excess_returns = [r - risk_free_rate/252 for r in returns]
+        returns = np.asarray(returns, dtype=np.float64)
+        excess_returns = returns - risk_free_rate/252
         mean_excess_return = np.mean(excess_returns)
         
         # 计算下行标准差
-        downside_returns = [min(0, r - target_return/252) for r in returns]
-        downside_std = np.sqrt(np.mean([r**2 for r in downside_returns]))
+        downside_returns = np.minimum(0.0, returns - target_return/252)
+        downside_std = np.sqrt(np.mean(downside_returns ** 2))
         
         if downside_std == 0:
             return 0.0
         
         return (mean_excess_return / downside_std) * np.sqrt(252)
     
-    def calculate_portfolio_values(self, stock_data: Dict[str, List[Dict]], weights: Dict[str, float], 
-                                 initial_amount: float) -> List[Dict]:
+    def calculate_portfolio_values(self, stock_data: Union[PricePanel, Dict[str, List[Dict]]],
+                                 weights: Dict[str, float], initial_amount: float) -> List[Dict]:
         """
         计算投资组合净值序列
         
         Args:
-            stock_data: 股票数据字典 {symbol: [{'Date': ..., 'Close': ...}, ...]}
+            stock_data: 价格面板，或股票数据字典 {symbol: [{'Date': ..., 'Close': ...}, ...]}
             weights: 权重字典 {symbol: weight}
             initial_amount: 初始投资金额
         
         Returns:
             净值序列 [{'date': ..., 'value': ..., 'return': ...}, ...]
         """
-        # 确保所有股票有相同的日期
-        dates = set()
-        for symbol, data in stock_data.items():
-            for row in data:
-                dates.add(row['Date'])
-        
-        dates = sorted(list(dates))
-        
-        # 构建价格矩阵
-        price_matrix = {}
-        for date in dates:
-            price_matrix[date] = {}
-            for symbol in stock_data:
-                # 找到该日期的价格
-                for row in stock_data[symbol]:
-                    if row['Date'] == date:
-                        price_matrix[date][symbol] = row['Close']
-                        break
+        # 所有股票按日期并集对齐
+        panel = as_price_panel(stock_data)
         
-        # 计算初始持仓
-        if not dates:
+        if panel.empty:
             return []
         
-        initial_prices = price_matrix[dates[0]]
-        shares = {}
-        for symbol, weight in weights.items():
-            if symbol in initial_prices:
-                investment = initial_amount * (weight / 100.0)
-                shares[symbol] = investment / initial_prices[symbol]
+        values, daily_returns, cumulative_returns = self.calculate_portfolio_value_arrays(
+            panel, weights, initial_amount
+        )
+        return self.portfolio_values_to_records(panel.date_strings(), values, daily_returns, cumulative_returns)
+    
+    def calculate_portfolio_value_arrays(self, panel: PricePanel, weights: Dict[str, float],
+                                         initial_amount: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        向量化计算投资组合净值（买入持有）
+        
+        首日按权重买入当日有价格的股票，之后每日净值为 价格矩阵 × 持股向量，
+        当日缺失的价格按 settings.price_fill_policy 填充。
+        
+        Args:
+            panel: 价格面板
+            weights: 权重字典 {symbol: weight}（百分比）
+            initial_amount: 初始投资金额
+        
+        Returns:
+            (净值, 日收益率(百分比), 累计收益率(百分比))，长度均为面板日期数
+        """
+        if panel.empty:
+            empty = np.empty(0, dtype=np.float64)
+            return empty, empty.copy(), empty.copy()
+        
+        # 计算初始持仓
+        weight_vector = np.array([weights.get(symbol, 0.0) / 100.0 for symbol in panel.symbols])
+        first_valid = panel.valid[0]
+        shares = np.zeros(len(panel.symbols))
+        shares[first_valid] = initial_amount * weight_vector[first_valid] / panel.close[0, first_valid]
         
         # 计算每日净值
-        portfolio_values = []
-        prev_value = initial_amount
+        prices = panel.valuation_prices(settings.price_fill_policy)
+        values = prices @ shares
         
-        for date in dates:
-            daily_prices = price_matrix[date]
-            portfolio_value = 0.0
-            
-            for symbol, num_shares in shares.items():
-                if symbol in daily_prices:
-                    portfolio_value += num_shares * daily_prices[symbol]
-            
-            daily_return = ((portfolio_value - prev_value) / prev_value * 100) if prev_value > 0 else 0
-            
-            portfolio_values.append({
+        prev_values = np.empty_like(values)
+        prev_values[0] = initial_amount
+        prev_values[1:] = values[:-1]
+        daily_returns = np.zeros_like(values)
+        np.divide(values - prev_values, prev_values, out=daily_returns, where=prev_values > 0)
+        daily_returns *= 100
+        
+        cumulative_returns = (values - initial_amount) / initial_amount * 100
+        
+        return values, daily_returns, cumulative_returns
+    
+    def portfolio_values_to_records(self, dates: List[str], values: np.ndarray,
+                                    daily_returns: np.ndarray, cumulative_returns: np.ndarray) -> List[Dict]:
+        """
+        将净值数组转换为接口返回的字典列表
+        
+        Returns:
+            净值序列 [{'date': ..., 'value': ..., 'daily_return': ..., 'cumulative_return': ...}, ...]
+        """
+        return [
+            {
                 'date': date,
-                'value': portfolio_value,
+                'value': value,
                 'daily_return': daily_return,
-                'cumulative_return': ((portfolio_value - initial_amount) / initial_amount * 100)
-            })
-            
-            prev_value = portfolio_value
-        
-        return portfolio_values
+                'cumulative_return': cumulative_return
+            }
+            for date, value, daily_return, cumulative_return in zip(
+                dates, values.tolist(), daily_returns.tolist(), cumulative_returns.tolist()
+            )
+        ]
     
     def calculate_annual_returns(self, portfolio_values: List[Dict]) -> List[Dict]:
         """
@@ -235,6 +240,9 @@ class FinancialCalculator:
         df = pd.DataFrame(portfolio_values)
         df['date'] = pd.to_datetime(df['date'])
         df['year'] = df['date'].dt.year
+        if 'daily_return' not in df:
+            # 净值序列未附带日收益率（如增强版回测）时由净值推导，单位为百分比
+            df['daily_return'] = df['value'].pct_change().fillna(0) * 100
         
         annual_returns = []
         
@@ -264,38 +272,87 @@ class FinancialCalculator:
         """
         计算风险指标汇总
         
+        日收益率统一由净值序列推导，不依赖各引擎 daily_return 字段的单位。
+        
         Args:
             portfolio_values: 投资组合净值序列
         
         Returns:
-            风险指标字典
+            风险指标字典；不足两个交易日时返回空字典
         """
-        if not portfolio_values:
+        if len(portfolio_values) < 2:
             return {}
         
-        values = [pv['value'] for pv in portfolio_values]
-        returns = [pv['daily_return'] for pv in portfolio_values[1:]]  # 跳过第一天
+        values = np.fromiter((pv['value'] for pv in portfolio_values), dtype=np.float64,
+                             count=len(portfolio_values))
+        metrics = self.calculate_risk_metrics_arrays(values)
+        
+        peak_idx = metrics.pop('max_drawdown_peak_idx')
+        trough_idx = metrics.pop('max_drawdown_trough_idx')
+        metrics['max_drawdown_peak_date'] = portfolio_values[peak_idx]['date']
+        metrics['max_drawdown_trough_date'] = portfolio_values[trough_idx]['date']
+        return metrics
+    
+    def calculate_risk_metrics_arrays(self, values: np.ndarray, risk_free_rate: float = 0.0,
+                                      target_return: float = 0.0) -> Dict:
+        """
+        向量化计算风险指标
         
-        start_value = values[0]
-        end_value = values[-1]
+        Args:
+            values: 净值数组，一维 (T,) 为单个组合；二维 (P, T) 每行一个组合
+            risk_free_rate: 无风险利率（年化）
+            target_return: 目标收益率（年化，用于索提诺比率）
+        
+        Returns:
+            风险指标字典；一维输入时各项为标量，二维输入时各项为长度 P 的数组；
+            不足两个交易日时返回空字典
+        """
+        values = np.asarray(values, dtype=np.float64)
+        single = values.ndim == 1
+        values = np.atleast_2d(values)
+        portfolio_count, trading_days = values.shape
+        if trading_days < 2:
+            return {}
         
-        # 计算交易天数和年数
-        trading_days = len(values)
+        start_values = values[:, 0]
+        end_values = values[:, -1]
         years = trading_days / 252
         
-        # 计算各项指标
-        total_return = self.calculate_total_return(start_value, end_value)
-        annualized_return = self.calculate_annualized_return(start_value, end_value, years)
-        volatility = self.calculate_volatility(returns)
-        max_drawdown, peak_idx, trough_idx = self.calculate_max_drawdown(values)
-        sharpe_ratio = self.calculate_sharpe_ratio(returns)
-        sortino_ratio = self.calculate_sortino_ratio(returns)
+        # 总收益率与年化收益率
+        has_start = start_values > 0
+        ratio = np.divide(end_values, start_values, out=np.ones(portfolio_count), where=has_start)
+        total_return = np.divide((end_values - start_values) * 100, start_values,
+                                 out=np.zeros(portfolio_count), where=has_start)
+        annualized_return = np.where(has_start & (years > 0), (ratio ** (1 / years) - 1) * 100, 0.0)
+        
+        # 日收益率（跳过第一天）
+        prev_values = values[:, :-1]
+        returns = np.zeros_like(prev_values)
+        np.divide(values[:, 1:] - prev_values, prev_values, out=returns, where=prev_values > 0)
+        return_days = returns.shape[1]
+        
+        # 波动率、夏普比率、索提诺比率
+        volatility = np.zeros(portfolio_count)
+        sharpe_ratio = np.zeros(portfolio_count)
+        sortino_ratio = np.zeros(portfolio_count)
+        if return_days >= 2:
+            excess_returns = returns - risk_free_rate / 252
+            mean_excess = excess_returns.mean(axis=1)
+            std_excess = excess_returns.std(axis=1, ddof=1)
+            volatility = returns.std(axis=1, ddof=1) * np.sqrt(252) * 100
+            np.divide(mean_excess * np.sqrt(252), std_excess, out=sharpe_ratio, where=std_excess > 0)
+            
+            downside = np.minimum(0.0, returns - target_return / 252)
+            downside_std = np.sqrt(np.mean(downside ** 2, axis=1))
+            np.divide(mean_excess * np.sqrt(252), downside_std, out=sortino_ratio, where=downside_std > 0)
+        
+        # 正收益天数
+        positive_days = (returns > 0).sum(axis=1)
+        positive_rate = positive_days / return_days * 100
         
-        # 计算正收益率
-        positive_days = sum(1 for r in returns if r > 0)
-        positive_rate = (positive_days / len(returns) * 100) if returns else 0
+        max_drawdown, peak_idx, trough_idx = self._max_drawdown_arrays(values)
         
-        return {
+        metrics = {
             'total_return': total_return,
             'annualized_return': annualized_return,
             'volatility': volatility,
@@ -303,8 +360,35 @@ class FinancialCalculator:
             'sharpe_ratio': sharpe_ratio,
             'sortino_ratio': sortino_ratio,
             'positive_days': positive_days,
-            'total_days': len(returns),
+            'total_days': np.full(portfolio_count, return_days),
             'positive_rate': positive_rate,
-            'max_drawdown_peak_date': portfolio_values[peak_idx]['date'] if peak_idx < len(portfolio_values) else None,
-            'max_drawdown_trough_date': portfolio_values[trough_idx]['date'] if trough_idx < len(portfolio_values) else None
-        }
\ No newline at end of file
+            'max_drawdown_peak_idx': peak_idx,
+            'max_drawdown_trough_idx': trough_idx
+        }
+        if single:
+            return {key: value[0].item() for key, value in metrics.items()}
+        return metrics
+    
+    def _max_drawdown_arrays(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        按行计算最大回撤
+        
+        Args:
+            values: 净值矩阵 (P, T)
+        
+        Returns:
+            (最大回撤百分比(负数), 峰值索引, 谷值索引)，长度均为 P
+        """
+        running_max = np.maximum.accumulate(values, axis=1)
+        drawdowns = np.zeros_like(values)
+        np.divide((running_max - values) * 100, running_max, out=drawdowns, where=running_max > 0)
+        
+        rows = np.arange(values.shape[0])
+        trough_idx = drawdowns.argmax(axis=1)
+        max_drawdown = drawdowns[rows, trough_idx]
+        
+        # 峰值为谷值之前（含）净值首次达到最高点的位置
+        before_trough = np.arange(values.shape[1])[None, :] <= trough_idx[:, None]
+        peak_idx = np.where(before_trough, values, -np.inf).argmax(axis=1)
+        
+        return -max_drawdown, peak_idx, trough_idx
@@ -0,0 +1,117 @@
+"""
+技术指标结果缓存
+按 (股票, 数据版本, 首个交易日, 指标集合与参数) 缓存指标矩阵，按字节数做 LRU 淘汰。
+指标只依赖当日及之前的数据，因此起始日相同、结束日更早的区间可以直接从已缓存的更长区间切片得到。
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+import numpy as np
+
+
+class _CacheEntry:
+    """缓存项：交易日序列与对应的指标矩阵（只读）"""
+    __slots__ = ('days', 'block', 'nbytes')
+
+    def __init__(self, days: np.ndarray, block: np.ndarray):
+        self.days = days
+        self.block = block
+        self.nbytes = days.nbytes + block.nbytes
+
+
+class IndicatorCache:
+    """
+    指标结果缓存（线程安全）
+
+    同一键只保留最长的区间；请求区间的交易日是缓存区间的前缀时命中并返回切片视图，
+    否则重新计算并替换为新区间。返回的矩阵为只读视图，调用方不能原地修改。
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes: 缓存占用的字节上限，超出时淘汰最久未使用的项
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Tuple, _CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, symbol: str, data_version: Hashable, indicator_key: Hashable,
+                       days: np.ndarray, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        获取指标矩阵，未命中时调用 compute 计算并缓存
+
+        Args:
+            symbol: 股票代码
+            data_version: 行情数据版本号，数据更新后旧缓存自然失效
+            indicator_key: 指标集合与参数标识（如 IndicatorPipeline.cache_key）
+            days: 本次数据的交易日（int64 天数，升序）
+            compute: 计算指标矩阵的函数，返回 (len(days), k)
+
+        Returns:
+            指标矩阵 (len(days), k)
+        """
+        days = np.asarray(days, dtype=np.int64)
+        if len(days) == 0:
+            return compute()
+
+        key = (symbol, data_version, int(days[0]), indicator_key)
+        block = self._lookup(key, days)
+        if block is not None:
+            return block
+
+        block = compute()
+        self._store(key, days, block)
+        return block
+
+    def _lookup(self, key: Tuple, days: np.ndarray) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            n = len(days)
+            if entry is not None and n <= len(entry.days) and np.array_equal(entry.days[:n], days):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.block[:n]
+            self.misses += 1
+            return None
+
+    def _store(self, key: Tuple, days: np.ndarray, block: np.ndarray):
+        entry = _CacheEntry(days.copy(), np.array(block, dtype=np.float64))
+        if entry.nbytes > self.max_bytes:
+            return
+        entry.days.setflags(write=False)
+        entry.block.setflags(write=False)
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+                # 并发计算时保留更长的区间
+                if len(previous.days) > len(entry.days):
+                    entry = previous
+
+            self._entries[key] = entry
+            self.current_bytes += entry.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,192 @@
+"""
+技术指标流水线
+按请求的指标集合在同一组 close/high/low 数组上一次算出全部指标，
+共享差分、EMA、滚动和等中间结果，输出写入预分配的二维 float64 矩阵
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+from app.utils import rolling
+
+
+# 指标组及其输出列（列顺序即输出矩阵的列顺序）
+INDICATOR_GROUPS = {
+    'rsi': ('RSI',),
+    'macd': ('MACD', 'MACD_Signal', 'MACD_Histogram'),
+    'bollinger': ('BB_Upper', 'BB_Middle', 'BB_Lower'),
+    'support_resistance': ('Support', 'Resistance'),
+    'daily_return': ('Daily_Return',),
+    'drawdown': ('Peak', 'Drawdown'),
+}
+
+DEFAULT_INDICATORS = tuple(INDICATOR_GROUPS.keys())
+
+DEFAULT_PARAMS = {
+    'rsi_period': 14,
+    'macd_fast': 12,
+    'macd_slow': 26,
+    'macd_signal': 9,
+    'bb_period': 20,
+    'bb_std': 2.0,
+    'support_period': 20,
+}
+
+
+class _Intermediates:
+    """单次计算内共享的中间结果，每项只计算一次"""
+
+    def __init__(self, close: np.ndarray):
+        self.close = close
+        self._cache: Dict[str, np.ndarray] = {}
+
+    def get(self, key: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def diff(self) -> np.ndarray:
+        """收盘价一阶差分，首行为NaN"""
+        def compute():
+            delta = np.empty_like(self.close)
+            delta[0] = np.nan
+            np.subtract(self.close[1:], self.close[:-1], out=delta[1:])
+            return delta
+        return self.get('diff', compute)
+
+    def ema(self, span: int) -> np.ndarray:
+        return self.get(f'ema:{span}', lambda: rolling.ema(self.close, span))
+
+    def mean(self, window: int) -> np.ndarray:
+        return self.get(f'mean:{window}', lambda: rolling.rolling_mean(self.close, window))
+
+
+class IndicatorPipeline:
+    """
+    技术指标流水线
+
+    Examples:
+        pipeline = IndicatorPipeline(['rsi', 'macd'])
+        block = pipeline.compute(close)          # 形状 (T, len(pipeline.columns))
+        df = pipeline.compute_frame(price_df)    # 追加指标列后的 DataFrame
+    """
+
+    def __init__(self, indicators: Optional[Sequence[str]] = None, params: Optional[Dict] = None):
+        """
+        Args:
+            indicators: 指标组名称，见 INDICATOR_GROUPS，默认全部
+            params: 指标参数，覆盖 DEFAULT_PARAMS 中的对应项
+        """
+        indicators = DEFAULT_INDICATORS if indicators is None else tuple(indicators)
+        unknown = [name for name in indicators if name not in INDICATOR_GROUPS]
+        if unknown:
+            raise ValueError(f"Unsupported indicators: {unknown}")
+
+        self.indicators = indicators
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        self.columns: List[str] = [column for name in indicators for column in INDICATOR_GROUPS[name]]
+        self._column_index = {column: i for i, column in enumerate(self.columns)}
+
+    def compute(self, close: np.ndarray, high: Optional[np.ndarray] = None,
+                low: Optional[np.ndarray] = None, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        计算全部请求的指标
+
+        Args:
+            close: 收盘价 (T,)
+            high: 最高价 (T,)，缺省时使用收盘价
+            low: 最低价 (T,)，缺省时使用收盘价
+            out: 可选的预分配输出矩阵 (T, len(columns))
+
+        Returns:
+            指标矩阵 (T, len(columns))，列顺序同 self.columns
+        """
+        close = np.ascontiguousarray(close, dtype=np.float64)
+        high = close if high is None else np.asarray(high, dtype=np.float64)
+        low = close if low is None else np.asarray(low, dtype=np.float64)
+
+        shape = (len(close), len(self.columns))
+        if out is None:
+            out = np.empty(shape, dtype=np.float64)
+        elif out.shape != shape or out.dtype != np.float64:
+            raise ValueError(f"Output block must be float64 with shape {shape}")
+
+        if len(close) == 0:
+            return out
+
+        shared = _Intermediates(close)
+        for name in self.indicators:
+            getattr(self, f'_compute_{name}')(shared, high, low, out)
+        return out
+
+    @property
+    def cache_key(self) -> tuple:
+        """指标集合与参数的可哈希标识，用作指标缓存键的一部分"""
+        return (self.indicators, tuple(sorted(self.params.items())))
+
+    def compute_block(self, df: pd.DataFrame) -> np.ndarray:
+        """在 OHLC DataFrame 上计算指标矩阵"""
+        return self.compute(
+            df['Close'].to_numpy(dtype=np.float64),
+            df['High'].to_numpy(dtype=np.float64) if 'High' in df else None,
+            df['Low'].to_numpy(dtype=np.float64) if 'Low' in df else None
+        )
+
+    def attach(self, df: pd.DataFrame, block: np.ndarray) -> pd.DataFrame:
+        """把指标矩阵作为新列追加到 DataFrame，返回新的 DataFrame"""
+        indicators = pd.DataFrame(block, index=df.index, columns=self.columns)
+        return pd.concat([df, indicators], axis=1)
+
+    def compute_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """在 OHLC DataFrame 上计算指标，返回追加了指标列的新 DataFrame"""
+        return self.attach(df, self.compute_block(df))
+
+    def _column(self, out: np.ndarray, name: str) -> np.ndarray:
+        return out[:, self._column_index[name]]
+
+    def _compute_rsi(self, shared: _Intermediates, high, low, out: np.ndarray):
+        """RSI：涨跌幅的简单移动平均之比（首行差分按0计入窗口）"""
+        period = self.params['rsi_period']
+        delta = np.nan_to_num(shared.diff(), nan=0.0)
+        gain = rolling.rolling_mean(np.maximum(delta, 0.0), period)
+        loss = rolling.rolling_mean(np.maximum(-delta, 0.0), period)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = gain / loss
+            np.subtract(100.0, 100.0 / (1.0 + rs), out=self._column(out, 'RSI'))
+
+    def _compute_macd(self, shared: _Intermediates, high, low, out: np.ndarray):
+        """MACD：快慢EMA之差及其信号线"""
+        macd_line = self._column(out, 'MACD')
+        np.subtract(shared.ema(self.params['macd_fast']), shared.ema(self.params['macd_slow']), out=macd_line)
+        signal_line = self._column(out, 'MACD_Signal')
+        signal_line[:] = rolling.ema(macd_line, self.params['macd_signal'])
+        np.subtract(macd_line, signal_line, out=self._column(out, 'MACD_Histogram'))
+
+    def _compute_bollinger(self, shared: _Intermediates, high, low, out: np.ndarray):
+        """布林带：滚动均值 ± 倍数 × 滚动标准差"""
+        period = self.params['bb_period']
+        middle = self._column(out, 'BB_Middle')
+        middle[:] = shared.mean(period)
+        width = rolling.rolling_std(shared.close, period) * self.params['bb_std']
+        np.add(middle, width, out=self._column(out, 'BB_Upper'))
+        np.subtract(middle, width, out=self._column(out, 'BB_Lower'))
+
+    def _compute_support_resistance(self, shared: _Intermediates, high, low, out: np.ndarray):
+        """支撑位/阻力位：最低价滚动最小值与最高价滚动最大值"""
+        period = self.params['support_period']
+        self._column(out, 'Support')[:] = rolling.rolling_min(low, period)
+        self._column(out, 'Resistance')[:] = rolling.rolling_max(high, period)
+
+    def _compute_daily_return(self, shared: _Intermediates, high, low, out: np.ndarray):
+        """日收益率"""
+        daily_return = self._column(out, 'Daily_Return')
+        daily_return[0] = np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(shared.diff()[1:], shared.close[:-1], out=daily_return[1:])
+
+    def _compute_drawdown(self, shared: _Intermediates, high, low, out: np.ndarray):
+        """历史最高价与回撤"""
+        peak = self._column(out, 'Peak')
+        peak[:] = np.fmax.accumulate(shared.close)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(shared.close - peak, peak, out=self._column(out, 'Drawdown'))
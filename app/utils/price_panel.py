@@ -0,0 +1,199 @@
+"""
+对齐价格面板
+将多只股票的收盘价对齐为 (日期 × 股票) 的连续 float64 矩阵，供各计算引擎共用
+"""
+from typing import Dict, List, Optional, Union
+import numpy as np
+import pandas as pd
+
+from app.utils.date_utils import (
+    strings_to_day_numbers, index_to_day_numbers, day_numbers_to_strings, day_numbers_to_index
+)
+
+
+# 缺失值填充策略
+FILL_NONE = 'none'                    # 保留NaN
+FILL_FORWARD = 'ffill'                # 用前一个有效价格填充，上市前仍为NaN
+FILL_FORWARD_BACKWARD = 'ffill_bfill'  # 前向填充后，上市前用首个有效价格填充
+FILL_POLICIES = (FILL_NONE, FILL_FORWARD, FILL_FORWARD_BACKWARD)
+
+
+class PricePanel:
+    """
+    价格面板
+
+    Attributes:
+        dates: 升序的 int64 天数索引，形状 (D,)
+        symbols: 股票代码列表，长度 N
+        close: C连续的 float64 收盘价矩阵，形状 (D, N)，缺失处为NaN（填充后除外）
+        valid: 原始数据中是否存在该日价格的布尔矩阵，形状 (D, N)，填充不改变该掩码
+    """
+
+    def __init__(self, dates: np.ndarray, symbols: List[str], close: np.ndarray, valid: np.ndarray):
+        self.dates = np.asarray(dates, dtype=np.int64)
+        self.symbols = list(symbols)
+        self.close = np.ascontiguousarray(close, dtype=np.float64)
+        self.valid = np.asarray(valid, dtype=bool)
+        self._date_strings: Optional[List[str]] = None
+
+    @classmethod
+    def from_records(cls, stock_data: Dict[str, List[Dict]], field: str = 'Close') -> 'PricePanel':
+        """
+        由字典列表格式的股票数据构建面板
+
+        Args:
+            stock_data: {symbol: [{'Date': ..., 'Close': ...}, ...]}
+            field: 价格字段
+        """
+        columns = {}
+        for symbol, rows in stock_data.items():
+            dates = strings_to_day_numbers(row['Date'] for row in rows) if rows else np.empty(0, dtype=np.int64)
+            prices = np.array([row[field] for row in rows], dtype=np.float64)
+            columns[symbol] = (dates, prices)
+        return cls._from_series(columns)
+
+    @classmethod
+    def from_columns(cls, stock_columns: Dict[str, Dict[str, np.ndarray]], field: str = 'Close') -> 'PricePanel':
+        """
+        由列式格式的股票数据构建面板
+
+        Args:
+            stock_columns: {symbol: {'Date': int64天数数组, 'Close': 数组, ...}}
+            field: 价格字段
+        """
+        columns = {
+            symbol: (np.asarray(data['Date'], dtype=np.int64), np.asarray(data[field], dtype=np.float64))
+            for symbol, data in stock_columns.items()
+        }
+        return cls._from_series(columns)
+
+    @classmethod
+    def from_dataframes(cls, frames: Dict[str, pd.DataFrame], field: str = 'Close') -> 'PricePanel':
+        """由 {symbol: DataFrame} 构建面板（DataFrame以日期为索引）"""
+        columns = {
+            symbol: (index_to_day_numbers(df.index), df[field].to_numpy(dtype=np.float64))
+            for symbol, df in frames.items()
+        }
+        return cls._from_series(columns)
+
+    @classmethod
+    def _from_series(cls, columns: Dict[str, tuple]) -> 'PricePanel':
+        """
+        由 {symbol: (dates, prices)} 构建面板
+
+        日期并集通过 np.unique 一次求出，每只股票用 searchsorted 定位行号后整列写入，
+        总复杂度 O(R log R)，R 为所有股票的数据行数之和
+        """
+        symbols = list(columns.keys())
+        all_dates = [dates for dates, _ in columns.values()]
+        dates = np.unique(np.concatenate(all_dates)) if all_dates else np.empty(0, dtype=np.int64)
+
+        close = np.full((len(dates), len(symbols)), np.nan, dtype=np.float64)
+        for j, symbol in enumerate(symbols):
+            symbol_dates, prices = columns[symbol]
+            if len(symbol_dates):
+                close[np.searchsorted(dates, symbol_dates), j] = prices
+
+        return cls(dates, symbols, close, ~np.isnan(close))
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.dates) == 0 or len(self.symbols) == 0
+
+    def symbol_index(self, symbol: str) -> int:
+        """股票代码对应的列号"""
+        return self.symbols.index(symbol)
+
+    def select(self, symbols: List[str]) -> 'PricePanel':
+        """按股票代码选取子面板（日期索引不变）"""
+        idx = [self.symbols.index(symbol) for symbol in symbols if symbol in self.symbols]
+        return PricePanel(self.dates, [self.symbols[j] for j in idx],
+                          self.close[:, idx], self.valid[:, idx])
+
+    def align_frames(self, frames: Dict[str, pd.DataFrame], field: str) -> np.ndarray:
+        """
+        将 {symbol: DataFrame} 中的另一列按面板的日期和股票顺序对齐
+
+        Returns:
+            形状 (D, N) 的 float64 矩阵，缺失处为NaN
+        """
+        aligned = np.full((len(self.dates), len(self.symbols)), np.nan, dtype=np.float64)
+        for j, symbol in enumerate(self.symbols):
+            df = frames.get(symbol)
+            if df is None or df.empty:
+                continue
+            rows = np.searchsorted(self.dates, index_to_day_numbers(df.index))
+            aligned[rows, j] = df[field].to_numpy(dtype=np.float64)
+        return aligned
+
+    def date_strings(self) -> List[str]:
+        """YYYY-MM-DD 格式的日期列表（仅在需要输出时构建一次）"""
+        if self._date_strings is None:
+            self._date_strings = day_numbers_to_strings(self.dates)
+        return self._date_strings
+
+    def date_index(self) -> pd.DatetimeIndex:
+        """日期索引（DatetimeIndex）"""
+        return day_numbers_to_index(self.dates)
+
+    def first_valid_rows(self) -> np.ndarray:
+        """每只股票首个有效价格所在的行号，无数据时为-1"""
+        has_data = self.valid.any(axis=0)
+        return np.where(has_data, self.valid.argmax(axis=0), -1)
+
+    def first_valid_prices(self) -> np.ndarray:
+        """每只股票的首个有效价格，无数据时为NaN"""
+        rows = self.first_valid_rows()
+        prices = np.full(len(self.symbols), np.nan)
+        has_data = rows >= 0
+        prices[has_data] = self.close[rows[has_data], np.nonzero(has_data)[0]]
+        return prices
+
+    def filled(self, policy: str = FILL_FORWARD) -> 'PricePanel':
+        """
+        按策略填充缺失价格，返回新面板（valid 掩码保持原样）
+
+        Args:
+            policy: none / ffill / ffill_bfill
+        """
+        if policy not in FILL_POLICIES:
+            raise ValueError(f"Unsupported fill policy: {policy}")
+        if policy == FILL_NONE or self.empty:
+            return self
+
+        # 每个位置取不晚于当前行的最后一个有效行号
+        rows = np.arange(len(self.dates))[:, None]
+        last_valid = np.maximum.accumulate(np.where(self.valid, rows, -1), axis=0)
+        cols = np.arange(len(self.symbols))[None, :]
+        close = np.where(last_valid >= 0, self.close[np.maximum(last_valid, 0), cols], np.nan)
+
+        if policy == FILL_FORWARD_BACKWARD:
+            first_prices = self.first_valid_prices()
+            close = np.where(last_valid >= 0, close, first_prices[None, :])
+
+        return PricePanel(self.dates, self.symbols, close, self.valid)
+
+    def valuation_prices(self, policy: str = FILL_FORWARD) -> np.ndarray:
+        """
+        持仓估值用的价格矩阵 (D, N)
+
+        缺失价格按策略填充（例如某只股票当日停牌时沿用前一个有效价格），
+        填充后仍缺失的位置（上市前或不填充）按0计入。买入仍只在 valid 为True的日期进行。
+        """
+        return np.nan_to_num(self.filled(policy).close, nan=0.0)
+
+
+def as_price_panel(data: Union[PricePanel, Dict[str, List[Dict]], Dict[str, pd.DataFrame]]) -> PricePanel:
+    """
+    将各种格式的股票数据统一为价格面板
+
+    已是 PricePanel 时直接返回，避免重复构建
+    """
+    if isinstance(data, PricePanel):
+        return data
+    if any(isinstance(value, pd.DataFrame) for value in data.values()):
+        return PricePanel.from_dataframes({s: df for s, df in data.items() if not df.empty})
+    return PricePanel.from_records(data)
@@ -0,0 +1,119 @@
+"""
+回测结果缓存
+以规范化配置与行情数据版本的哈希为键缓存完整回测结果，带 TTL 过期与按条目数的 LRU 淘汰。
+配置相同且所用行情数据未变化时，重复回测直接返回缓存结果。
+"""
+import hashlib
+import json
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+
+def _normalize(config: Any) -> Any:
+    """规范化配置：资产按代码排序、权重统一为浮点数，字典键顺序由 json 序列化时排序"""
+    if isinstance(config, Mapping):
+        normalized = {key: _normalize(value) for key, value in config.items()}
+        assets = normalized.get('assets')
+        if isinstance(assets, list) and all(isinstance(asset, dict) and 'symbol' in asset for asset in assets):
+            for asset in assets:
+                if isinstance(asset.get('weight'), (int, float)):
+                    asset['weight'] = float(asset['weight'])
+            normalized['assets'] = sorted(assets, key=lambda asset: str(asset['symbol']))
+        return normalized
+    if isinstance(config, (list, tuple)):
+        return [_normalize(value) for value in config]
+    if isinstance(config, bool) or config is None or isinstance(config, str):
+        return config
+    if isinstance(config, (int, float)):
+        return float(config)
+    return config
+
+
+def make_result_key(namespace: str, config: Mapping, data_versions: Mapping[str, int]) -> str:
+    """
+    生成结果缓存键
+
+    Args:
+        namespace: 回测类型，不同服务的结果互不共享
+        config: 回测配置
+        data_versions: {股票代码: 行情数据版本号}
+
+    Returns:
+        sha256 十六进制摘要
+    """
+    payload = {
+        'namespace': namespace,
+        'config': _normalize(config),
+        'data_versions': {symbol: int(version) for symbol, version in data_versions.items()}
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    回测结果缓存（线程安全）
+
+    结果以 pickle 序列化后的形式保存，每次读取反序列化出独立的副本，
+    调用方修改读取或写入的结果不会影响缓存。
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        """
+        Args:
+            max_entries: 最多缓存的结果数，超出时淘汰最久未使用的项
+            ttl: 结果有效期（秒）
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, Tuple[float, bytes]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """读取未过期的结果（独立副本），未命中时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                payload = entry[1]
+            else:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+        return pickle.loads(payload)
+
+    def put(self, key: str, result: Dict):
+        """写入结果"""
+        if self.max_entries <= 0:
+            return
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,299 @@
+"""
+滚动窗口与递推计算内核
+所有函数沿 axis 0（时间轴）计算，同时支持一维 (T,) 和二维 (T, N) 输入，
+NaN 视为缺失值：窗口内有效值不足 min_periods 时结果为 NaN（与 pandas rolling 一致）
+"""
+from typing import Optional
+import numpy as np
+from scipy.signal import lfilter
+
+
+def _as_float_2d(values: np.ndarray) -> tuple:
+    """转换为二维 float64，返回 (数组, 原始是否为一维)"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        return values[:, None], True
+    return values, False
+
+
+def _restore_shape(result: np.ndarray, squeeze: bool) -> np.ndarray:
+    return result[:, 0] if squeeze else result
+
+
+def _block_layout(values: np.ndarray, window: int, fill: float) -> tuple:
+    """
+    分块布局：左侧补 window-1 个填充值实现开头截断，右侧补齐为窗口长度的整数倍
+
+    Returns:
+        (分块数组 (块数, window, 列数), 每个结果窗口的起点行, 终点行)
+    """
+    n, columns = values.shape
+    padded_len = -(-(n + window - 1) // window) * window
+    padded = np.full((padded_len, columns), fill, dtype=values.dtype)
+    padded[window - 1:window - 1 + n] = values
+    starts = np.arange(n)
+    return padded.reshape(-1, window, columns), starts, starts + window - 1
+
+
+def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    每个位置结尾的窗口和（开头不足一个窗口的部分按已有数据求和）
+
+    窗口和 = 起点所在块的后缀和 + 终点所在块的前缀和，
+    每个结果只累加不超过一个窗口的数据，避免全序列前缀和相减带来的大数相消误差
+    """
+    window = max(int(window), 1)
+    columns = values.shape[1]
+    blocks, starts, ends = _block_layout(values, window, 0)
+    prefix = np.cumsum(blocks, axis=1).reshape(-1, columns)
+    suffix = np.cumsum(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1, columns)
+
+    sums = suffix[starts] + prefix[ends]
+    # 窗口恰好与块对齐时整块只计一次
+    aligned = starts % window == 0
+    sums[aligned] = prefix[ends[aligned]]
+    return sums
+
+
+def _window_counts(valid: np.ndarray, window: int) -> np.ndarray:
+    """窗口内有效值个数；没有缺失值时直接按位置计算"""
+    if valid.all():
+        counts = np.minimum(np.arange(1, valid.shape[0] + 1), max(int(window), 1))
+        return np.broadcast_to(counts[:, None], valid.shape).copy()
+    return _window_sums(valid.astype(np.int64), window)
+
+
+def rolling_count(values: np.ndarray, window: int) -> np.ndarray:
+    """窗口内有效（非NaN）值的个数"""
+    values, squeeze = _as_float_2d(values)
+    counts = _window_counts(~np.isnan(values), window)
+    return _restore_shape(counts, squeeze)
+
+
+def rolling_sum(values: np.ndarray, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """
+    滚动求和，O(n)
+
+    Args:
+        values: 输入序列 (T,) 或 (T, N)
+        window: 窗口长度
+        min_periods: 最少有效值个数，默认等于窗口长度
+    """
+    values, squeeze = _as_float_2d(values)
+    min_periods = window if min_periods is None else min_periods
+    valid = ~np.isnan(values)
+    sums = _window_sums(np.where(valid, values, 0.0), window)
+    counts = _window_counts(valid, window)
+    sums[counts < max(min_periods, 1)] = np.nan
+    return _restore_shape(sums, squeeze)
+
+
+def rolling_mean(values: np.ndarray, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """滚动平均，O(n)"""
+    values, squeeze = _as_float_2d(values)
+    min_periods = window if min_periods is None else min_periods
+    valid = ~np.isnan(values)
+    sums = _window_sums(np.where(valid, values, 0.0), window)
+    counts = _window_counts(valid, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = sums / counts
+    means[counts < max(min_periods, 1)] = np.nan
+    return _restore_shape(means, squeeze)
+
+
+def rolling_var(values: np.ndarray, window: int, ddof: int = 1,
+                min_periods: Optional[int] = None) -> np.ndarray:
+    """
+    滚动方差，O(n)
+
+    每个窗口由"起点所在块的后缀"和"终点所在块的前缀"两段组成，
+    各段以所在块的均值为基准累加，再用并行方差公式 (Chan et al.) 合并两段，
+    长期趋势明显的价格序列也不会出现大数相消误差
+    """
+    values, squeeze = _as_float_2d(values)
+    n, columns = values.shape
+    window = max(int(window), 1)
+    min_periods = window if min_periods is None else min_periods
+    if n == 0:
+        return _restore_shape(values.copy(), squeeze)
+
+    blocks, starts, ends = _block_layout(values, window, np.nan)
+    valid = ~np.isnan(blocks)
+    counts = valid.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        reference = np.where(counts > 0, np.where(valid, blocks, 0.0).sum(axis=1, keepdims=True) / counts, 0.0)
+    centered = np.where(valid, blocks - reference, 0.0)
+    weights = valid.astype(np.float64)
+    reference = np.broadcast_to(reference, blocks.shape).reshape(-1, columns)
+
+    def prefix(array):
+        return np.cumsum(array, axis=1).reshape(-1, columns)
+
+    def suffix(array):
+        return np.cumsum(array[:, ::-1], axis=1)[:, ::-1].reshape(-1, columns)
+
+    # 两段的个数、相对基准的和与平方和；窗口与块对齐时只有起点段
+    aligned = (starts % window == 0)[:, None]
+    count_a = suffix(weights)[starts]
+    sum_a = suffix(centered)[starts]
+    square_a = suffix(centered * centered)[starts]
+    count_b = np.where(aligned, 0.0, prefix(weights)[ends])
+    sum_b = np.where(aligned, 0.0, prefix(centered)[ends])
+    square_b = np.where(aligned, 0.0, prefix(centered * centered)[ends])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        m2_a = np.where(count_a > 0, square_a - sum_a * sum_a / count_a, 0.0)
+        m2_b = np.where(count_b > 0, square_b - sum_b * sum_b / count_b, 0.0)
+        delta = (reference[ends] + sum_b / count_b) - (reference[starts] + sum_a / count_a)
+        total = count_a + count_b
+        m2 = m2_a + m2_b + np.where((count_a > 0) & (count_b > 0), delta * delta * count_a * count_b / total, 0.0)
+        variances = np.maximum(m2, 0.0) / (total - ddof)
+
+    variances[(total < max(min_periods, 1)) | (total <= ddof)] = np.nan
+    return _restore_shape(variances, squeeze)
+
+
+def rolling_std(values: np.ndarray, window: int, ddof: int = 1,
+                min_periods: Optional[int] = None) -> np.ndarray:
+    """滚动标准差，O(n)"""
+    return np.sqrt(rolling_var(values, window, ddof, min_periods))
+
+
+# 平均绝对偏差逐块计算时每块最多展开的元素个数，限制临时内存
+_MAD_CHUNK_ELEMENTS = 1 << 22
+
+
+def rolling_mean_abs_dev(values: np.ndarray, window: int,
+                         min_periods: Optional[int] = None) -> np.ndarray:
+    """
+    滚动平均绝对偏差（精确值）
+
+    每个窗口内各值与"该窗口自身均值"之差的绝对值的平均，
+    即 pandas rolling(window).apply(lambda x: np.abs(x - x.mean()).mean())。
+    窗口均值 O(n) 求出后，按行分块展开滑动窗口视图向量化求偏差，计算量 O(n·window)
+    """
+    values, squeeze = _as_float_2d(values)
+    n, columns = values.shape
+    window = max(int(window), 1)
+    min_periods = window if min_periods is None else min_periods
+    if n == 0:
+        return _restore_shape(values.copy(), squeeze)
+
+    valid = ~np.isnan(values)
+    counts = _window_counts(valid, window)
+    means = rolling_mean(values, window, min_periods=1)
+
+    padded = np.full((n + window - 1, columns), np.nan)
+    padded[window - 1:] = values
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=0)
+
+    deviations = np.empty((n, columns))
+    chunk = max(1, _MAD_CHUNK_ELEMENTS // (columns * window))
+    for start in range(0, n, chunk):
+        stop = min(n, start + chunk)
+        deviation = np.abs(windows[start:stop] - means[start:stop, :, None])
+        deviations[start:stop] = np.where(np.isnan(deviation), 0.0, deviation).sum(axis=2)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = deviations / counts
+    result[counts < max(min_periods, 1)] = np.nan
+    return _restore_shape(result, squeeze)
+
+
+def _rolling_extreme(values: np.ndarray, window: int, min_periods: Optional[int],
+                     ufunc: np.ufunc, fill: float) -> np.ndarray:
+    """
+    van Herk/Gil-Werman 分块滚动极值
+
+    按窗口长度分块，分别求块内前缀极值和后缀极值，每个窗口的极值为
+    "窗口起点所在块的后缀极值" 与 "窗口终点所在块的前缀极值" 之一，
+    总复杂度 O(n)，与窗口长度无关
+    """
+    values, squeeze = _as_float_2d(values)
+    n, columns = values.shape
+    window = max(int(window), 1)
+    min_periods = window if min_periods is None else min_periods
+    valid = ~np.isnan(values)
+    if n == 0:
+        return _restore_shape(values.copy(), squeeze)
+
+    blocks, starts, ends = _block_layout(np.where(valid, values, fill), window, fill)
+    prefix = ufunc.accumulate(blocks, axis=1).reshape(-1, columns)
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1, columns)
+    result = ufunc(suffix[starts], prefix[ends])
+
+    counts = _window_counts(valid, window)
+    result[counts < max(min_periods, 1)] = np.nan
+    return _restore_shape(result, squeeze)
+
+
+def rolling_max(values: np.ndarray, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """滚动最大值，O(n)"""
+    return _rolling_extreme(values, window, min_periods, np.maximum, -np.inf)
+
+
+def rolling_min(values: np.ndarray, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """滚动最小值，O(n)"""
+    return _rolling_extreme(values, window, min_periods, np.minimum, np.inf)
+
+
+def _ema_across_gaps(column: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    首个有效值之后含缺失值的单列 EMA：连续有效段内用 IIR 滤波器递推，段与段之间按 pandas ignore_na=False 的权重衔接
+
+    间隔 k 个缺失值后 y = (w·y_prev + a·x) / (w + a)，w = (1-a)^(k+1)；缺失位置沿用上一个 EMA 值
+    """
+    observed = np.flatnonzero(~np.isnan(column))
+    result = np.full(len(column), np.nan)
+    breaks = np.flatnonzero(np.diff(observed) > 1) + 1
+    previous = np.nan
+    for begin, end in zip(np.concatenate(([0], breaks)), np.concatenate((breaks, [len(observed)]))):
+        first, last = observed[begin], observed[end - 1]
+        segment = column[first:last + 1]
+        if begin == 0:
+            head = segment[0]
+        else:
+            old_weight = (1.0 - alpha) ** (first - observed[begin - 1])
+            head = (old_weight * previous + alpha * segment[0]) / (old_weight + alpha)
+        # zi 使段首输出为 head：y[0] = a·x[0] + zi
+        result[first:last + 1], _ = lfilter([alpha], [1.0, alpha - 1.0], segment,
+                                             zi=[head - alpha * segment[0]])
+        previous = result[last]
+        if end < len(observed):
+            result[last + 1:observed[end]] = previous
+    result[observed[-1] + 1:] = previous
+    return result
+
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """
+    指数移动平均（与 pandas ewm(span, adjust=False) 一致）
+
+    以 IIR 滤波器 y[t] = a·x[t] + (1-a)·y[t-1] 一次完成递推，初值为首个有效值；
+    每列首个有效值之前为 NaN，缺失位置沿用上一个 EMA 值，缺失后的首个有效值按
+    pandas ignore_na=False 的规则以绝对位置计算衰减权重
+    """
+    values, squeeze = _as_float_2d(values)
+    n, columns = values.shape
+    if n == 0:
+        return _restore_shape(values.copy(), squeeze)
+
+    alpha = 2.0 / (span + 1.0)
+    valid = ~np.isnan(values)
+    has_data = valid.any(axis=0)
+    first_rows = np.where(has_data, valid.argmax(axis=0), 0)
+    first_values = np.where(has_data, values[first_rows, np.arange(columns)], 0.0)
+
+    # 首个有效值之前用首值填充（EMA保持不变），之后含缺失值的列随后单独计算
+    rows = np.arange(n)[:, None]
+    filled = np.where(valid, values, first_values[None, :])
+
+    zi = ((1.0 - alpha) * first_values)[None, :]
+    result, _ = lfilter([alpha], [1.0, alpha - 1.0], filled, axis=0, zi=zi)
+    result[rows < first_rows[None, :]] = np.nan
+    result[:, ~has_data] = np.nan
+
+    gapped = np.flatnonzero(has_data & (valid.sum(axis=0) < n - first_rows))
+    for column in gapped:
+        result[:, column] = _ema_across_gaps(values[:, column], alpha)
+    return _restore_shape(result, squeeze)
@@ -0,0 +1,382 @@
+"""
+增量技术指标
+每个指标对象保存计算所需的最小状态，每根新K线 O(1) 更新，
+状态可序列化为 JSON 兼容的字典（NaN 保存为 None）并在之后恢复，用于每日追加数据时避免从头重算。
+计算口径与 TechnicalIndicators 一致（简单移动平均版 RSI/ATR、样本标准差布林带、adjust=False 的 EMA）；
+输入为 NaN 的K线直接跳过，不改变状态。
+"""
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+def _is_missing(value: float) -> bool:
+    return value is None or math.isnan(value)
+
+
+def _nan_to_none(value: Any) -> Any:
+    """状态中的 NaN 转为 None（严格 JSON 不支持 NaN）"""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _nan_to_none(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_nan_to_none(item) for item in value]
+    return value
+
+
+def _none_to_nan(value: Any) -> Any:
+    """_nan_to_none 的逆操作"""
+    if value is None:
+        return math.nan
+    if isinstance(value, dict):
+        return {key: _none_to_nan(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_none_to_nan(item) for item in value]
+    return value
+
+
+class _RollingWindow:
+    """
+    定长环形缓冲区，维护窗口和与平方和
+
+    累加量相对 shift（最近一次重算时的窗口均值）计算以减小相消误差，
+    每转满一圈按缓冲区重新求和一次，消除长期累积的浮点漂移（均摊仍为 O(1)）
+    """
+    __slots__ = ('window', 'values', 'head', 'count', 'shift', 'total', 'total_sq')
+
+    def __init__(self, window: int):
+        if window < 1:
+            raise ValueError("Window must be a positive integer")
+        self.window = window
+        self.values = [0.0] * window
+        self.head = 0
+        self.count = 0
+        self.shift = 0.0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.window
+
+    def push(self, value: float):
+        if self.full:
+            old = self.values[self.head] - self.shift
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            if self.count == 0:
+                self.shift = value
+            self.count += 1
+
+        self.values[self.head] = value
+        centered = value - self.shift
+        self.total += centered
+        self.total_sq += centered * centered
+        self.head = (self.head + 1) % self.window
+
+        if self.head == 0 and self.full:
+            self._resync()
+
+    def _resync(self):
+        self.shift = sum(self.values) / self.window
+        centered = [v - self.shift for v in self.values]
+        self.total = sum(centered)
+        self.total_sq = sum(c * c for c in centered)
+
+    def mean(self) -> float:
+        if not self.full:
+            return math.nan
+        return self.shift + self.total / self.window
+
+    def std(self, ddof: int = 1) -> float:
+        if not self.full or self.window <= ddof:
+            return math.nan
+        variance = (self.total_sq - self.total * self.total / self.window) / (self.window - ddof)
+        return math.sqrt(max(variance, 0.0))
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            'window': self.window, 'values': list(self.values), 'head': self.head,
+            'count': self.count, 'shift': self.shift, 'total': self.total, 'total_sq': self.total_sq
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> '_RollingWindow':
+        window = cls(state['window'])
+        window.values = [float(v) for v in state['values']]
+        window.head = state['head']
+        window.count = state['count']
+        window.shift = state['shift']
+        window.total = state['total']
+        window.total_sq = state['total_sq']
+        return window
+
+
+class StreamingIndicator(ABC):
+    """增量指标基类"""
+    __slots__ = ()
+
+    def to_state(self) -> Dict[str, Any]:
+        """导出状态（JSON 兼容字典，NaN 保存为 None）"""
+        state = _nan_to_none(self._state())
+        state['indicator'] = type(self).__name__
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'StreamingIndicator':
+        """从 to_state 的结果恢复指标"""
+        if state.get('indicator') != cls.__name__:
+            raise ValueError(f"State of {state.get('indicator')} cannot restore {cls.__name__}")
+        indicator = cls.__new__(cls)
+        indicator._restore(_none_to_nan(state))
+        return indicator
+
+    @abstractmethod
+    def _state(self) -> Dict[str, Any]:
+        """指标自身的状态字段"""
+
+    @abstractmethod
+    def _restore(self, state: Dict[str, Any]):
+        """按 _state 的字段恢复"""
+
+
+class StreamingEMA(StreamingIndicator):
+    """指数移动平均（初值为首个有效价格）"""
+    __slots__ = ('span', 'alpha', 'value')
+
+    def __init__(self, span: int):
+        self.span = span
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = math.nan
+
+    def update(self, price: float) -> float:
+        if not _is_missing(price):
+            if math.isnan(self.value):
+                self.value = float(price)
+            else:
+                self.value += self.alpha * (price - self.value)
+        return self.value
+
+    def _state(self):
+        return {'span': self.span, 'value': self.value}
+
+    def _restore(self, state):
+        self.span = state['span']
+        self.alpha = 2.0 / (self.span + 1.0)
+        self.value = state['value']
+
+
+class StreamingMACD(StreamingIndicator):
+    """MACD：快慢EMA之差、信号线与柱状图"""
+    __slots__ = ('fast', 'slow', 'signal')
+
+    def __init__(self, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9):
+        self.fast = StreamingEMA(fast_period)
+        self.slow = StreamingEMA(slow_period)
+        self.signal = StreamingEMA(signal_period)
+
+    @property
+    def value(self) -> Dict[str, float]:
+        macd_line = self.fast.value - self.slow.value
+        return {'macd': macd_line, 'signal': self.signal.value, 'histogram': macd_line - self.signal.value}
+
+    def update(self, price: float) -> Dict[str, float]:
+        if not _is_missing(price):
+            macd_line = self.fast.update(price) - self.slow.update(price)
+            self.signal.update(macd_line)
+        return self.value
+
+    def _state(self):
+        return {'fast': self.fast.to_state(), 'slow': self.slow.to_state(), 'signal': self.signal.to_state()}
+
+    def _restore(self, state):
+        self.fast = StreamingEMA.from_state(state['fast'])
+        self.slow = StreamingEMA.from_state(state['slow'])
+        self.signal = StreamingEMA.from_state(state['signal'])
+
+
+class StreamingRSI(StreamingIndicator):
+    """RSI：窗口内平均涨幅与平均跌幅之比（首根K线按涨跌为0计入窗口）"""
+    __slots__ = ('period', 'prev_close', 'gains', 'losses')
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev_close = math.nan
+        self.gains = _RollingWindow(period)
+        self.losses = _RollingWindow(period)
+
+    @property
+    def value(self) -> float:
+        gain, loss = self.gains.mean(), self.losses.mean()
+        if math.isnan(gain) or loss == 0 and gain == 0:
+            return math.nan
+        if loss == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+    def update(self, close: float) -> float:
+        if not _is_missing(close):
+            delta = 0.0 if math.isnan(self.prev_close) else close - self.prev_close
+            self.gains.push(max(delta, 0.0))
+            self.losses.push(max(-delta, 0.0))
+            self.prev_close = float(close)
+        return self.value
+
+    def _state(self):
+        return {
+            'period': self.period, 'prev_close': self.prev_close,
+            'gains': self.gains.to_state(), 'losses': self.losses.to_state()
+        }
+
+    def _restore(self, state):
+        self.period = state['period']
+        self.prev_close = state['prev_close']
+        self.gains = _RollingWindow.from_state(state['gains'])
+        self.losses = _RollingWindow.from_state(state['losses'])
+
+
+class StreamingBollinger(StreamingIndicator):
+    """布林带：滚动均值 ± 倍数 × 滚动样本标准差"""
+    __slots__ = ('std_dev', 'window')
+
+    def __init__(self, period: int = 20, std_dev: float = 2):
+        self.std_dev = std_dev
+        self.window = _RollingWindow(period)
+
+    @property
+    def value(self) -> Dict[str, float]:
+        middle = self.window.mean()
+        width = self.window.std() * self.std_dev
+        return {'upper': middle + width, 'middle': middle, 'lower': middle - width}
+
+    def update(self, price: float) -> Dict[str, float]:
+        if not _is_missing(price):
+            self.window.push(float(price))
+        return self.value
+
+    def _state(self):
+        return {'std_dev': self.std_dev, 'window': self.window.to_state()}
+
+    def _restore(self, state):
+        self.std_dev = state['std_dev']
+        self.window = _RollingWindow.from_state(state['window'])
+
+
+class StreamingATR(StreamingIndicator):
+    """平均真实波幅：真实波幅的简单移动平均"""
+    __slots__ = ('prev_close', 'true_ranges')
+
+    def __init__(self, period: int = 14):
+        self.prev_close = math.nan
+        self.true_ranges = _RollingWindow(period)
+
+    @property
+    def value(self) -> float:
+        return self.true_ranges.mean()
+
+    def update(self, high: float, low: float, close: float) -> float:
+        if not (_is_missing(high) or _is_missing(low) or _is_missing(close)):
+            true_range = high - low
+            if not math.isnan(self.prev_close):
+                true_range = max(true_range, abs(high - self.prev_close), abs(low - self.prev_close))
+            self.true_ranges.push(true_range)
+            self.prev_close = float(close)
+        return self.value
+
+    def _state(self):
+        return {'prev_close': self.prev_close, 'true_ranges': self.true_ranges.to_state()}
+
+    def _restore(self, state):
+        self.prev_close = state['prev_close']
+        self.true_ranges = _RollingWindow.from_state(state['true_ranges'])
+
+
+class StreamingOBV(StreamingIndicator):
+    """成交量平衡指标：按涨跌方向累加成交量"""
+    __slots__ = ('prev_close', 'value')
+
+    def __init__(self):
+        self.prev_close = math.nan
+        self.value = 0.0
+
+    def update(self, close: float, volume: float) -> float:
+        if not (_is_missing(close) or _is_missing(volume)):
+            if not math.isnan(self.prev_close) and close != self.prev_close:
+                self.value += volume if close > self.prev_close else -volume
+            self.prev_close = float(close)
+        return self.value
+
+    def _state(self):
+        return {'prev_close': self.prev_close, 'value': self.value}
+
+    def _restore(self, state):
+        self.prev_close = state['prev_close']
+        self.value = state['value']
+
+
+class StreamingRollingMax(StreamingIndicator):
+    """
+    滚动最大值
+
+    单调队列保存窗口内可能成为最大值的 (序号, 值)，每个值最多入队出队一次，均摊 O(1)
+    """
+    __slots__ = ('window', 'count', 'queue')
+
+    def __init__(self, window: int = 20):
+        self.window = window
+        self.count = 0
+        self.queue: deque = deque()
+
+    def _dominates(self, new: float, old: float) -> bool:
+        return new >= old
+
+    @property
+    def value(self) -> float:
+        if self.count < self.window:
+            return math.nan
+        return self.queue[0][1]
+
+    def update(self, price: float) -> float:
+        if not _is_missing(price):
+            while self.queue and self._dominates(price, self.queue[-1][1]):
+                self.queue.pop()
+            self.queue.append((self.count, float(price)))
+            self.count += 1
+            if self.queue[0][0] <= self.count - 1 - self.window:
+                self.queue.popleft()
+        return self.value
+
+    def _state(self):
+        return {'window': self.window, 'count': self.count, 'queue': [list(item) for item in self.queue]}
+
+    def _restore(self, state):
+        self.window = state['window']
+        self.count = state['count']
+        self.queue = deque((int(i), float(v)) for i, v in state['queue'])
+
+
+class StreamingRollingMin(StreamingRollingMax):
+    """滚动最小值"""
+    __slots__ = ()
+
+    def _dominates(self, new: float, old: float) -> bool:
+        return new <= old
+
+
+_INDICATOR_TYPES = {
+    cls.__name__: cls for cls in (
+        StreamingEMA, StreamingMACD, StreamingRSI, StreamingBollinger,
+        StreamingATR, StreamingOBV, StreamingRollingMax, StreamingRollingMin
+    )
+}
+
+
+def restore_indicator(state: Dict[str, Any]) -> StreamingIndicator:
+    """根据状态中记录的指标类型恢复指标对象"""
+    indicator_type: Optional[type] = _INDICATOR_TYPES.get(state.get('indicator'))
+    if indicator_type is None:
+        raise ValueError(f"Unknown streaming indicator: {state.get('indicator')}")
+    return indicator_type.from_state(state)
@@ -3,7 +3,56 @@
 """
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
+
+from app.utils import rolling
+
+
+MatrixLike = Union[np.ndarray, pd.DataFrame]
+
+
+class _ColumnBatch:
+    """
+    (日期 × 股票) 批量计算的输入整理
+
+    每列的有效值稳定排序到顶部，使各列像单独传入的序列一样连续计算；
+    结果再按原位置放回，缺失位置为NaN。
+    """
+
+    def __init__(self, *inputs: MatrixLike):
+        template = inputs[0]
+        self.frame = template if isinstance(template, pd.DataFrame) else None
+        arrays = [np.asarray(data, dtype=np.float64) for data in inputs]
+        self.squeeze = arrays[0].ndim == 1
+        arrays = [array[:, None] if array.ndim == 1 else array for array in arrays]
+
+        valid = ~np.isnan(arrays[0])
+        for array in arrays[1:]:
+            valid &= ~np.isnan(array)
+        self.valid = valid
+        self.order = np.argsort(~valid, axis=0, kind='stable')
+        self.compact = [np.take_along_axis(np.where(valid, array, np.nan), self.order, axis=0)
+                        for array in arrays]
+
+    def expand(self, result: np.ndarray) -> MatrixLike:
+        """把紧凑排列的结果放回原始日期位置"""
+        output = np.empty_like(result)
+        np.put_along_axis(output, self.order, result, axis=0)
+        output[~self.valid] = np.nan
+        if self.squeeze:
+            output = output[:, 0]
+        if self.frame is not None:
+            return pd.DataFrame(output, index=self.frame.index, columns=self.frame.columns)
+        return output
+
+
+def _like(data: pd.Series, values: np.ndarray) -> pd.Series:
+    """以输入序列的索引包装计算结果"""
+    return pd.Series(values, index=data.index)
+
+
+def _values(data: pd.Series) -> np.ndarray:
+    return data.to_numpy(dtype=np.float64)
 
 
 class TechnicalIndicators:
@@ -21,14 +70,14 @@ class TechnicalIndicators:
         Returns:
             RSI值序列
         """
-        delta = data.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+        delta = np.nan_to_num(_values(data.diff()))
+        gain = rolling.rolling_mean(np.maximum(delta, 0.0), period)
+        loss = rolling.rolling_mean(np.maximum(-delta, 0.0), period)
         
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100 - (100 / (1 + gain / loss))
         
-        return rsi
+        return _like(data, rsi)
     
     @staticmethod
     def calculate_macd(data: pd.Series, fast_period: int = 12, 
@@ -78,22 +127,23 @@ class TechnicalIndicators:
         Returns:
             包含上轨、中轨、下轨的字典
         """
-        middle_band = data.rolling(window=period).mean()
-        std = data.rolling(window=period).std()
+        prices = _values(data)
+        middle_band = rolling.rolling_mean(prices, period)
+        std = rolling.rolling_std(prices, period)
         
         upper_band = middle_band + (std * std_dev)
         lower_band = middle_band - (std * std_dev)
         
         return {
-            'upper': upper_band,
-            'middle': middle_band,
-            'lower': lower_band
+            'upper': _like(data, upper_band),
+            'middle': _like(data, middle_band),
+            'lower': _like(data, lower_band)
         }
     
     @staticmethod
     def calculate_sma(data: pd.Series, period: int) -> pd.Series:
         """计算简单移动平均"""
-        return data.rolling(window=period).mean()
+        return _like(data, rolling.rolling_mean(_values(data), period))
     
     @staticmethod
     def calculate_ema(data: pd.Series, period: int) -> pd.Series:
@@ -116,15 +166,16 @@ class TechnicalIndicators:
         Returns:
             包含K线和D线的字典
         """
-        lowest_low = low.rolling(window=k_period).min()
-        highest_high = high.rolling(window=k_period).max()
+        lowest_low = rolling.rolling_min(_values(low), k_period)
+        highest_high = rolling.rolling_max(_values(high), k_period)
         
-        k_line = 100 * ((close - lowest_low) / (highest_high - lowest_low))
-        d_line = k_line.rolling(window=d_period).mean()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            k_line = 100 * ((_values(close) - lowest_low) / (highest_high - lowest_low))
+        d_line = rolling.rolling_mean(k_line, d_period)
         
         return {
-            'k': k_line,
-            'd': d_line
+            'k': _like(close, k_line),
+            'd': _like(close, d_line)
         }
     
     @staticmethod
@@ -147,9 +198,7 @@ class TechnicalIndicators:
         low_close = abs(low - close.shift())
         
         true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        atr = true_range.rolling(window=period).mean()
-        
-        return atr
+        return _like(close, rolling.rolling_mean(_values(true_range), period))
     
     @staticmethod
     def calculate_obv(close: pd.Series, volume: pd.Series) -> pd.Series:
@@ -186,6 +235,8 @@ class TechnicalIndicators:
         """
         计算商品通道指数(CCI)
         
+        平均偏差为每个窗口内典型价格相对该窗口均值的精确平均绝对偏差
+        
         Args:
             high: 最高价序列
             low: 最低价序列
@@ -195,12 +246,13 @@ class TechnicalIndicators:
         Returns:
             CCI序列
         """
-        typical_price = (high + low + close) / 3
-        sma = typical_price.rolling(window=period).mean()
-        mean_deviation = abs(typical_price - sma).rolling(window=period).mean()
+        typical_price = _values((high + low + close) / 3)
+        sma = rolling.rolling_mean(typical_price, period)
+        mean_deviation = rolling.rolling_mean_abs_dev(typical_price, period)
         
-        cci = (typical_price - sma) / (0.015 * mean_deviation)
-        return cci
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cci = (typical_price - sma) / (0.015 * mean_deviation)
+        return _like(close, cci)
     
     @staticmethod
     def detect_rsi_signals(rsi: pd.Series, oversold: float = 30, 
@@ -261,4 +313,113 @@ class TechnicalIndicators:
         """计算市净率"""
         if book_value_per_share <= 0:
             return float('inf')
-        return price / book_value_per_share
\ No newline at end of file
+        return price / book_value_per_share
+    
+    # ---------- 批量计算：输入为 (日期 × 股票) 矩阵，各列独立计算，NaN 为缺失 ----------
+    
+    @staticmethod
+    def calculate_rsi_batch(close: MatrixLike, period: int = 14) -> MatrixLike:
+        """
+        批量计算RSI
+        
+        Args:
+            close: 收盘价矩阵 (日期 × 股票)，ndarray 或 DataFrame
+            period: RSI计算周期
+        
+        Returns:
+            与输入同形状的RSI矩阵（输入为 DataFrame 时返回 DataFrame）
+        """
+        batch = _ColumnBatch(close)
+        (prices,) = batch.compact
+        delta = np.zeros_like(prices)
+        delta[1:] = np.nan_to_num(prices[1:] - prices[:-1])
+        gain = rolling.rolling_mean(np.maximum(delta, 0.0), period)
+        loss = rolling.rolling_mean(np.maximum(-delta, 0.0), period)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100 - 100 / (1 + gain / loss)
+        return batch.expand(rsi)
+    
+    @staticmethod
+    def calculate_macd_batch(close: MatrixLike, fast_period: int = 12, slow_period: int = 26,
+                             signal_period: int = 9) -> Dict[str, MatrixLike]:
+        """批量计算MACD，返回 macd/signal/histogram 矩阵"""
+        batch = _ColumnBatch(close)
+        (prices,) = batch.compact
+        macd_line = rolling.ema(prices, fast_period) - rolling.ema(prices, slow_period)
+        signal_line = rolling.ema(macd_line, signal_period)
+        return {
+            'macd': batch.expand(macd_line),
+            'signal': batch.expand(signal_line),
+            'histogram': batch.expand(macd_line - signal_line)
+        }
+    
+    @staticmethod
+    def calculate_bollinger_bands_batch(close: MatrixLike, period: int = 20,
+                                        std_dev: float = 2) -> Dict[str, MatrixLike]:
+        """批量计算布林带，返回 upper/middle/lower 矩阵"""
+        batch = _ColumnBatch(close)
+        (prices,) = batch.compact
+        middle = rolling.rolling_mean(prices, period)
+        width = rolling.rolling_std(prices, period) * std_dev
+        return {
+            'upper': batch.expand(middle + width),
+            'middle': batch.expand(middle),
+            'lower': batch.expand(middle - width)
+        }
+    
+    @staticmethod
+    def calculate_atr_batch(high: MatrixLike, low: MatrixLike, close: MatrixLike,
+                            period: int = 14) -> MatrixLike:
+        """批量计算ATR（任一价格缺失的日期视为缺失）"""
+        batch = _ColumnBatch(high, low, close)
+        high_, low_, close_ = batch.compact
+        true_range = high_ - low_
+        prev_close = close_[:-1]
+        true_range[1:] = np.fmax(true_range[1:], np.fmax(np.abs(high_[1:] - prev_close),
+                                                         np.abs(low_[1:] - prev_close)))
+        return batch.expand(rolling.rolling_mean(true_range, period))
+    
+    @staticmethod
+    def calculate_cci_batch(high: MatrixLike, low: MatrixLike, close: MatrixLike,
+                            period: int = 20) -> MatrixLike:
+        """批量计算CCI（任一价格缺失的日期视为缺失）"""
+        batch = _ColumnBatch(high, low, close)
+        high_, low_, close_ = batch.compact
+        typical_price = (high_ + low_ + close_) / 3
+        sma = rolling.rolling_mean(typical_price, period)
+        mean_deviation = rolling.rolling_mean_abs_dev(typical_price, period)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cci = (typical_price - sma) / (0.015 * mean_deviation)
+        return batch.expand(cci)
+    
+    @staticmethod
+    def calculate_momentum_batch(close: MatrixLike, period: int = 10) -> MatrixLike:
+        """
+        批量计算动量（与各股票 period 个交易日前的价格之差）
+
+        Raises:
+            ValueError: period 小于1
+        """
+        if period < 1:
+            raise ValueError("Momentum period must be at least 1")
+        batch = _ColumnBatch(close)
+        (prices,) = batch.compact
+        momentum = np.full_like(prices, np.nan)
+        momentum[period:] = prices[period:] - prices[:-period]
+        return batch.expand(momentum)
+    
+    @staticmethod
+    def calculate_stochastic_batch(high: MatrixLike, low: MatrixLike, close: MatrixLike,
+                                   k_period: int = 14, d_period: int = 3) -> Dict[str, MatrixLike]:
+        """批量计算随机指标，返回 k/d 矩阵（任一价格缺失的日期视为缺失）"""
+        batch = _ColumnBatch(high, low, close)
+        high_, low_, close_ = batch.compact
+        lowest_low = rolling.rolling_min(low_, k_period)
+        highest_high = rolling.rolling_max(high_, k_period)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            k_line = 100 * ((close_ - lowest_low) / (highest_high - lowest_low))
+        d_line = rolling.rolling_mean(k_line, d_period)
+        return {
+            'k': batch.expand(k_line),
+            'd': batch.expand(d_line)
+        }
@@ -0,0 +1,218 @@
+"""
+交易日历
+预先生成交易所交易日（int64 天数数组）并缓存到磁盘，支持批量将任意日期映射到交易日
+"""
+import os
+import threading
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar, Holiday, GoodFriday, USPresidentsDay, USMemorialDay,
+    USLaborDay, USThanksgivingDay, nearest_workday, sunday_to_monday
+)
+from pandas.tseries.offsets import DateOffset
+from dateutil.relativedelta import MO
+
+from app.core.config import settings
+from app.utils.date_utils import to_day_number, day_numbers_to_strings
+
+
+# 休市规则版本，规则调整后递增以使磁盘缓存失效
+RULES_VERSION = 1
+
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    """纽约证券交易所节假日规则"""
+    rules = [
+        # 元旦逢周六不在前一个周五补休
+        Holiday('NewYearsDay', month=1, day=1, observance=sunday_to_monday),
+        Holiday('MartinLutherKingJrDay', month=1, day=1, start_date='1998-01-01',
+                offset=DateOffset(weekday=MO(3))),
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, start_date='2022-01-01', observance=nearest_workday),
+        Holiday('IndependenceDay', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas', month=12, day=25, observance=nearest_workday),
+    ]
+
+
+# 非节假日的临时休市（国葬、恐怖袭击、飓风等）
+NYSE_SPECIAL_CLOSURES = [
+    '1994-04-27',
+    '2001-09-11', '2001-09-12', '2001-09-13', '2001-09-14',
+    '2004-06-11',
+    '2007-01-02',
+    '2012-10-29', '2012-10-30',
+    '2018-12-05',
+    '2025-01-09',
+]
+
+
+class TradingCalendar:
+    """
+    交易日历
+
+    交易日为工作日去除节假日与临时休市日，首次使用时生成并以 .npy 保存到缓存目录，
+    之后直接加载。所有查询都基于有序 int64 天数数组的 searchsorted，支持批量处理。
+    """
+
+    def __init__(self, name: str = 'XNYS', start_date: str = '1990-01-01',
+                 end_date: str = '2035-12-31', cache_dir: Optional[str] = None):
+        """
+        Args:
+            name: 交易所代码（目前只支持纽约证券交易所）
+            start_date: 日历开始日期
+            end_date: 日历结束日期
+            cache_dir: 缓存目录，默认使用配置中的 trading_calendar_dir
+        """
+        self.name = name
+        self.start_date = start_date
+        self.end_date = end_date
+        self.cache_dir = cache_dir or settings.trading_calendar_dir
+        self._sessions: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def sessions(self) -> np.ndarray:
+        """全部交易日（升序 int64 天数）"""
+        if self._sessions is None:
+            with self._lock:
+                if self._sessions is None:
+                    self._sessions = self._load_or_build()
+        return self._sessions
+
+    def is_session(self, days: np.ndarray) -> np.ndarray:
+        """批量判断是否为交易日"""
+        days = np.asarray(days, dtype=np.int64)
+        sessions = self.sessions
+        idx = np.minimum(np.searchsorted(sessions, days), len(sessions) - 1)
+        return sessions[idx] == days
+
+    def next_sessions(self, days: np.ndarray) -> np.ndarray:
+        """
+        批量映射到当日或之后的第一个交易日
+
+        Returns:
+            交易日天数数组，超出日历范围的位置为 -1
+        """
+        days = np.asarray(days, dtype=np.int64)
+        sessions = self.sessions
+        idx = np.searchsorted(sessions, days, side='left')
+        in_range = idx < len(sessions)
+        return np.where(in_range, sessions[np.minimum(idx, len(sessions) - 1)], -1)
+
+    def sessions_in_range(self, start_day: int, end_day: int) -> np.ndarray:
+        """闭区间 [start_day, end_day] 内的交易日"""
+        sessions = self.sessions
+        lo = np.searchsorted(sessions, start_day, side='left')
+        hi = np.searchsorted(sessions, end_day, side='right')
+        return sessions[lo:hi]
+
+    def schedule(self, start_date: str, end_date: str, frequency: str,
+                 day_of_month: int = 1) -> np.ndarray:
+        """
+        生成投资计划并映射到交易日
+
+        计划日期（每月第几天、每周、每两周、每日）遇到周末或休市时顺延到下一个交易日，
+        顺延后超出结束日期的丢弃。
+
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+            frequency: monthly / weekly / biweekly / daily
+            day_of_month: 每月第几天（超过当月天数时取月末）
+
+        Returns:
+            去重后的交易日天数数组
+        """
+        start_day = to_day_number(start_date)
+        end_day = to_day_number(end_date)
+
+        if frequency == 'monthly':
+            months = np.arange(np.datetime64(start_date[:7], 'M'), np.datetime64(end_date[:7], 'M') + 1)
+            month_starts = months.astype('datetime64[D]').astype(np.int64)
+            days_in_month = (months + 1).astype('datetime64[D]').astype(np.int64) - month_starts
+            planned = month_starts + np.minimum(day_of_month, days_in_month) - 1
+        elif frequency == 'weekly':
+            planned = np.arange(start_day, end_day + 1, 7, dtype=np.int64)
+        elif frequency == 'biweekly':
+            planned = np.arange(start_day, end_day + 1, 14, dtype=np.int64)
+        elif frequency == 'daily':
+            return self.sessions_in_range(start_day, end_day)
+        else:
+            return np.empty(0, dtype=np.int64)
+
+        planned = planned[(planned >= start_day) & (planned <= end_day)]
+        mapped = self.next_sessions(planned)
+        return np.unique(mapped[(mapped >= 0) & (mapped <= end_day)])
+
+    def schedule_strings(self, start_date: str, end_date: str, frequency: str,
+                         day_of_month: int = 1) -> List[str]:
+        """生成投资计划（YYYY-MM-DD 字符串列表）"""
+        return day_numbers_to_strings(self.schedule(start_date, end_date, frequency, day_of_month))
+
+    @staticmethod
+    def period_codes(days: np.ndarray, frequency: str) -> Optional[np.ndarray]:
+        """
+        日期所属的月/季/年编号，相邻日期编号不同即跨越了周期
+
+        Returns:
+            int64 编号数组，频率不支持时返回None
+        """
+        months = np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        if frequency == 'monthly':
+            return months
+        if frequency == 'quarterly':
+            return months // 3
+        if frequency == 'yearly':
+            return months // 12
+        return None
+
+    def _cache_file(self) -> str:
+        return os.path.join(
+            self.cache_dir, f"{self.name}_{self.start_date}_{self.end_date}_v{RULES_VERSION}.npy"
+        )
+
+    def _load_or_build(self) -> np.ndarray:
+        """从磁盘加载交易日，不存在时生成并保存"""
+        cache_file = self._cache_file()
+        try:
+            return np.load(cache_file)
+        except (FileNotFoundError, ValueError):
+            pass
+
+        sessions = self._build_sessions()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+            np.save(tmp_file, sessions)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            print(f"Trading calendar cache write error: {e}")
+        return sessions
+
+    def _build_sessions(self) -> np.ndarray:
+        """工作日去除节假日与临时休市日"""
+        weekdays = pd.bdate_range(self.start_date, self.end_date)
+        holidays = NYSEHolidayCalendar().holidays(self.start_date, self.end_date)
+        closures = pd.DatetimeIndex(NYSE_SPECIAL_CLOSURES)
+        sessions = weekdays.difference(holidays).difference(closures)
+        return sessions.values.astype('datetime64[D]').astype(np.int64)
+
+
+_default_calendar: Optional[TradingCalendar] = None
+_default_calendar_lock = threading.Lock()
+
+
+def get_trading_calendar() -> TradingCalendar:
+    """获取进程内共享的默认交易日历"""
+    global _default_calendar
+    if _default_calendar is None:
+        with _default_calendar_lock:
+            if _default_calendar is None:
+                _default_calendar = TradingCalendar()
+    return _default_calendar
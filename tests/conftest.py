@@ -10,8 +10,19 @@ from sqlalchemy.orm import sessionmaker
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+from app.core.config import settings
 from app.core.database import Base
 from app.models import Portfolio, BacktestResult, BacktestConfig
+from app.utils import trading_calendar
+
+
+@pytest.fixture(scope="session", autouse=True)
+def trading_calendar_dir(tmp_path_factory):
+    """默认交易日历的缓存写入临时目录，测试不写入仓库的 data 目录"""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(settings, 'trading_calendar_dir', str(tmp_path_factory.mktemp('calendar')))
+        monkeypatch.setattr(trading_calendar, '_default_calendar', None)
+        yield settings.trading_calendar_dir
 
 
 @pytest.fixture(scope="session")
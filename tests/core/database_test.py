@@ -0,0 +1,86 @@
+"""
+数据库结构升级单元测试
+"""
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import init_db
+from app.dao.backtest_dao import BacktestDAO
+
+
+# 旧版本 backtest_results 表：portfolio_id/config_id 不可空，没有 details、series_key 列与分页索引
+LEGACY_BACKTEST_RESULTS = """
+CREATE TABLE backtest_results (
+    id INTEGER NOT NULL,
+    backtest_id VARCHAR(50) NOT NULL,
+    portfolio_id VARCHAR(50) NOT NULL,
+    config_id INTEGER NOT NULL,
+    config_summary JSON NOT NULL,
+    total_return FLOAT,
+    annualized_return FLOAT,
+    volatility FLOAT,
+    max_drawdown FLOAT,
+    sharpe_ratio FLOAT,
+    sortino_ratio FLOAT,
+    performance_summary JSON,
+    risk_metrics JSON,
+    portfolio_decomposition JSON,
+    annual_returns JSON,
+    monthly_returns JSON,
+    drawdown_periods JSON,
+    time_series TEXT,
+    status VARCHAR(20),
+    error_message TEXT,
+    calculation_time_ms INTEGER,
+    created_at DATETIME,
+    completed_at DATETIME,
+    PRIMARY KEY (id)
+)
+"""
+
+
+class TestUpgradeSchema:
+    """已有数据库结构升级测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        self.engine = create_engine("sqlite:///:memory:")
+        with self.engine.begin() as conn:
+            conn.execute(text(LEGACY_BACKTEST_RESULTS))
+            conn.execute(text("CREATE UNIQUE INDEX ix_backtest_results_backtest_id ON backtest_results (backtest_id)"))
+            conn.execute(text("CREATE INDEX ix_backtest_results_id ON backtest_results (id)"))
+            conn.execute(text(
+                "INSERT INTO backtest_results (id, backtest_id, portfolio_id, config_id, config_summary, status, created_at) "
+                "VALUES (1, 'bt_old', 'p_1', 1, '{}', 'completed', '2023-01-01 10:00:00.000000')"
+            ))
+
+    def teardown_method(self):
+        """每个测试方法后的清理"""
+        self.engine.dispose()
+
+    def test_legacy_backtest_results_upgraded(self):
+        """测试旧表补齐新列与索引、放宽可空约束并保留已有数据"""
+        # Act
+        init_db(self.engine)
+        init_db(self.engine)
+
+        # Assert
+        inspector = inspect(self.engine)
+        columns = {column['name']: column for column in inspector.get_columns('backtest_results')}
+        indexes = {index['name'] for index in inspector.get_indexes('backtest_results')}
+        assert {'details', 'series_key'} <= set(columns)
+        assert columns['portfolio_id']['nullable'] and columns['config_id']['nullable']
+        assert {'ix_backtest_results_backtest_id', 'ix_backtest_results_created_at_id'} <= indexes
+        assert 'backtest_timeseries' in inspector.get_table_names()
+        assert 'backtest_results_legacy' not in inspector.get_table_names()
+
+        dao = BacktestDAO(session_factory=sessionmaker(bind=self.engine), hot_cache_size=0)
+        assert dao.get_backtest('bt_old')['status'] == 'completed'
+        dao.save_backtest({
+            'backtest_id': 'bt_new',
+            'status': 'completed',
+            'config_summary': {},
+            'time_series': [{'date': '2020-01-01', 'value': 100.0}],
+            'created_at': '2024-01-01T10:00:00'
+        })
+        assert dao.get_time_series('bt_new') == [{'date': '2020-01-01', 'value': 100.0}]
@@ -0,0 +1,237 @@
+"""
+BacktestDAO 单元测试
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.dao.backtest_dao import BacktestDAO, decompress_json
+from app.models.backtest import BacktestResult, BacktestTimeSeries
+from app.utils.downsample import FULL_SERIES_KEY
+
+
+def _make_result(backtest_id, created_at, total_return=5.0, days=300):
+    return {
+        'backtest_id': backtest_id,
+        'status': 'completed',
+        'config_summary': {'start_date': '2020-01-01', 'end_date': '2020-12-31', 'initial_amount': 10000.0},
+        'performance_summary': {'start_value': 10000.0, 'end_value': 10500.0,
+                                'total_return_pct': total_return, 'annualized_return_pct': 5.0},
+        'risk_metrics': {'volatility_annual_pct': 20.0, 'max_drawdown_pct': -10.0,
+                         'sharpe_ratio': 0.75, 'sortino_ratio': 1.0, 'positive_rate_pct': 55.0},
+        'portfolio_composition': [{'symbol': 'AAPL', 'weight': 100.0}],
+        'annual_returns': [{'year': 2020, 'annual_return': 5.0}],
+        'benchmark_comparison': None,
+        'time_series': [{'date': f'2020-01-{i % 28 + 1:02d}', 'value': 10000.0 + i} for i in range(days)],
+        'created_at': created_at
+    }
+
+
+class TestBacktestDAO:
+    """回测结果持久化测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.dao = BacktestDAO(session_factory=self.session_factory, hot_cache_size=2)
+
+    def teardown_method(self):
+        """每个测试方法后的清理"""
+        self.engine.dispose()
+
+    def test_save_and_get_round_trip(self):
+        """测试保存后从数据库读取得到相同的结果"""
+        # Arrange
+        result = _make_result('bt_1', '2024-01-01T10:00:00')
+        self.dao.save_backtest(result)
+        fresh_dao = BacktestDAO(session_factory=self.session_factory)
+
+        # Act
+        loaded = fresh_dao.get_backtest('bt_1')
+
+        # Assert
+        assert loaded == result
+        assert fresh_dao.get_backtest('bt_missing') is None
+
+    def test_time_series_stored_in_table(self):
+        """测试时间序列逐日写入时间序列表，可按区间与字段读取"""
+        # Arrange
+        result = _make_result('bt_1', '2024-01-01T10:00:00', days=0)
+        result['time_series'] = [
+            {'date': f'2020-01-{day:02d}', 'value': 100.0 + day, 'daily_return': day / 100, 'rebalanced': day == 3}
+            for day in range(1, 11)
+        ]
+
+        # Act
+        self.dao.save_backtest(result)
+        window = self.dao.get_time_series('bt_1', start_date='2020-01-03', end_date='2020-01-05', columns=['value'])
+
+        # Assert
+        session = self.session_factory()
+        record = session.query(BacktestResult).filter(BacktestResult.backtest_id == 'bt_1').first()
+        row_count = session.query(BacktestTimeSeries).filter(BacktestTimeSeries.backtest_id == 'bt_1').count()
+        session.close()
+        assert record.time_series is None
+        assert row_count == 10
+        assert window == [
+            {'date': '2020-01-03', 'value': 103.0},
+            {'date': '2020-01-04', 'value': 104.0},
+            {'date': '2020-01-05', 'value': 105.0}
+        ]
+        assert self.dao.get_time_series('bt_1', start_date='2020-01-10')[0] == {
+            'date': '2020-01-10', 'value': 110.0, 'daily_return': 0.1, 'rebalanced': False
+        }
+        assert BacktestDAO(session_factory=self.session_factory).get_backtest('bt_1') == result
+
+    def test_full_series_is_persisted(self):
+        """测试结果带有完整序列时保存完整序列而不是降采样后的序列"""
+        # Arrange
+        full = [{'date': f'2020-{month:02d}-{day:02d}', 'value': float(month * 100 + day)}
+                for month in range(1, 13) for day in range(1, 29)]
+        result = _make_result('bt_1', '2024-01-01T10:00:00', days=0)
+        result['time_series'] = full[::50]
+        result[FULL_SERIES_KEY] = full
+
+        # Act
+        self.dao.save_backtest(result)
+        loaded = BacktestDAO(session_factory=self.session_factory).get_backtest('bt_1')
+
+        # Assert
+        assert self.dao.get_time_series('bt_1', columns=['value']) == full
+        assert loaded['time_series'] == full
+        assert FULL_SERIES_KEY not in loaded
+        assert self.dao.get_backtest('bt_1') == loaded
+
+    def test_save_enhanced_result(self):
+        """测试增强回测的 portfolio_values 写入时间序列表，读取时还原为原字段"""
+        # Arrange
+        result = _make_result('bt_1', '2024-01-01T10:00:00', days=0)
+        del result['time_series']
+        result['portfolio_values'] = [
+            {'date': f'2020-01-{day:02d}', 'value': 100.0 + day, 'cash': 10.0, 'holdings_value': 90.0 + day}
+            for day in range(1, 6)
+        ]
+        result['transactions'] = [{'date': '2020-01-01', 'symbol': 'AAPL', 'action': 'buy', 'shares': 1.0}]
+
+        # Act
+        self.dao.save_backtest(result)
+        loaded = BacktestDAO(session_factory=self.session_factory).get_backtest('bt_1')
+
+        # Assert
+        session = self.session_factory()
+        record = session.query(BacktestResult).filter(BacktestResult.backtest_id == 'bt_1').first()
+        session.close()
+        assert 'portfolio_values' not in decompress_json(record.details)
+        assert self.dao.get_time_series('bt_1', columns=['value', 'cash']) == [
+            {'date': point['date'], 'value': point['value'], 'cash': point['cash']}
+            for point in result['portfolio_values']
+        ]
+        assert loaded == result
+        assert 'time_series' not in loaded
+
+    def test_irregular_time_series_falls_back_to_compressed(self):
+        """测试含表外字段或重复日期的时间序列改为压缩存储"""
+        # Arrange
+        result = _make_result('bt_1', '2024-01-01T10:00:00', days=2000)
+
+        # Act
+        self.dao.save_backtest(result)
+
+        # Assert
+        session = self.session_factory()
+        record = session.query(BacktestResult).filter(BacktestResult.backtest_id == 'bt_1').first()
+        session.close()
+        assert decompress_json(record.time_series) == result['time_series']
+        assert len(record.time_series) < len(str(result['time_series'])) / 4
+        assert record.total_return == 5.0
+        assert record.sharpe_ratio == 0.75
+        assert self.dao.get_time_series('bt_1', start_date='2020-01-28', columns=['value'])[0] == {
+            'date': '2020-01-28', 'value': 10027.0
+        }
+
+    def test_unknown_time_series_column(self):
+        """测试不支持的字段"""
+        with pytest.raises(ValueError):
+            self.dao.get_time_series('bt_1', columns=['price'])
+
+    def test_hot_cache_is_bounded(self):
+        """测试热缓存按最近使用淘汰"""
+        # Arrange
+        for i in range(3):
+            self.dao.save_backtest(_make_result(f'bt_{i}', f'2024-01-0{i + 1}T10:00:00'))
+
+        # Act & Assert
+        assert list(self.dao.results_cache) == ['bt_1', 'bt_2']
+        assert self.dao.get_backtest('bt_0')['backtest_id'] == 'bt_0'
+        assert list(self.dao.results_cache) == ['bt_2', 'bt_0']
+
+    def test_cached_result_is_not_shared(self):
+        """测试修改读取到的结果不影响热缓存与保存时传入的结果"""
+        # Arrange
+        result = _make_result('bt_1', '2024-01-01T10:00:00', days=3)
+        self.dao.save_backtest(result)
+        expected = _make_result('bt_1', '2024-01-01T10:00:00', days=3)
+
+        # Act
+        loaded = self.dao.get_backtest('bt_1')
+        loaded['time_series'] = loaded['time_series'][:1]
+        loaded['performance_summary']['end_value'] = 0.0
+        result['risk_metrics']['sharpe_ratio'] = 0.0
+
+        # Assert
+        assert self.dao.get_backtest('bt_1') == expected
+
+    def test_history_keyset_pagination(self):
+        """测试历史记录按创建时间倒序分页，同一时间的记录不重复不遗漏"""
+        # Arrange
+        for i in range(5):
+            self.dao.save_backtest(_make_result(f'bt_{i}', f'2024-01-0{i + 1}T10:00:00', total_return=float(i)))
+        self.dao.save_backtest(_make_result('bt_same', '2024-01-03T10:00:00'))
+
+        # Act
+        pages = []
+        cursor = None
+        while True:
+            page, cursor = self.dao.get_backtest_history(limit=2, cursor=cursor)
+            pages.append([item['backtest_id'] for item in page])
+            if cursor is None:
+                break
+
+        # Assert
+        assert pages == [['bt_4', 'bt_3'], ['bt_same', 'bt_2'], ['bt_1', 'bt_0']]
+        first_page, _ = self.dao.get_backtest_history(limit=1)
+        assert first_page[0]['total_return_pct'] == 4.0
+        assert 'time_series' not in first_page[0]
+
+    def test_invalid_cursor(self):
+        """测试无效游标"""
+        with pytest.raises(ValueError):
+            self.dao.get_backtest_history(limit=2, cursor='not-a-cursor')
+
+    def test_save_dca_result(self):
+        """测试定投结果以 dca_id 作为回测ID保存"""
+        # Arrange
+        result = {
+            'dca_id': 'dca_1',
+            'status': 'completed',
+            'config_summary': {'start_date': '2020-01-01', 'end_date': '2020-01-02'},
+            'performance': {'final_value': 2100.0},
+            'time_series': [
+                {'date': '2020-01-01', 'invested': 1000.0, 'value': 1000.0, 'return_pct': 0.0, 'triggered': True},
+                {'date': '2020-01-02', 'invested': 2000.0, 'value': 2100.0, 'return_pct': 5.0, 'triggered': False}
+            ],
+            'created_at': '2024-01-01T10:00:00'
+        }
+
+        # Act
+        backtest_id = self.dao.save_backtest(result)
+        loaded = BacktestDAO(session_factory=self.session_factory).get_backtest('dca_1')
+
+        # Assert
+        assert backtest_id == 'dca_1'
+        assert loaded['dca_id'] == 'dca_1'
+        assert loaded['performance'] == result['performance']
+        assert loaded['time_series'] == result['time_series']
@@ -0,0 +1,189 @@
+"""
+PriceStore 单元测试
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from app.dao.price_store import PriceStore
+from app.utils.date_utils import to_day_number
+
+
+def _write_days(root_dir, first_day, count):
+    """在子进程中逐日写入（每次写入一天）"""
+    store = PriceStore(root_dir, ttl=3600)
+    for day in range(first_day, first_day + count):
+        columns = {'Date': np.array([day], dtype=np.int64), 'Close': np.array([float(day)])}
+        store.write('AAPL', columns, day, day + 1)
+
+
+class TestPriceStore:
+    """列式行情存储测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        self.root_dir = tempfile.mkdtemp()
+        self.store = PriceStore(self.root_dir, ttl=3600)
+
+    def teardown_method(self):
+        """每个测试方法后清理目录"""
+        shutil.rmtree(self.root_dir, ignore_errors=True)
+
+    def _columns(self, start: str, count: int, base_price: float = 100.0):
+        dates = np.arange(count, dtype=np.int64) + to_day_number(start)
+        close = base_price + np.arange(count, dtype=np.float64)
+        return {
+            'Date': dates,
+            'Open': close - 1,
+            'High': close + 1,
+            'Low': close - 2,
+            'Close': close,
+            'Volume': np.full(count, 1000, dtype=np.int64)
+        }
+
+    def test_write_and_read_window(self):
+        """测试写入后按相同窗口读取"""
+        # Arrange
+        start, end = to_day_number('2020-01-01'), to_day_number('2020-01-11')
+        self.store.write('AAPL', self._columns('2020-01-01', 10), start, end)
+
+        # Act
+        result = self.store.read('AAPL', start, end)
+
+        # Assert
+        assert result is not None
+        assert result['Date'].dtype == np.int64
+        assert result['Close'].dtype == np.float64
+        assert isinstance(result['Close'], np.memmap)
+        assert len(result['Close']) == 10
+        assert result['Close'][0] == 100.0
+
+    def test_read_unknown_window_misses(self):
+        """测试未缓存的窗口返回None"""
+        start, end = to_day_number('2020-01-01'), to_day_number('2020-01-11')
+        self.store.write('AAPL', self._columns('2020-01-01', 10), start, end)
+
+        assert self.store.read('AAPL', start, end + 5) is None
+        assert self.store.read('MSFT', start, end) is None
+
+    def test_sub_range_served_from_coverage(self):
+        """测试已覆盖区间的任意子区间均可命中"""
+        # Arrange
+        start, end = to_day_number('2020-01-01'), to_day_number('2020-01-31')
+        self.store.write('AAPL', self._columns('2020-01-01', 30), start, end)
+
+        # Act
+        result = self.store.read('AAPL', to_day_number('2020-01-10'), to_day_number('2020-01-20'))
+
+        # Assert
+        assert result is not None
+        assert len(result['Date']) == 10
+        assert result['Date'][0] == to_day_number('2020-01-10')
+
+    def test_missing_ranges_and_merge(self):
+        """测试缺失区间计算与覆盖区间合并"""
+        # Arrange
+        self.store.write('AAPL', self._columns('2020-01-01', 10),
+                         to_day_number('2020-01-01'), to_day_number('2020-01-11'))
+        self.store.write('AAPL', self._columns('2020-01-21', 10),
+                         to_day_number('2020-01-21'), to_day_number('2020-01-31'))
+
+        # Act
+        gaps = self.store.missing_ranges('AAPL', to_day_number('2019-12-25'), to_day_number('2020-02-05'))
+
+        # Assert
+        assert gaps == [
+            (to_day_number('2019-12-25'), to_day_number('2020-01-01')),
+            (to_day_number('2020-01-11'), to_day_number('2020-01-21')),
+            (to_day_number('2020-01-31'), to_day_number('2020-02-05')),
+        ]
+
+        # 补齐中间缺口后两个区间合并为一个
+        self.store.mark_covered('AAPL', to_day_number('2020-01-11'), to_day_number('2020-01-21'))
+        assert self.store.missing_ranges('AAPL', to_day_number('2020-01-01'), to_day_number('2020-01-31')) == []
+
+    def test_write_merges_and_bumps_version(self):
+        """测试合并写入（重叠日期以新数据为准）并递增版本"""
+        # Arrange
+        first_start, first_end = to_day_number('2020-01-01'), to_day_number('2020-01-11')
+        second_start, second_end = to_day_number('2020-01-06'), to_day_number('2020-01-16')
+        self.store.write('AAPL', self._columns('2020-01-01', 10), first_start, first_end)
+        self.store.write('AAPL', self._columns('2020-01-06', 10, base_price=500.0), second_start, second_end)
+
+        # Act
+        result = self.store.read('AAPL', first_start, first_end)
+
+        # Assert
+        assert self.store.get_version('AAPL') == 2
+        assert len(result['Date']) == 10
+        assert np.all(np.diff(result['Date']) > 0)
+        assert result['Close'][4] == 104.0  # 2020-01-05 仅存在于第一次写入
+        assert result['Close'][5] == 500.0  # 2020-01-06 被第二次写入覆盖
+
+    def test_expired_window_misses(self):
+        """测试过期缓存不命中"""
+        store = PriceStore(self.root_dir, ttl=0)
+        start, end = to_day_number('2020-01-01'), to_day_number('2020-01-11')
+        store.write('AAPL', self._columns('2020-01-01', 10), start, end)
+
+        assert store.read('AAPL', start, end) is None
+
+    def test_special_symbol_characters(self):
+        """测试指数等带特殊字符的代码"""
+        start, end = to_day_number('2020-01-01'), to_day_number('2020-01-04')
+        self.store.write('^GSPC', self._columns('2020-01-01', 3), start, end)
+
+        result = self.store.read('^GSPC', start, end)
+
+        assert result is not None
+        assert len(result['Close']) == 3
+
+    def test_previous_version_kept_on_disk(self):
+        """测试写入后保留上一个版本目录，更早的版本被清理"""
+        # Arrange
+        start = to_day_number('2020-01-01')
+        for i in range(3):
+            self.store.write('AAPL', self._columns('2020-01-01', 5, base_price=100.0 * (i + 1)), start, start + 5)
+
+        # Act
+        entries = sorted(entry for entry in os.listdir(os.path.join(self.root_dir, 'AAPL')) if entry.startswith('v'))
+
+        # Assert
+        assert entries == ['v2', 'v3']
+
+    def test_read_range_retries_with_fresh_meta(self):
+        """测试元数据指向的版本已被清理时重新读取元数据"""
+        # Arrange
+        start = to_day_number('2020-01-01')
+        for i in range(3):
+            self.store.write('AAPL', self._columns('2020-01-01', 5, base_price=100.0 * (i + 1)), start, start + 5)
+        load_meta = self.store._load_meta
+        stale = [{'version': 1, 'rows': 5, 'coverage': []}]
+        self.store._load_meta = lambda symbol: stale.pop() if stale else load_meta(symbol)
+
+        # Act
+        result = self.store.read_range('AAPL', start, start + 5)
+
+        # Assert
+        assert result['Close'][0] == 300.0
+
+    def test_concurrent_writes_from_processes(self):
+        """测试多个进程同时写入同一股票时不丢失数据"""
+        # Arrange
+        start = to_day_number('2020-01-01')
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_write_days, args=(self.root_dir, start + i * 20, 20)) for i in range(2)]
+
+        # Act
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+
+        # Assert
+        result = PriceStore(self.root_dir, ttl=3600).read('AAPL', start, start + 40)
+        assert all(worker.exitcode == 0 for worker in workers)
+        assert result is not None
+        assert result['Date'].tolist() == list(range(start, start + 40))
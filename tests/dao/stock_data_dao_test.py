@@ -2,11 +2,15 @@
 StockDataDAO 单元测试
 """
 import pytest
+import shutil
+import tempfile
 from unittest.mock import Mock, patch, MagicMock
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
 from app.dao.stock_data_dao import StockDataDAO
+from app.utils.date_utils import to_day_number
 
 
 class TestStockDataDAO:
@@ -14,7 +18,12 @@ class TestStockDataDAO:
     
     def setup_method(self):
         """每个测试方法前的初始化"""
-        self.stock_dao = StockDataDAO()
+        self.cache_dir = tempfile.mkdtemp()
+        self.stock_dao = StockDataDAO(cache_dir=self.cache_dir)
+    
+    def teardown_method(self):
+        """每个测试方法后清理缓存目录"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
     
     def test_get_stock_data_success(self):
         """测试成功获取股票数据"""
@@ -65,6 +74,78 @@ class TestStockDataDAO:
             
             assert "No data available" in str(exc_info.value)
     
+    def test_get_stock_data_reuses_overlapping_cache(self):
+        """测试重叠区间复用缓存，只获取两端缺失部分"""
+        # Arrange
+        symbol = "AAPL"
+        cached_data = pd.DataFrame({
+            'Open': [100.0] * 10,
+            'High': [102.0] * 10,
+            'Low': [99.0] * 10,
+            'Close': [101.0 + i for i in range(10)],
+            'Volume': [1000000] * 10
+        }, index=pd.date_range(start="2020-01-06", periods=10, freq='B'))
+        edge_data = pd.DataFrame({
+            'Open': [90.0], 'High': [92.0], 'Low': [89.0], 'Close': [91.0], 'Volume': [500000]
+        }, index=pd.DatetimeIndex(["2020-01-03"]))
+        
+        with patch('yfinance.Ticker') as mock_ticker:
+            mock_instance = MagicMock()
+            mock_instance.history.return_value = cached_data
+            mock_ticker.return_value = mock_instance
+            self.stock_dao.get_stock_data(symbol, "2020-01-06", "2020-01-18")
+            
+            # Act: 子区间完全命中缓存
+            mock_instance.history.reset_mock()
+            sub_range = self.stock_dao.get_stock_data(symbol, "2020-01-07", "2020-01-14")
+            sub_range_calls = mock_instance.history.call_count
+            
+            # Act: 向前扩展只获取缺失的左侧区间
+            mock_instance.history.return_value = edge_data
+            extended = self.stock_dao.get_stock_data(symbol, "2020-01-01", "2020-01-18")
+        
+        # Assert
+        assert sub_range_calls == 0
+        assert [row['Date'] for row in sub_range][0] == "2020-01-07"
+        assert len(sub_range) == 5
+        mock_instance.history.assert_called_once()
+        assert mock_instance.history.call_args.kwargs['start'] == "2020-01-01"
+        assert mock_instance.history.call_args.kwargs['end'] == "2020-01-06"
+        assert len(extended) == 11
+        assert extended[0]['Close'] == 91.0
+    
+    def test_gaps_without_data_are_not_fetched_again(self):
+        """测试不含交易日的缺失区间不请求，请求成功但无数据的区间记录覆盖后不再重复请求"""
+        # Arrange
+        symbol = "AAPL"
+        cached_data = pd.DataFrame({
+            'Open': [100.0] * 5, 'High': [102.0] * 5, 'Low': [99.0] * 5,
+            'Close': [101.0] * 5, 'Volume': [1000000] * 5
+        }, index=pd.date_range(start="2024-01-02", periods=5, freq='B'))
+        
+        with patch('yfinance.Ticker') as mock_ticker:
+            mock_instance = MagicMock()
+            mock_instance.history.return_value = cached_data
+            mock_ticker.return_value = mock_instance
+            self.stock_dao.get_stock_data(symbol, "2024-01-02", "2024-01-09")
+            
+            # Act: 2023-12-30..2024-01-01 为周末与元旦，不含交易日
+            mock_instance.history.reset_mock()
+            self.stock_dao.get_stock_data(symbol, "2023-12-30", "2024-01-09")
+            holiday_calls = mock_instance.history.call_count
+            
+            # Act: 数据源在左侧区间没有数据，第二次请求不再获取
+            mock_instance.history.return_value = pd.DataFrame()
+            first = self.stock_dao.get_stock_data(symbol, "2023-12-01", "2024-01-09")
+            second = self.stock_dao.get_stock_data(symbol, "2023-12-01", "2024-01-09")
+        
+        # Assert
+        assert holiday_calls == 0
+        mock_instance.history.assert_called_once()
+        assert mock_instance.history.call_args.kwargs['start'] == "2023-12-01"
+        assert mock_instance.history.call_args.kwargs['end'] == "2023-12-30"
+        assert len(first) == len(second) == 5
+    
     def test_get_multiple_stocks_data(self):
         """测试获取多只股票数据"""
         # Arrange
@@ -170,22 +251,72 @@ class TestStockDataDAO:
         assert 'Apple' in result[0]['name']
     
     def test_cache_operations(self):
-        """测试缓存操作"""
+        """测试已写入列式缓存的区间直接从缓存读取"""
         # Arrange
         symbol = "AAPL"
         start_date = "2020-01-01"
         end_date = "2020-01-03"
-        test_data = [
-            {'Date': '2020-01-01', 'Open': 100, 'Close': 101, 'Volume': 1000000}
-        ]
-        
-        # Test save to cache
-        self.stock_dao._save_to_cache(symbol, start_date, end_date, test_data)
+        columns = {
+            'Date': np.array([to_day_number('2020-01-02')], dtype=np.int64),
+            'Open': np.array([100.0]), 'Close': np.array([101.0]), 'Volume': np.array([1000000])
+        }
+        self.stock_dao.price_store.write(symbol, columns, to_day_number(start_date), to_day_number(end_date))
         
-        # Test get from cache
-        cached_data = self.stock_dao._get_from_cache(symbol, start_date, end_date)
+        # Act
+        with patch('yfinance.Ticker') as mock_ticker:
+            cached_data = self.stock_dao.get_stock_data(symbol, start_date, end_date)
         
         # Assert
-        assert cached_data is not None
+        mock_ticker.assert_not_called()
         assert len(cached_data) == 1
-        assert cached_data[0]['Close'] == 101
\ No newline at end of file
+        assert cached_data[0]['Date'] == '2020-01-02'
+        assert cached_data[0]['Close'] == 101
+    
+    def test_fetch_retries_with_backoff(self):
+        """测试数据源异常时重试"""
+        # Arrange
+        mock_data = pd.DataFrame({
+            'Open': [100.0], 'High': [102.0], 'Low': [99.0], 'Close': [101.0], 'Volume': [1000000]
+        }, index=pd.DatetimeIndex(["2020-01-02"]))
+        
+        # Act
+        with patch('yfinance.Ticker') as mock_ticker, \
+                patch('app.dao.stock_data_dao.time.sleep') as mock_sleep:
+            mock_instance = MagicMock()
+            mock_instance.history.side_effect = [ConnectionError("rate limited"), mock_data]
+            mock_ticker.return_value = mock_instance
+            
+            result = self.stock_dao.get_stock_data("AAPL", "2020-01-01", "2020-01-03")
+        
+        # Assert
+        assert len(result) == 1
+        assert mock_instance.history.call_count == 2
+        mock_sleep.assert_called_once()
+        assert 0 <= mock_sleep.call_args.args[0] <= self.stock_dao.retry_backoff
+    
+    def test_get_multiple_stocks_columns_reports_errors(self):
+        """测试并发获取时按股票报告错误"""
+        # Arrange
+        mock_data = pd.DataFrame({
+            'Open': [100.0], 'High': [102.0], 'Low': [99.0], 'Close': [101.0], 'Volume': [1000000]
+        }, index=pd.DatetimeIndex(["2020-01-02"]))
+        
+        def make_ticker(symbol):
+            instance = MagicMock()
+            if symbol == "BAD":
+                instance.history.side_effect = ConnectionError("unreachable")
+            else:
+                instance.history.return_value = mock_data
+            return instance
+        
+        # Act
+        with patch('yfinance.Ticker', side_effect=make_ticker), \
+                patch('app.dao.stock_data_dao.time.sleep'):
+            columns, errors = self.stock_dao.get_multiple_stocks_columns(
+                ["AAPL", "BAD", "MSFT", "AAPL"], "2020-01-01", "2020-01-03"
+            )
+        
+        # Assert
+        assert set(columns) == {"AAPL", "MSFT"}
+        assert list(errors) == ["BAD"]
+        assert "unreachable" in errors["BAD"]
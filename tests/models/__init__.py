@@ -0,0 +1 @@
+"""模型测试包"""
@@ -0,0 +1,142 @@
+"""
+TransactionAnalyzer 单元测试
+"""
+from datetime import datetime
+import pytest
+import numpy as np
+
+from app.models.transaction import (
+    Transaction, TransactionAnalyzer, TransactionLedger, TransactionType, BuyReason,
+    BUY_SIGNAL_PRIORITY, NO_SIGNAL
+)
+from app.utils.date_utils import to_day_number
+
+
+class TestTransactionAnalyzer:
+    """交易分析器测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        self.analyzer = TransactionAnalyzer()
+        self.config = {'daily_drop_threshold': -0.05, 'drawdown_threshold': -0.10, 'rsi_oversold': 30}
+
+    def test_evaluate_buy_signals_priority(self):
+        """测试批量信号按原有优先级取第一个命中的条件"""
+        # Arrange
+        close = np.array([90.0, 100.0, 100.0, 100.0, 100.0])
+        prev_close = np.array([100.0, 100.0, 100.0, np.nan, 100.0])
+        indicators = {
+            'drawdown': np.array([-0.20, -0.20, 0.0, 0.0, 0.0]),
+            'rsi': np.array([20.0, 20.0, 20.0, np.nan, 50.0]),
+            'support_level': np.array([0.0, 0.0, 0.0, 99.0, 0.0])
+        }
+
+        # Act
+        mask, reason_codes, trigger_values = self.analyzer.evaluate_buy_signals(
+            close, prev_close, indicators, self.config
+        )
+
+        # Assert
+        assert mask.tolist() == [True, True, True, True, False]
+        assert [BUY_SIGNAL_PRIORITY[code] if code != NO_SIGNAL else None for code in reason_codes] == [
+            BuyReason.PRICE_DROP, BuyReason.DRAWDOWN, BuyReason.RSI_OVERSOLD, BuyReason.SUPPORT_LEVEL, None
+        ]
+        assert trigger_values[0] == pytest.approx(-0.10)
+        assert trigger_values[3] == 99.0
+        assert np.isnan(trigger_values[4])
+
+    def test_evaluate_buy_signals_2d(self):
+        """测试 (日期 × 股票) 二维输入"""
+        close = np.array([[100.0, 50.0], [94.0, 50.0]])
+        prev_close = np.array([[np.nan, np.nan], [100.0, 50.0]])
+
+        mask, _, _ = self.analyzer.evaluate_buy_signals(close, prev_close, {}, self.config)
+
+        assert mask.tolist() == [[False, False], [True, False]]
+
+    def test_check_buy_signals_details(self):
+        """测试逐条检查接口的描述与详细信息"""
+        # Act
+        should_buy, reason, reason_code, details = self.analyzer.check_buy_signals(
+            95.0, [100.0, 95.0], {'rsi': 50.0}, self.config
+        )
+
+        # Assert
+        assert should_buy is True
+        assert reason_code == BuyReason.PRICE_DROP
+        assert reason == "当日跌幅-5.00%，触发买入"
+        assert details == {'daily_return': '-5.00%', 'trigger_threshold': '-5.0%'}
+
+    def test_check_buy_signals_no_signal(self):
+        """测试无信号"""
+        result = self.analyzer.check_buy_signals(100.0, [100.0], {'rsi': 50.0}, self.config)
+
+        assert result == (False, "", BuyReason.CUSTOM, {})
+
+
+class TestTransactionLedger:
+    """列式交易明细测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        self.ledger = TransactionLedger(capacity=2)
+        trades = [
+            ('2020-01-02', 'AAPL', 100.0, 5000.0, BuyReason.INITIAL),
+            ('2020-01-02', 'MSFT', 200.0, 5000.0, BuyReason.INITIAL),
+            ('2020-03-09', 'AAPL', 80.123456, 200.0, BuyReason.PRICE_DROP),
+            ('2020-03-12', 'MSFT', 150.0, 160.0, BuyReason.RSI_OVERSOLD),
+            ('2020-03-16', 'AAPL', 70.0, 128.0, BuyReason.PRICE_DROP),
+        ]
+        for date, symbol, price, amount, reason_code in trades:
+            self.ledger.append(
+                day=to_day_number(date), symbol=symbol, transaction_type=TransactionType.BUY,
+                shares=amount / price, price=price, amount=amount, reason=reason_code.value,
+                reason_code=reason_code, details={'price': f"{price:.2f}"},
+                portfolio_value_before=10000.0, portfolio_value_after=10000.0
+            )
+
+    def test_records_match_transaction_to_dict(self):
+        """测试扩容后逐行序列化结果与 Transaction.to_dict 一致，且只转换一次"""
+        # Act
+        records = self.ledger.to_records()
+
+        # Assert
+        assert len(self.ledger) == 5
+        assert records == [t.to_dict() for t in self.ledger]
+        assert records[2]['price'] == 80.12
+        assert records[2]['date'] == '2020-03-09'
+        assert self.ledger.to_records() is records
+        assert self.ledger[-1].symbol == 'AAPL'
+
+    def test_summary_aggregates_by_reason(self):
+        """测试按原因汇总笔数与金额（按首次出现顺序），不重复输出明细"""
+        # Act
+        summary = self._summary()
+
+        # Assert
+        assert summary['total_transactions'] == 5
+        assert summary['buy_count'] == 5
+        assert summary['sell_count'] == 0
+        assert summary['total_buy_amount'] == pytest.approx(10488.0)
+        assert list(summary['reason_statistics']) == ['初始买入', '价格下跌', 'RSI超卖']
+        assert summary['reason_statistics']['价格下跌'] == {'count': 2, 'total_amount': pytest.approx(328.0)}
+        assert 'transactions' not in summary['reason_statistics']['价格下跌']
+        assert 'all_transactions' not in summary
+
+    def test_analyze_transaction_list(self):
+        """测试 Transaction 列表与明细表的汇总结果一致"""
+        # Arrange
+        transactions = list(self.ledger)
+
+        # Act
+        summary = TransactionAnalyzer.analyze_transactions(transactions)
+
+        # Assert
+        assert isinstance(transactions[0], Transaction)
+        assert isinstance(transactions[0].date, datetime)
+        assert summary == self._summary()
+        assert TransactionAnalyzer.analyze_transactions([]) == {}
+
+    def _summary(self):
+        return TransactionAnalyzer.analyze_transactions(self.ledger)
+
@@ -0,0 +1,184 @@
+"""
+EnhancedBacktestService 单元测试
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import numpy as np
+import pandas as pd
+from unittest.mock import Mock
+
+from app.services.backtest_service_enhanced import EnhancedBacktestService, BacktestRunContext
+from app.models.transaction import BuyReason
+from app.utils.date_utils import strings_to_day_numbers
+
+
+def _columns_result(stock_data):
+    """将字典列表格式的模拟行情转换为 get_multiple_stocks_columns 的返回值 (columns, errors)"""
+    columns, errors = {}, {}
+    for symbol, rows in stock_data.items():
+        if not rows:
+            errors[symbol] = f"No data available for {symbol}"
+            continue
+        columns[symbol] = {'Date': strings_to_day_numbers(row['Date'] for row in rows)}
+        for name in rows[0]:
+            if name != 'Date':
+                columns[symbol][name] = np.array([row[name] for row in rows])
+    return columns, errors
+
+
+class _FakeStockDAO:
+    """按股票代码生成确定性行情的数据访问对象，可选在返回前等待所有线程到齐"""
+
+    def __init__(self, barrier=None):
+        self.barrier = barrier
+
+    def get_multiple_stocks_columns(self, symbols, start_date, end_date):
+        if self.barrier is not None:
+            self.barrier.wait()
+        data = {}
+        dates = pd.bdate_range(start_date, end_date)
+        for symbol in symbols:
+            rng = np.random.default_rng(sum(map(ord, symbol)))
+            closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.03, len(dates))))
+            data[symbol] = [
+                {'Date': d.strftime('%Y-%m-%d'), 'Open': c, 'High': c, 'Low': c, 'Close': c, 'Volume': 1000}
+                for d, c in zip(dates, closes)
+            ]
+        return _columns_result(data)
+
+    def get_data_version(self, symbol):
+        return 1
+
+
+class TestEnhancedBacktestService:
+    """增强版回测服务测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        self.service = EnhancedBacktestService()
+        self.service.stock_dao = Mock()
+
+    def _frame(self, dates, closes):
+        df = pd.DataFrame({
+            'Open': closes,
+            'High': closes,
+            'Low': closes,
+            'Close': closes,
+            'Volume': [1000] * len(closes)
+        }, index=pd.DatetimeIndex(pd.to_datetime(dates), name='Date'))
+        return self.service._calculate_indicators(df)
+
+    def test_simulate_trading_price_drop_uses_own_previous_close(self):
+        """测试日跌幅按该股票自身上一交易日收盘价计算（与其他股票的日期无关）"""
+        # Arrange
+        stock_dataframes = {
+            'AAPL': self._frame(['2020-01-02', '2020-01-06'], [100.0, 90.0]),
+            'MSFT': self._frame(['2020-01-02', '2020-01-03', '2020-01-06'], [100.0, 100.0, 100.0])
+        }
+        config = {
+            'assets': [{'symbol': 'AAPL', 'weight': 50.0}, {'symbol': 'MSFT', 'weight': 40.0}],
+            'initial_amount': 10000.0,
+            'buy_conditions': {'daily_drop_threshold': -0.05, 'drawdown_threshold': -0.5, 'rsi_oversold': 0}
+        }
+
+        # Act
+        run = BacktestRunContext(config)
+        portfolio_values = self.service._simulate_trading(stock_dataframes, run)
+
+        # Assert
+        assert [point['date'] for point in portfolio_values] == ['2020-01-02', '2020-01-03', '2020-01-06']
+        # 2020-01-03 AAPL无数据，按前一交易日收盘价估值
+        assert portfolio_values[1]['value'] == pytest.approx(1000.0 + 50 * 100.0 + 40 * 100.0)
+        trades = [t for t in run.transactions if t.reason_code != BuyReason.INITIAL]
+        assert len(trades) == 1
+        assert trades[0].symbol == 'AAPL'
+        assert trades[0].reason_code == BuyReason.PRICE_DROP
+        assert trades[0].amount == pytest.approx(200.0)  # 剩余现金1000的20%
+        assert portfolio_values[-1]['cash'] == pytest.approx(800.0)
+
+    def test_no_price_data_fails(self):
+        """测试所有股票都没有行情数据时回测失败（不产生空的已完成结果）"""
+        # Arrange
+        self.service.stock_dao.get_multiple_stocks_columns.return_value = _columns_result({'AAPL': []})
+        config = {
+            'assets': [{'symbol': 'AAPL', 'weight': 100.0}],
+            'start_date': '2020-01-01',
+            'end_date': '2020-03-31',
+            'initial_amount': 10000.0
+        }
+
+        # Act
+        result = self.service.run_backtest_with_transactions(config)
+
+        # Assert
+        assert result['status'] == 'failed'
+        assert 'No price data' in result['error']
+
+    def test_threshold_change_reuses_cached_indicators(self):
+        """测试只修改买入阈值时复用已缓存的指标，不重新计算"""
+        # Arrange
+        dates = pd.bdate_range('2020-01-01', periods=60)
+        closes = [100.0 + (i % 7) - (i % 11) for i in range(60)]
+        self.service.stock_dao.get_multiple_stocks_columns.return_value = _columns_result({
+            'AAPL': [
+                {'Date': d.strftime('%Y-%m-%d'), 'Open': c, 'High': c, 'Low': c, 'Close': c, 'Volume': 1000}
+                for d, c in zip(dates, closes)
+            ]
+        })
+        self.service.stock_dao.get_data_version.return_value = 3
+        config = {
+            'assets': [{'symbol': 'AAPL', 'weight': 100.0}],
+            'start_date': '2020-01-01',
+            'end_date': '2020-03-31',
+            'initial_amount': 10000.0,
+            'buy_conditions': {'rsi_oversold': 30}
+        }
+
+        # Act
+        first = self.service.run_backtest_with_transactions(config)
+        config['buy_conditions'] = {'rsi_oversold': 45}
+        second = self.service.run_backtest_with_transactions(config)
+
+        # Assert
+        assert first['status'] == 'completed'
+        assert second['status'] == 'completed'
+        stats = self.service.indicator_cache.stats()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 1
+
+    def test_concurrent_runs_are_isolated(self):
+        """测试同一服务实例被多个线程同时调用时，各次回测的交易记录与结果互不干扰"""
+        # Arrange
+        symbol_sets = [['AAPL', 'MSFT'], ['NVDA'], ['TSLA', 'AMZN'], ['GOOG', 'META']]
+        configs = [
+            {
+                'assets': [{'symbol': s, 'weight': 100.0 / len(symbols)} for s in symbols],
+                'start_date': '2020-01-01',
+                'end_date': '2020-12-31',
+                'initial_amount': 10000.0 * (i + 1),
+                'buy_conditions': {'daily_drop_threshold': -0.02 - 0.01 * (i % 3), 'rsi_oversold': 35}
+            }
+            for i, symbols in enumerate(symbol_sets * 4)
+        ]
+        sequential = EnhancedBacktestService()
+        sequential.stock_dao = _FakeStockDAO()
+        expected = [sequential.run_backtest_with_transactions(config) for config in configs]
+        self.service.stock_dao = _FakeStockDAO(threading.Barrier(len(configs), timeout=30))
+
+        # Act
+        with ThreadPoolExecutor(max_workers=len(configs)) as executor:
+            results = list(executor.map(self.service.run_backtest_with_transactions, configs))
+
+        # Assert
+        for config, result, reference in zip(configs, results, expected):
+            assert result['status'] == 'completed'
+            assert result['transactions'] == reference['transactions']
+            assert result['transaction_summary'] == reference['transaction_summary']
+            assert result['portfolio_values'] == reference['portfolio_values']
+            symbols = {asset['symbol'] for asset in config['assets']}
+            assert {t['symbol'] for t in result['transactions']} <= symbols
+            assert result['transactions'][0]['amount'] == pytest.approx(
+                config['initial_amount'] * config['assets'][0]['weight'] / 100
+            )
+
@@ -2,8 +2,26 @@
 回测服务单元测试
 """
 import pytest
+import numpy as np
 from unittest.mock import Mock, patch, MagicMock
 from app.services.backtest_service import BacktestService
+from app.services.job_service import PROGRESS_COMPUTING
+from app.utils.date_utils import strings_to_day_numbers
+from app.utils.downsample import FULL_SERIES_KEY
+
+
+def _columns_result(stock_data):
+    """将字典列表格式的模拟行情转换为 get_multiple_stocks_columns 的返回值 (columns, errors)"""
+    columns, errors = {}, {}
+    for symbol, rows in stock_data.items():
+        if not rows:
+            errors[symbol] = f"No data available for {symbol}"
+            continue
+        columns[symbol] = {'Date': strings_to_day_numbers(row['Date'] for row in rows)}
+        for name in rows[0]:
+            if name != 'Date':
+                columns[symbol][name] = np.array([row[name] for row in rows])
+    return columns, errors
 
 
 class TestBacktestService:
@@ -149,7 +167,7 @@ class TestBacktestService:
         self.backtest_service.calculator = Mock()
         
         # Mock股票数据
-        self.backtest_service.stock_dao.get_multiple_stocks_data.return_value = {
+        self.backtest_service.stock_dao.get_multiple_stocks_columns.return_value = _columns_result({
             'AAPL': [
                 {'Date': '2020-01-01', 'Close': 100.0},
                 {'Date': '2020-01-02', 'Close': 105.0}
@@ -158,7 +176,7 @@ class TestBacktestService:
                 {'Date': '2020-01-01', 'Close': 200.0},
                 {'Date': '2020-01-02', 'Close': 210.0}
             ]
-        }
+        })
         
         # Mock计算结果
         self.backtest_service.calculator.calculate_portfolio_values.return_value = [
@@ -181,10 +199,12 @@ class TestBacktestService:
         ]
         
         # Act
-        result = self.backtest_service.run_backtest(portfolio_config)
+        with patch('app.services.backtest_service.report_progress') as mock_progress:
+            result = self.backtest_service.run_backtest(portfolio_config)
         
         # Assert
         assert result['status'] == 'completed'
+        mock_progress.assert_called_once_with(PROGRESS_COMPUTING)
         assert 'backtest_id' in result
         assert result['performance_summary']['total_return_pct'] == 5.0
         assert result['risk_metrics']['volatility_annual_pct'] == 20.0
@@ -202,7 +222,7 @@ class TestBacktestService:
         
         # Mock错误
         self.backtest_service.stock_dao = Mock()
-        self.backtest_service.stock_dao.get_multiple_stocks_data.side_effect = Exception("Failed to fetch data")
+        self.backtest_service.stock_dao.get_multiple_stocks_columns.side_effect = Exception("Failed to fetch data")
         
         # Act
         result = self.backtest_service.run_backtest(portfolio_config)
@@ -225,13 +245,15 @@ class TestBacktestService:
         }
         
         # Mock空数据
-        mock_dao.return_value.get_multiple_stocks_data.return_value = {
+        mock_dao.return_value.get_multiple_stocks_columns.return_value = _columns_result({
             'AAPL': []
-        }
+        })
         
         mock_calculator.return_value.calculate_portfolio_values.return_value = []
         mock_calculator.return_value.calculate_risk_metrics.return_value = {}
         mock_calculator.return_value.calculate_annual_returns.return_value = []
+        self.backtest_service.stock_dao = mock_dao.return_value
+        self.backtest_service.calculator = mock_calculator.return_value
         
         # Act
         result = self.backtest_service.run_backtest(portfolio_config)
@@ -239,4 +261,124 @@ class TestBacktestService:
         # Assert
         assert result['status'] == 'completed'
         assert result['performance_summary']['end_value'] == 0
-        assert result['time_series'] == []
\ No newline at end of file
+        assert result['time_series'] == []    
+    def test_run_backtest_rebalancing_fetches_once(self):
+        """测试再平衡回测只获取一次数据（基准随资产一起获取）"""
+        # Arrange
+        portfolio_config = {
+            'assets': [
+                {'symbol': 'AAPL', 'weight': 50.0},
+                {'symbol': 'MSFT', 'weight': 50.0}
+            ],
+            'start_date': '2020-01-01',
+            'end_date': '2020-03-31',
+            'initial_amount': 10000.0,
+            'rebalance_frequency': 'monthly',
+            'benchmark': 'SPY'
+        }
+        
+        self.backtest_service.stock_dao = Mock()
+        self.backtest_service.stock_dao.get_multiple_stocks_columns.return_value = _columns_result({
+            'AAPL': [
+                {'Date': '2020-01-02', 'Close': 100.0},
+                {'Date': '2020-02-03', 'Close': 110.0},
+                {'Date': '2020-03-02', 'Close': 105.0}
+            ],
+            'MSFT': [
+                {'Date': '2020-01-02', 'Close': 200.0},
+                {'Date': '2020-02-03', 'Close': 190.0},
+                {'Date': '2020-03-02', 'Close': 210.0}
+            ],
+            'SPY': [
+                {'Date': '2020-01-02', 'Close': 300.0},
+                {'Date': '2020-02-03', 'Close': 310.0},
+                {'Date': '2020-03-02', 'Close': 305.0}
+            ]
+        })
+        
+        # Act
+        result = self.backtest_service.run_backtest(portfolio_config)
+        
+        # Assert
+        assert result['status'] == 'completed'
+        self.backtest_service.stock_dao.get_multiple_stocks_columns.assert_called_once_with(
+            ['AAPL', 'MSFT', 'SPY'], '2020-01-01', '2020-03-31'
+        )
+        self.backtest_service.stock_dao.get_multiple_stocks_dataframes.assert_not_called()
+        assert len(result['time_series']) == 3
+        assert result['benchmark_comparison']['benchmark_symbol'] == 'SPY'
+    
+    def test_run_backtest_reuses_cached_result(self):
+        """测试相同配置且数据版本未变时直接返回缓存结果"""
+        # Arrange
+        portfolio_config = {
+            'assets': [
+                {'symbol': 'AAPL', 'weight': 50.0},
+                {'symbol': 'MSFT', 'weight': 50.0}
+            ],
+            'start_date': '2020-01-01',
+            'end_date': '2020-03-31',
+            'initial_amount': 10000.0
+        }
+        reordered_config = dict(portfolio_config, assets=[
+            {'symbol': 'MSFT', 'weight': 50},
+            {'symbol': 'AAPL', 'weight': 50}
+        ], initial_amount=10000)
+        
+        self.backtest_service.stock_dao = Mock()
+        self.backtest_service.stock_dao.get_data_version.return_value = 1
+        self.backtest_service.stock_dao.get_multiple_stocks_columns.return_value = _columns_result({
+            'AAPL': [
+                {'Date': '2020-01-02', 'Close': 100.0},
+                {'Date': '2020-02-03', 'Close': 110.0}
+            ],
+            'MSFT': [
+                {'Date': '2020-01-02', 'Close': 200.0},
+                {'Date': '2020-02-03', 'Close': 190.0}
+            ]
+        })
+        
+        # Act
+        first = self.backtest_service.run_backtest(portfolio_config)
+        second = self.backtest_service.run_backtest(reordered_config)
+        self.backtest_service.stock_dao.get_data_version.return_value = 2
+        third = self.backtest_service.run_backtest(portfolio_config)
+        
+        # Assert
+        assert self.backtest_service.stock_dao.get_multiple_stocks_columns.call_count == 2
+        assert second['performance_summary'] == first['performance_summary']
+        assert second['backtest_id'] != first['backtest_id']
+        assert second['portfolio_composition'] == reordered_config['assets']
+        assert third['status'] == 'completed'
+        stats = self.backtest_service.result_cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 2
+    
+    def test_run_backtest_downsamples_time_series(self):
+        """测试长序列按 max_points 降采样并覆盖整个区间"""
+        # Arrange
+        portfolio_config = {
+            'assets': [{'symbol': 'AAPL', 'weight': 100.0}],
+            'start_date': '2020-01-01',
+            'end_date': '2020-12-31',
+            'initial_amount': 10000.0,
+            'max_points': 20
+        }
+        dates = [f'2020-{month:02d}-{day:02d}' for month in range(1, 13) for day in range(1, 29)]
+        closes = [100.0 + (i % 37) - i * 0.05 for i in range(len(dates))]
+        
+        self.backtest_service.stock_dao = Mock()
+        self.backtest_service.stock_dao.get_multiple_stocks_columns.return_value = _columns_result({
+            'AAPL': [{'Date': date, 'Close': close} for date, close in zip(dates, closes)]
+        })
+        
+        # Act
+        result = self.backtest_service.run_backtest(portfolio_config)
+        
+        # Assert
+        assert result['status'] == 'completed'
+        time_series = result['time_series']
+        assert len(time_series) <= 20
+        assert time_series[0]['date'] == dates[0]
+        assert time_series[-1]['date'] == dates[-1]
+        assert [point['date'] for point in result[FULL_SERIES_KEY]] == dates
@@ -4,9 +4,25 @@
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
 from app.services.dca_service import DCAService
+from app.utils.date_utils import strings_to_day_numbers
+
+
+def _columns_result(stock_data):
+    """将字典列表格式的模拟行情转换为 get_multiple_stocks_columns 的返回值 (columns, errors)"""
+    columns, errors = {}, {}
+    for symbol, rows in stock_data.items():
+        if not rows:
+            errors[symbol] = f"No data available for {symbol}"
+            continue
+        columns[symbol] = {'Date': strings_to_day_numbers(row['Date'] for row in rows)}
+        for name in rows[0]:
+            if name != 'Date':
+                columns[symbol][name] = np.array([row[name] for row in rows])
+    return columns, errors
 
 
 class TestDCAService:
@@ -32,7 +48,7 @@ class TestDCAService:
         
         # Assert
         assert len(dates) == 3
-        assert "2024-01-15" in dates
+        assert "2024-01-16" in dates  # 2024-01-15 马丁·路德·金纪念日休市，顺延
         assert "2024-02-15" in dates
         assert "2024-03-15" in dates
     
@@ -52,7 +68,7 @@ class TestDCAService:
         
         # Assert
         assert len(dates) >= 4  # 一月至少有4周
-        assert dates[0] == "2024-01-01"
+        assert dates[0] == "2024-01-02"  # 元旦休市，顺延到下一个交易日
     
     @patch('app.services.dca_service.StockDataDAO')
     def test_calculate_dca_returns_basic(self, mock_dao):
@@ -121,12 +137,13 @@ class TestDCAService:
         }
         
         # Mock股票数据
-        mock_dao.return_value.get_multiple_stocks_data.return_value = {
+        mock_dao.return_value.get_multiple_stocks_columns.return_value = _columns_result({
             'AAPL': [
                 {'Date': '2024-01-01', 'Close': 150.0},
                 {'Date': '2024-02-01', 'Close': 160.0}
             ]
-        }
+        })
+        self.dca_service.stock_dao = mock_dao.return_value
         
         # Act
         result = self.dca_service.run_periodic_dca(dca_config)
@@ -151,8 +168,9 @@ class TestDCAService:
             'frequency': 'monthly'
         }
         
-        # Mock错误
-        mock_dao.return_value.get_multiple_stocks_data.side_effect = Exception("Invalid symbol")
+        # Mock错误：获取失败的股票只出现在错误字典中
+        mock_dao.return_value.get_multiple_stocks_columns.return_value = _columns_result({'INVALID': []})
+        self.dca_service.stock_dao = mock_dao.return_value
         
         # Act
         result = self.dca_service.run_periodic_dca(dca_config)
@@ -191,28 +209,6 @@ class TestDCAService:
         assert triggers[0]['type'] == 'price_drop'
         assert triggers[0]['amount'] == 2000.0
     
-    def test_check_cooldown(self):
-        """测试冷却期检查"""
-        # Arrange
-        current_date = "2024-01-10"
-        last_trigger_date = "2024-01-05"
-        cooldown_days = 7
-        
-        # Act
-        result = self.dca_service._check_cooldown(
-            current_date, last_trigger_date, cooldown_days
-        )
-        
-        # Assert
-        assert result == False  # 5天 < 7天冷却期
-        
-        # Test with enough cooldown
-        current_date = "2024-01-13"
-        result = self.dca_service._check_cooldown(
-            current_date, last_trigger_date, cooldown_days
-        )
-        assert result == True  # 8天 >= 7天冷却期
-    
     @patch('app.services.dca_service.StockDataDAO')
     def test_run_conditional_dca_success(self, mock_dao):
         """测试成功执行条件定投"""
@@ -233,13 +229,14 @@ class TestDCAService:
         }
         
         # Mock股票数据，包含价格下跌
-        mock_dao.return_value.get_multiple_stocks_data.return_value = {
+        mock_dao.return_value.get_multiple_stocks_columns.return_value = _columns_result({
             'AAPL': [
                 {'Date': '2024-01-01', 'Close': 100.0},
                 {'Date': '2024-01-02', 'Close': 96.0},  # 4% drop - triggers
                 {'Date': '2024-01-03', 'Close': 98.0}
             ]
-        }
+        })
+        self.dca_service.stock_dao = mock_dao.return_value
         
         # Act
         result = self.dca_service.run_conditional_dca(dca_config)
@@ -250,26 +247,53 @@ class TestDCAService:
         assert 'triggers' in result
         assert result['config_summary']['condition_count'] == 1
     
-    def test_calculate_portfolio_prices(self):
-        """测试计算投资组合价格"""
+    def test_calculate_dca_returns_holdings_and_value(self):
+        """测试定投累计持股与净值（无价格的投资日顺延到下一行，缺失价格的股票不买入、按前一价格估值）"""
         # Arrange
         stock_data = {
             'AAPL': [
-                {'Date': '2024-01-01', 'Close': 100.0},
-                {'Date': '2024-01-02', 'Close': 105.0}
+                {'Date': '2024-01-02', 'Close': 100.0},
+                {'Date': '2024-01-03', 'Close': 50.0},
+                {'Date': '2024-01-04', 'Close': 100.0}
             ],
             'MSFT': [
-                {'Date': '2024-01-01', 'Close': 200.0},
-                {'Date': '2024-01-02', 'Close': 210.0}
+                {'Date': '2024-01-02', 'Close': 100.0},
+                {'Date': '2024-01-04', 'Close': 100.0}
             ]
         }
+        assets = [{'symbol': 'AAPL', 'weight': 50.0}, {'symbol': 'MSFT', 'weight': 50.0}]
+        investment_dates = ['2024-01-01', '2024-01-03']
+        
+        # Act
+        result = self.dca_service._calculate_dca_returns(stock_data, assets, 1000.0, 100.0, investment_dates)
+        
+        # Assert
+        # 01-01 顺延到 01-02，首日共投入1100各买5.5股；01-03 仅AAPL有价格，按权重买入 50/50 = 1 股
+        assert result['final_shares'] == {'AAPL': 6.5, 'MSFT': 5.5}
+        assert [point['invested'] for point in result['time_series']] == [1100.0, 1200.0, 1200.0]
+        assert [point['value'] for point in result['time_series']] == [1100.0, 875.0, 1200.0]
+        assert result['time_series'][2]['return_pct'] == 0.0
+    
+    def test_detect_drawdown_trigger_with_cooldown(self):
+        """测试回撤触发按回看窗口计算最高价，并在7天冷却期内不重复触发"""
+        # Arrange
+        closes = [100.0, 120.0, 100.0, 90.0, 95.0, 80.0, 100.0, 70.0]
+        dates = ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04',
+                 '2024-01-05', '2024-01-08', '2024-01-09', '2024-01-10']
+        stock_data = {'AAPL': [{'Date': d, 'Close': c} for d, c in zip(dates, closes)]}
+        conditions = [{
+            'type': 'drawdown',
+            'config': {'drawdown_threshold': 15.0, 'lookback_days': 3, 'amount': 500.0}
+        }]
         
         # Act
-        prices = self.dca_service._calculate_portfolio_prices(stock_data)
+        triggers = self.dca_service._detect_condition_triggers(
+            stock_data, conditions, '2024-01-01', '2024-01-10'
+        )
         
         # Assert
-        assert len(prices) == 2
-        assert prices[0]['date'] == '2024-01-01'
-        assert prices[0]['price'] == 150.0  # (100 + 200) / 2
-        assert prices[1]['date'] == '2024-01-02'
-        assert prices[1]['price'] == 157.5  # (105 + 210) / 2
\ No newline at end of file
+        # 01-03 自120回撤16.7%触发；01-04、01-08 命中但距上次触发不足7天；01-10 满7天再次触发
+        assert [t['date'] for t in triggers] == ['2024-01-03', '2024-01-10']
+        assert triggers[0]['trigger_value'] == pytest.approx(50.0 / 3)
+        assert triggers[1]['trigger_value'] == pytest.approx(30.0)
+        assert triggers[1]['amount'] == 500.0
@@ -0,0 +1,190 @@
+"""
+JobManager 单元测试
+"""
+import time
+import pytest
+
+from app.services.job_service import (
+    JobManager, JobQueueFullError, report_progress, PROGRESS_COMPUTING,
+    JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED, JOB_TIMEOUT
+)
+
+
+def _echo_job(config):
+    return {'status': 'completed', 'echo': config['value']}
+
+
+def _slow_job(config):
+    report_progress(PROGRESS_COMPUTING)
+    time.sleep(config.get('seconds', 5))
+    return {'status': 'completed'}
+
+
+def _raising_job(config):
+    raise RuntimeError('boom')
+
+
+def _failed_job(config):
+    return {'status': 'failed', 'error': 'no data'}
+
+
+HANDLERS = {
+    'echo': _echo_job,
+    'slow': _slow_job,
+    'raise': _raising_job,
+    'failed': _failed_job,
+}
+
+
+def _wait_for(manager, job_id, predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if predicate(job):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job state not reached: {manager.get(job_id)}")
+
+
+def _wait_finished(manager, job_id, timeout=10.0):
+    return _wait_for(manager, job_id, lambda job: job['status'] not in (JOB_QUEUED, JOB_RUNNING), timeout)
+
+
+class TestJobManager:
+    """异步任务管理器测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        self.manager = JobManager(handlers=HANDLERS, max_workers=1, timeout=5,
+                                  queue_limit=3, start_method='fork')
+
+    def teardown_method(self):
+        """每个测试方法后的清理"""
+        self.manager.shutdown()
+
+    def test_job_completes_with_result(self):
+        """测试任务完成后可取得结果"""
+        # Act
+        job_id = self.manager.submit('echo', {'value': 42})
+        job = _wait_finished(self.manager, job_id)
+
+        # Assert
+        assert job['status'] == JOB_COMPLETED
+        assert job['progress'] == 1.0
+        assert job['started_at'] is not None and job['finished_at'] is not None
+        assert self.manager.result(job_id) == {'status': 'completed', 'echo': 42}
+
+    def test_progress_reported_while_running(self):
+        """测试任务函数报告的进度可被轮询到"""
+        # Act
+        job_id = self.manager.submit('slow', {'seconds': 2})
+        job = _wait_for(self.manager, job_id, lambda job: job['progress'] > 0)
+
+        # Assert
+        assert job['status'] == JOB_RUNNING
+        assert job['progress'] == PROGRESS_COMPUTING
+
+    def test_failures_are_reported(self):
+        """测试任务抛出异常或服务返回失败状态时标记为失败"""
+        # Act
+        raised = _wait_finished(self.manager, self.manager.submit('raise', {}))
+        failed_id = self.manager.submit('failed', {})
+        failed = _wait_finished(self.manager, failed_id)
+
+        # Assert
+        assert raised['status'] == JOB_FAILED
+        assert raised['error'] == 'boom'
+        assert failed['status'] == JOB_FAILED
+        assert failed['error'] == 'no data'
+        assert self.manager.result(failed_id)['status'] == 'failed'
+
+    def test_cancel_queued_job(self):
+        """测试取消排队中的任务"""
+        # Arrange
+        running_id = self.manager.submit('slow', {'seconds': 1})
+        queued_id = self.manager.submit('echo', {'value': 1})
+
+        # Act
+        cancelled = self.manager.cancel(queued_id)
+
+        # Assert
+        assert cancelled
+        assert self.manager.get(queued_id)['status'] == JOB_CANCELLED
+        assert _wait_finished(self.manager, running_id)['status'] == JOB_COMPLETED
+        assert self.manager.get(queued_id)['status'] == JOB_CANCELLED
+        assert not self.manager.cancel(queued_id)
+
+    def test_cancel_running_job_replaces_worker(self):
+        """测试取消运行中的任务后工作进程被替换，后续任务正常执行"""
+        # Arrange
+        job_id = self.manager.submit('slow', {'seconds': 30})
+        _wait_for(self.manager, job_id, lambda job: job['status'] == JOB_RUNNING)
+
+        # Act
+        cancelled = self.manager.cancel(job_id)
+        next_id = self.manager.submit('echo', {'value': 7})
+
+        # Assert
+        assert cancelled
+        assert self.manager.get(job_id)['status'] == JOB_CANCELLED
+        assert _wait_finished(self.manager, next_id)['status'] == JOB_COMPLETED
+        assert self.manager.result(next_id)['echo'] == 7
+
+    def test_worker_replacement_does_not_block_requests(self):
+        """测试补充工作进程期间提交与查询不被阻塞"""
+        # Arrange
+        job_id = self.manager.submit('slow', {'seconds': 30})
+        _wait_for(self.manager, job_id, lambda job: job['status'] == JOB_RUNNING)
+        spawn_worker = self.manager._spawn_worker
+
+        def slow_spawn():
+            time.sleep(1.0)
+            return spawn_worker()
+
+        self.manager._spawn_worker = slow_spawn
+
+        # Act
+        self.manager.cancel(job_id)
+        time.sleep(0.3)
+        started = time.monotonic()
+        status = self.manager.get(job_id)['status']
+        next_id = self.manager.submit('echo', {'value': 3})
+        elapsed = time.monotonic() - started
+
+        # Assert
+        assert status == JOB_CANCELLED
+        assert elapsed < 0.5
+        assert _wait_finished(self.manager, next_id)['status'] == JOB_COMPLETED
+
+    def test_timeout(self):
+        """测试超过运行时限的任务被终止并标记为超时"""
+        # Arrange
+        self.manager.shutdown()
+        self.manager = JobManager(handlers=HANDLERS, max_workers=1, timeout=0.5, start_method='fork')
+
+        # Act
+        job_id = self.manager.submit('slow', {'seconds': 30})
+        job = _wait_finished(self.manager, job_id)
+
+        # Assert
+        assert job['status'] == JOB_TIMEOUT
+        assert self.manager.result(job_id) is None
+
+    def test_queue_limit_and_unknown_type(self):
+        """测试排队上限与不支持的任务类型"""
+        # Arrange
+        self.manager.submit('slow', {'seconds': 30})
+        for _ in range(3):
+            self.manager.submit('echo', {'value': 0})
+
+        # Act & Assert
+        with pytest.raises(JobQueueFullError):
+            self.manager.submit('echo', {'value': 0})
+        with pytest.raises(ValueError):
+            self.manager.submit('unknown', {})
+
+    def test_get_unknown_job(self):
+        """测试查询不存在的任务"""
+        assert self.manager.get('job_missing') is None
+        assert self.manager.result('job_missing') is None
+        assert not self.manager.cancel('job_missing')
@@ -0,0 +1,81 @@
+"""
+RebalancingService 单元测试
+"""
+import pytest
+import numpy as np
+
+from app.services.rebalancing_service import RebalancingService
+from app.utils.price_panel import PricePanel
+
+
+class TestRebalancingService:
+    """再平衡服务测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        self.service = RebalancingService()
+        self.stock_data = {
+            'AAPL': [
+                {'Date': '2020-01-02', 'Close': 100.0},
+                {'Date': '2020-01-31', 'Close': 200.0},
+                {'Date': '2020-02-03', 'Close': 200.0},
+                {'Date': '2020-02-28', 'Close': 100.0}
+            ],
+            'MSFT': [
+                {'Date': '2020-01-02', 'Close': 100.0},
+                {'Date': '2020-01-31', 'Close': 100.0},
+                {'Date': '2020-02-03', 'Close': 100.0},
+                {'Date': '2020-02-28', 'Close': 100.0}
+            ]
+        }
+        self.weights = {'AAPL': 50.0, 'MSFT': 50.0}
+
+    def test_no_rebalance_buy_and_hold(self):
+        """测试不再平衡时按初始持股计算净值"""
+        # Act
+        result = self.service.apply_rebalancing(self.stock_data, self.weights, 10000.0, 'none')
+
+        # Assert
+        assert [point['value'] for point in result] == [10000.0, 15000.0, 15000.0, 10000.0]
+        assert result[1]['daily_return'] == pytest.approx(0.5)
+        assert 'rebalanced' not in result[0]
+
+    def test_monthly_rebalance(self):
+        """测试月度再平衡：2月首个交易日按目标权重重新分配"""
+        # Act
+        result = self.service.apply_rebalancing(self.stock_data, self.weights, 10000.0, 'monthly')
+
+        # Assert
+        # 2020-02-03 以 15000 再平衡为 37.5 股 AAPL + 75 股 MSFT
+        assert [point['value'] for point in result] == pytest.approx([10000.0, 15000.0, 15000.0, 11250.0])
+        assert [point['rebalanced'] for point in result] == [True, False, True, False]
+
+    def test_boundaries_by_frequency(self):
+        """测试按月/季/年计算再平衡日"""
+        # Arrange
+        panel = PricePanel.from_records({'AAPL': [
+            {'Date': date, 'Close': 100.0}
+            for date in ['2020-01-02', '2020-02-03', '2020-03-02', '2020-04-01', '2021-01-04']
+        ]})
+
+        # Act & Assert
+        assert self.service._rebalance_boundaries(panel, 'monthly').tolist() == [1, 2, 3, 4]
+        assert self.service._rebalance_boundaries(panel, 'quarterly').tolist() == [3, 4]
+        assert self.service._rebalance_boundaries(panel, 'yearly').tolist() == [4]
+        assert self.service._rebalance_boundaries(panel, 'none').tolist() == []
+
+    def test_symbol_missing_on_rebalance_date(self):
+        """测试再平衡日无价格的股票按前一价格估值但不买入"""
+        # Arrange
+        self.stock_data['MSFT'] = [row for row in self.stock_data['MSFT'] if row['Date'] != '2020-02-03']
+
+        # Act
+        values, rebalanced = self.service.calculate_rebalance_value_arrays(
+            PricePanel.from_records(self.stock_data), self.weights, 10000.0, 'monthly'
+        )
+
+        # Assert
+        # 再平衡日价值计入 AAPL(50股×200) 与按前一价格估值的 MSFT(50股×100)，
+        # 之后只持有 15000×50%/200 = 37.5 股 AAPL
+        np.testing.assert_allclose(values, [10000.0, 15000.0, 15000.0, 3750.0])
+        assert rebalanced.tolist() == [True, False, True, False]
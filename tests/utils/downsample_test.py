@@ -0,0 +1,103 @@
+"""
+时间序列降采样单元测试
+"""
+import pytest
+import numpy as np
+
+from app.utils.downsample import (
+    FULL_SERIES_KEY, lttb_indices, drawdown_extremes, downsample_records, downsampled_series,
+    resolve_max_points, without_full_series
+)
+
+
+def _reference_lttb(y, n_out):
+    """逐点循环的经典 LTTB 实现，作为对照"""
+    n = len(y)
+    every = (n - 2) / (n_out - 2)
+    a, selected = 0, [0]
+    for i in range(n_out - 2):
+        start, end = int(np.floor((i + 1) * every)) + 1, min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x = np.mean(np.arange(start, end)) if start < end else n - 1
+        avg_y = np.mean(y[start:end]) if start < end else y[-1]
+        best, best_index = -1.0, None
+        for j in range(int(np.floor(i * every)) + 1, int(np.floor((i + 1) * every)) + 1):
+            area = abs((a - avg_x) * (y[j] - y[a]) - (a - j) * (avg_y - y[a]))
+            if area > best:
+                best, best_index = area, j
+        selected.append(best_index)
+        a = best_index
+    selected.append(n - 1)
+    return selected
+
+
+class TestDownsample:
+    """LTTB 降采样测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        rng = np.random.default_rng(7)
+        self.values = 100 + np.cumsum(rng.normal(size=2000))
+        self.records = [{'date': f'day{i}', 'value': float(v)} for i, v in enumerate(self.values)]
+
+    @pytest.mark.parametrize('n, n_out', [(2000, 100), (503, 97), (10, 5), (7, 3)])
+    def test_lttb_matches_reference(self, n, n_out):
+        """测试与逐点实现选出相同的点"""
+        # Act
+        selected = lttb_indices(self.values[:n], n_out)
+
+        # Assert
+        assert selected.tolist() == _reference_lttb(self.values[:n], n_out)
+
+    def test_short_series_unchanged(self):
+        """测试点数不超过上限或未指定上限时返回完整序列"""
+        short = self.records[:50]
+        assert downsample_records(short, 100) is short
+        assert downsample_records(self.records, 0) is self.records
+        assert downsample_records(self.records, None) is self.records
+
+    def test_keeps_endpoints_and_drawdown_extremes(self):
+        """测试保留首尾点与最大回撤的峰值、谷值"""
+        # Arrange
+        peak, trough = drawdown_extremes(self.values)
+
+        # Act
+        sampled = downsample_records(self.records, 60)
+
+        # Assert
+        dates = [record['date'] for record in sampled]
+        assert len(sampled) <= 60
+        assert dates[0] == 'day0' and dates[-1] == 'day1999'
+        assert f'day{peak}' in dates and f'day{trough}' in dates
+        assert dates == sorted(dates, key=lambda d: int(d[3:]))
+        sampled_values = np.array([record['value'] for record in sampled])
+        full_drawdown = (self.values[trough] - self.values[peak]) / self.values[peak]
+        sampled_peaks = np.maximum.accumulate(sampled_values)
+        assert ((sampled_values - sampled_peaks) / sampled_peaks).min() == pytest.approx(full_drawdown)
+
+    def test_drawdown_extremes(self):
+        """测试最大回撤峰谷位置"""
+        assert drawdown_extremes(np.array([1.0, 3.0, 2.0, 4.0, 1.0, 2.0])) == (3, 4)
+        assert drawdown_extremes(np.array([])) is None
+
+    def test_resolve_max_points(self):
+        """测试 max_points 选项校验"""
+        assert resolve_max_points({}, 500) == 500
+        assert resolve_max_points({'max_points': 0}, 500) == 0
+        with pytest.raises(ValueError):
+            resolve_max_points({'max_points': -1}, 500)
+        with pytest.raises(ValueError):
+            resolve_max_points({'max_points': '100'}, 500)
+
+    def test_downsampled_series_keeps_full_series_for_persistence(self):
+        """测试降采样时结果附带完整序列，响应前可去掉"""
+        # Act
+        fields = downsampled_series(self.records, 100)
+        unchanged = downsampled_series(self.records[:50], 100)
+        response = without_full_series({'status': 'completed', **fields})
+
+        # Assert
+        assert len(fields['time_series']) <= 100
+        assert fields[FULL_SERIES_KEY] is self.records
+        assert unchanged == {'time_series': self.records[:50]}
+        assert FULL_SERIES_KEY not in response
+        assert response['time_series'] == fields['time_series']
@@ -3,7 +3,9 @@ FinancialCalculator 单元测试
 """
 import pytest
 import numpy as np
+from app.core.config import settings
 from app.utils.financial_calculator import FinancialCalculator
+from app.utils.price_panel import PricePanel, FILL_NONE
 
 
 class TestFinancialCalculator:
@@ -162,7 +164,49 @@ class TestFinancialCalculator:
         assert 'cumulative_return' in result[0]
         # 第二天应该有正收益（因为两只股票都涨了）
         assert result[1]['value'] > initial_amount
-    
+
+    def test_calculate_portfolio_value_arrays(self):
+        """测试向量化净值计算（缺失价格沿用前一个有效价格）"""
+        # Arrange
+        panel = PricePanel.from_records({
+            'AAPL': [
+                {'Date': '2020-01-01', 'Close': 100.0},
+                {'Date': '2020-01-02', 'Close': 110.0},
+                {'Date': '2020-01-03', 'Close': 120.0}
+            ],
+            'MSFT': [
+                {'Date': '2020-01-01', 'Close': 200.0},
+                {'Date': '2020-01-03', 'Close': 220.0}
+            ]
+        })
+        weights = {'AAPL': 50.0, 'MSFT': 50.0}
+
+        # Act
+        values, daily_returns, cumulative_returns = self.calculator.calculate_portfolio_value_arrays(
+            panel, weights, 10000.0
+        )
+
+        # Assert
+        # 50 股 AAPL + 25 股 MSFT，01-02 MSFT 无报价按 200 估值
+        np.testing.assert_allclose(values, [10000.0, 10500.0, 11500.0])
+        np.testing.assert_allclose(daily_returns, [0.0, 5.0, 1000.0 / 105.0])
+        np.testing.assert_allclose(cumulative_returns, [0.0, 5.0, 15.0])
+
+    def test_calculate_portfolio_value_arrays_without_fill(self, monkeypatch):
+        """测试填充策略为 none 时缺失价格按0计入"""
+        # Arrange
+        monkeypatch.setattr(settings, 'price_fill_policy', FILL_NONE)
+        panel = PricePanel.from_records({
+            'AAPL': [{'Date': '2020-01-01', 'Close': 100.0}, {'Date': '2020-01-02', 'Close': 110.0}],
+            'MSFT': [{'Date': '2020-01-01', 'Close': 200.0}]
+        })
+
+        # Act
+        values, _, _ = self.calculator.calculate_portfolio_value_arrays(panel, {'AAPL': 50.0, 'MSFT': 50.0}, 10000.0)
+
+        # Assert
+        np.testing.assert_allclose(values, [10000.0, 5500.0])
+
     def test_calculate_annual_returns(self):
         """测试年度收益计算"""
         # Arrange
@@ -207,4 +251,30 @@ class TestFinancialCalculator:
         assert 'positive_rate' in result
         assert result['total_return'] == 3.0  # 10000到10300，涨3%
         assert result['positive_days'] == 3  # 3个正收益日
-        assert result['total_days'] == 4  # 总共4个交易日（第一天没有收益率）
\ No newline at end of file
+        assert result['total_days'] == 4  # 总共4个交易日（第一天没有收益率）
+    def test_calculate_risk_metrics_arrays_batch(self):
+        """测试二维输入一次计算多个组合的指标，与逐个计算一致"""
+        # Arrange
+        values = np.array([
+            [10000.0, 10100.0, 9900.0, 10200.0, 10300.0],
+            [10000.0, 9000.0, 9500.0, 8000.0, 8800.0]
+        ])
+
+        # Act
+        batch = self.calculator.calculate_risk_metrics_arrays(values)
+        singles = [self.calculator.calculate_risk_metrics_arrays(row) for row in values]
+
+        # Assert
+        assert batch['sharpe_ratio'].shape == (2,)
+        for key in ('total_return', 'volatility', 'max_drawdown', 'sharpe_ratio', 'sortino_ratio', 'positive_rate'):
+            np.testing.assert_allclose(batch[key], [single[key] for single in singles])
+        assert abs(batch['max_drawdown'][1] - (-20.0)) < 1e-9
+        assert batch['max_drawdown_peak_idx'].tolist() == [1, 0]
+        assert batch['max_drawdown_trough_idx'].tolist() == [2, 3]
+
+    def test_calculate_risk_metrics_arrays_too_short(self):
+        """测试不足两个交易日时返回空的指标"""
+        assert self.calculator.calculate_risk_metrics_arrays(np.array([])) == {}
+        assert self.calculator.calculate_risk_metrics_arrays(np.array([10000.0])) == {}
+        assert self.calculator.calculate_risk_metrics_arrays(np.empty((2, 0))) == {}
+        assert self.calculator.calculate_risk_metrics([{'date': '2020-01-01', 'value': 10000}]) == {}
@@ -0,0 +1,82 @@
+"""
+IndicatorCache 单元测试
+"""
+import numpy as np
+
+from app.utils.indicator_cache import IndicatorCache
+
+
+class TestIndicatorCache:
+    """指标缓存测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        self.cache = IndicatorCache(max_bytes=1024 * 1024)
+        self.days = np.arange(18000, 18100, dtype=np.int64)
+        self.calls = 0
+
+    def _compute(self, n, columns=2):
+        def compute():
+            self.calls += 1
+            return np.arange(n * columns, dtype=np.float64).reshape(n, columns)
+        return compute
+
+    def test_hit_and_prefix_slice(self):
+        """测试相同起始日、更早结束日的区间直接从缓存切片"""
+        # Arrange
+        full = self.cache.get_or_compute('AAPL', 1, 'rsi', self.days, self._compute(100))
+
+        # Act
+        again = self.cache.get_or_compute('AAPL', 1, 'rsi', self.days, self._compute(100))
+        prefix = self.cache.get_or_compute('AAPL', 1, 'rsi', self.days[:40], self._compute(40))
+
+        # Assert
+        assert self.calls == 1
+        np.testing.assert_array_equal(again, full)
+        np.testing.assert_array_equal(prefix, full[:40])
+        assert not prefix.flags.writeable
+        assert self.cache.stats()['hits'] == 2
+
+    def test_miss_on_version_params_or_start_change(self):
+        """测试数据版本、指标参数或起始日不同时重新计算"""
+        # Arrange
+        self.cache.get_or_compute('AAPL', 1, 'rsi', self.days, self._compute(100))
+
+        # Act
+        self.cache.get_or_compute('AAPL', 2, 'rsi', self.days, self._compute(100))
+        self.cache.get_or_compute('AAPL', 1, 'macd', self.days, self._compute(100))
+        self.cache.get_or_compute('AAPL', 1, 'rsi', self.days[10:], self._compute(90))
+
+        # Assert
+        assert self.calls == 4
+
+    def test_longer_range_replaces_entry(self):
+        """测试请求更长区间时重新计算并替换为更长的缓存"""
+        # Arrange
+        self.cache.get_or_compute('AAPL', 1, 'rsi', self.days[:50], self._compute(50))
+
+        # Act
+        self.cache.get_or_compute('AAPL', 1, 'rsi', self.days, self._compute(100))
+        self.cache.get_or_compute('AAPL', 1, 'rsi', self.days[:80], self._compute(80))
+
+        # Assert
+        assert self.calls == 2
+        assert self.cache.stats()['entries'] == 1
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        """测试超出字节上限时淘汰最久未使用的项"""
+        # Arrange
+        entry_bytes = self.days.nbytes + 100 * 2 * 8
+        cache = IndicatorCache(max_bytes=entry_bytes * 2)
+        cache.get_or_compute('AAPL', 1, 'rsi', self.days, self._compute(100))
+        cache.get_or_compute('MSFT', 1, 'rsi', self.days, self._compute(100))
+        cache.get_or_compute('AAPL', 1, 'rsi', self.days, self._compute(100))
+
+        # Act
+        cache.get_or_compute('NVDA', 1, 'rsi', self.days, self._compute(100))
+        cache.get_or_compute('AAPL', 1, 'rsi', self.days, self._compute(100))
+        cache.get_or_compute('MSFT', 1, 'rsi', self.days, self._compute(100))
+
+        # Assert
+        assert self.calls == 4
+        assert cache.stats()['bytes'] <= entry_bytes * 2
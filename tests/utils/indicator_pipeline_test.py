@@ -0,0 +1,84 @@
+"""
+IndicatorPipeline 单元测试
+"""
+import pytest
+import numpy as np
+import pandas as pd
+
+from app.utils.indicator_pipeline import IndicatorPipeline
+from app.utils.technical_indicators import TechnicalIndicators
+
+
+class TestIndicatorPipeline:
+    """技术指标流水线测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        rng = np.random.default_rng(3)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 300)))
+        close[40:43] = close[39]
+        self.df = pd.DataFrame({
+            'Open': close,
+            'High': close * 1.01,
+            'Low': close * 0.99,
+            'Close': close,
+            'Volume': 1000.0
+        }, index=pd.date_range('2020-01-01', periods=300))
+
+    def test_matches_technical_indicators(self):
+        """测试流水线结果与逐项计算一致"""
+        # Arrange
+        close = self.df['Close']
+        macd = TechnicalIndicators.calculate_macd(close)
+        bands = TechnicalIndicators.calculate_bollinger_bands(close)
+        expected = {
+            'RSI': TechnicalIndicators.calculate_rsi(close),
+            'MACD': macd['macd'],
+            'MACD_Signal': macd['signal'],
+            'MACD_Histogram': macd['histogram'],
+            'BB_Upper': bands['upper'],
+            'BB_Middle': bands['middle'],
+            'BB_Lower': bands['lower'],
+            'Support': self.df['Low'].rolling(window=20).min(),
+            'Resistance': self.df['High'].rolling(window=20).max(),
+            'Daily_Return': close.pct_change(),
+            'Peak': close.cummax(),
+            'Drawdown': (close - close.cummax()) / close.cummax()
+        }
+
+        # Act
+        result = IndicatorPipeline().compute_frame(self.df)
+
+        # Assert
+        assert list(result.columns) == list(self.df.columns) + list(expected.keys())
+        for column, values in expected.items():
+            np.testing.assert_allclose(
+                result[column].to_numpy(), values.to_numpy(dtype=float),
+                rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=column
+            )
+        assert 'RSI' not in self.df.columns
+
+    def test_compute_writes_into_preallocated_block(self):
+        """测试只计算请求的指标，并写入调用方提供的矩阵"""
+        # Arrange
+        pipeline = IndicatorPipeline(['drawdown', 'rsi'], params={'rsi_period': 5})
+        close = self.df['Close'].to_numpy()
+        out = np.zeros((len(close), 3))
+
+        # Act
+        block = pipeline.compute(close, out=out)
+
+        # Assert
+        assert block is out
+        assert pipeline.columns == ['Peak', 'Drawdown', 'RSI']
+        expected_rsi = TechnicalIndicators.calculate_rsi(self.df['Close'], period=5).to_numpy()
+        np.testing.assert_allclose(out[:, 2], expected_rsi, rtol=1e-9, equal_nan=True)
+        assert (out[:, 1] <= 0).all()
+
+    def test_rejects_unknown_indicator_and_bad_block(self):
+        """测试未知指标和形状不符的输出矩阵抛出异常"""
+        # Act & Assert
+        with pytest.raises(ValueError):
+            IndicatorPipeline(['unknown'])
+        with pytest.raises(ValueError):
+            IndicatorPipeline(['rsi']).compute(np.ones(10), out=np.empty((10, 2)))
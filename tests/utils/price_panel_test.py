@@ -0,0 +1,152 @@
+"""
+PricePanel 单元测试
+"""
+import pytest
+import numpy as np
+import pandas as pd
+
+from app.utils.date_utils import strings_to_day_numbers
+from app.utils.price_panel import PricePanel, as_price_panel, FILL_NONE, FILL_FORWARD, FILL_FORWARD_BACKWARD
+
+
+class TestPricePanel:
+    """对齐价格面板测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        self.stock_data = {
+            'AAPL': [
+                {'Date': '2020-01-02', 'Close': 100.0},
+                {'Date': '2020-01-03', 'Close': 101.0},
+                {'Date': '2020-01-07', 'Close': 103.0}
+            ],
+            'MSFT': [
+                {'Date': '2020-01-03', 'Close': 200.0},
+                {'Date': '2020-01-06', 'Close': 202.0},
+                {'Date': '2020-01-07', 'Close': 204.0}
+            ]
+        }
+
+    def test_from_records_aligns_dates(self):
+        """测试按日期并集对齐，缺失处为NaN"""
+        # Act
+        panel = PricePanel.from_records(self.stock_data)
+
+        # Assert
+        assert panel.symbols == ['AAPL', 'MSFT']
+        assert panel.date_strings() == ['2020-01-02', '2020-01-03', '2020-01-06', '2020-01-07']
+        assert panel.close.shape == (4, 2)
+        assert panel.close.flags['C_CONTIGUOUS']
+        assert np.isnan(panel.close[0, 1])
+        assert np.isnan(panel.close[2, 0])
+        assert panel.valid.sum() == 6
+
+    def test_first_valid_prices(self):
+        """测试每只股票的首个有效价格"""
+        panel = PricePanel.from_records(self.stock_data)
+
+        assert panel.first_valid_rows().tolist() == [0, 1]
+        assert panel.first_valid_prices().tolist() == [100.0, 200.0]
+
+    def test_fill_policies(self):
+        """测试前向填充与前后向填充（valid掩码不变）"""
+        # Arrange
+        panel = PricePanel.from_records(self.stock_data)
+
+        # Act
+        forward = panel.filled(FILL_FORWARD)
+        both = panel.filled(FILL_FORWARD_BACKWARD)
+
+        # Assert
+        assert forward.close[2, 0] == 101.0
+        assert np.isnan(forward.close[0, 1])
+        assert both.close[0, 1] == 200.0
+        assert np.array_equal(both.valid, panel.valid)
+        with pytest.raises(ValueError):
+            panel.filled('unknown')
+
+    def test_valuation_prices(self):
+        """测试估值价格按策略填充，仍缺失处为0"""
+        # Arrange
+        panel = PricePanel.from_records(self.stock_data)
+
+        # Act
+        forward = panel.valuation_prices(FILL_FORWARD)
+        unfilled = panel.valuation_prices(FILL_NONE)
+
+        # Assert
+        assert forward[2, 0] == 101.0
+        assert forward[0, 1] == 0.0
+        assert unfilled[2, 0] == 0.0
+        assert np.array_equal(forward[panel.valid], panel.close[panel.valid])
+
+    def test_as_price_panel_accepts_dataframes(self):
+        """测试DataFrame输入与字典列表输入得到相同面板"""
+        # Arrange
+        frames = {}
+        for symbol, rows in self.stock_data.items():
+            df = pd.DataFrame(rows)
+            df.index = pd.to_datetime(df.pop('Date'))
+            frames[symbol] = df
+        frames['EMPTY'] = pd.DataFrame()
+
+        # Act
+        from_frames = as_price_panel(frames)
+        from_records = as_price_panel(self.stock_data)
+
+        # Assert
+        assert from_frames.symbols == ['AAPL', 'MSFT']
+        assert np.array_equal(from_frames.dates, from_records.dates)
+        assert np.allclose(from_frames.close, from_records.close, equal_nan=True)
+        assert as_price_panel(from_records) is from_records
+
+    def test_from_columns_matches_records(self):
+        """测试列式数据构建的面板与字典列表格式一致，无数据的股票整列为NaN"""
+        # Arrange
+        stock_columns = {
+            symbol: {
+                'Date': strings_to_day_numbers(row['Date'] for row in rows),
+                'Close': np.array([row['Close'] for row in rows])
+            }
+            for symbol, rows in self.stock_data.items()
+        }
+        stock_columns['EMPTY'] = {'Date': np.empty(0, dtype=np.int64), 'Close': np.empty(0)}
+
+        # Act
+        panel = PricePanel.from_columns(stock_columns)
+        expected = PricePanel.from_records(self.stock_data)
+
+        # Assert
+        assert panel.symbols == ['AAPL', 'MSFT', 'EMPTY']
+        assert np.array_equal(panel.dates, expected.dates)
+        assert np.allclose(panel.close[:, :2], expected.close, equal_nan=True)
+        assert not panel.valid[:, 2].any()
+
+    def test_select_keeps_dates(self):
+        """测试选取子面板"""
+        panel = PricePanel.from_records(self.stock_data)
+
+        sub = panel.select(['MSFT', 'GOOGL'])
+
+        assert sub.symbols == ['MSFT']
+        assert len(sub) == len(panel)
+        assert sub.close[:, 0].tolist()[1:] == [200.0, 202.0, 204.0]
+
+    def test_align_frames(self):
+        """测试按面板日期对齐其他列"""
+        # Arrange
+        panel = PricePanel.from_records(self.stock_data)
+        frames = {
+            'MSFT': pd.DataFrame({'RSI': [40.0, 50.0]},
+                                 index=pd.to_datetime(['2020-01-03', '2020-01-07']))
+        }
+
+        # Act
+        aligned = panel.align_frames(frames, 'RSI')
+
+        # Assert
+        assert aligned.shape == (4, 2)
+        assert np.isnan(aligned[:, 0]).all()
+        assert aligned[1, 1] == 40.0
+        assert np.isnan(aligned[2, 1])
+        assert aligned[3, 1] == 50.0
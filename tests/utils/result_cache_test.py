@@ -0,0 +1,102 @@
+"""
+ResultCache 单元测试
+"""
+import pytest
+
+from app.utils import result_cache
+from app.utils.result_cache import ResultCache, make_result_key
+
+
+class TestResultCache:
+    """回测结果缓存测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        self.cache = ResultCache(max_entries=2, ttl=60)
+        self.config = {
+            'assets': [{'symbol': 'AAPL', 'weight': 60.0}, {'symbol': 'MSFT', 'weight': 40.0}],
+            'start_date': '2020-01-01',
+            'end_date': '2020-12-31',
+            'initial_amount': 10000.0,
+            'buy_conditions': {'rsi_oversold': 30, 'enable_macd': True}
+        }
+
+    def test_key_ignores_asset_order_and_number_type(self):
+        """测试资产顺序、键顺序与整数/浮点写法不影响缓存键"""
+        # Arrange
+        reordered = {
+            'buy_conditions': {'enable_macd': True, 'rsi_oversold': 30.0},
+            'initial_amount': 10000,
+            'end_date': '2020-12-31',
+            'start_date': '2020-01-01',
+            'assets': [{'weight': 40, 'symbol': 'MSFT'}, {'symbol': 'AAPL', 'weight': 60}]
+        }
+        versions = {'AAPL': 3, 'MSFT': 5}
+
+        # Act & Assert
+        assert make_result_key('backtest', reordered, versions) == make_result_key('backtest', self.config, versions)
+
+    def test_key_changes_with_config_version_and_namespace(self):
+        """测试配置、数据版本或回测类型变化时缓存键不同"""
+        # Arrange
+        versions = {'AAPL': 3, 'MSFT': 5}
+        key = make_result_key('backtest', self.config, versions)
+
+        # Act & Assert
+        assert make_result_key('backtest', dict(self.config, end_date='2021-12-31'), versions) != key
+        assert make_result_key('backtest', self.config, {'AAPL': 4, 'MSFT': 5}) != key
+        assert make_result_key('enhanced', self.config, versions) != key
+
+    def test_hit_miss_and_lru_eviction(self):
+        """测试命中统计与按最久未使用淘汰"""
+        # Arrange
+        self.cache.put('a', {'value': 1})
+        self.cache.put('b', {'value': 2})
+
+        # Act
+        assert self.cache.get('a') == {'value': 1}
+        self.cache.put('c', {'value': 3})
+
+        # Assert
+        assert self.cache.get('b') is None
+        assert self.cache.get('a') == {'value': 1}
+        assert self.cache.get('c') == {'value': 3}
+        stats = self.cache.stats()
+        assert stats['entries'] == 2
+        assert stats['hits'] == 3
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == pytest.approx(0.75)
+
+    def test_expired_entry_is_dropped(self, monkeypatch):
+        """测试超过有效期的结果不再返回"""
+        # Arrange
+        now = [1000.0]
+        monkeypatch.setattr(result_cache.time, 'monotonic', lambda: now[0])
+        self.cache.put('a', {'value': 1})
+
+        # Act
+        now[0] += 59
+        fresh = self.cache.get('a')
+        now[0] += 2
+        expired = self.cache.get('a')
+
+        # Assert
+        assert fresh == {'value': 1}
+        assert expired is None
+        assert self.cache.stats()['entries'] == 0
+
+    def test_results_are_independent_copies(self):
+        """测试修改写入或读取的结果不影响缓存"""
+        # Arrange
+        result = {'performance': {'total_return_pct': 5.0}, 'time_series': [{'date': '2020-01-02', 'value': 1.0}]}
+        self.cache.put('a', result)
+
+        # Act
+        result['performance']['total_return_pct'] = 0.0
+        first = self.cache.get('a')
+        first['time_series'].append({'date': '2020-01-03', 'value': 2.0})
+        second = self.cache.get('a')
+
+        # Assert
+        assert second == {'performance': {'total_return_pct': 5.0}, 'time_series': [{'date': '2020-01-02', 'value': 1.0}]}
+        assert second is not first
@@ -0,0 +1,109 @@
+"""
+rolling 滚动窗口内核单元测试
+"""
+import pytest
+import numpy as np
+import pandas as pd
+
+from app.utils import rolling
+
+
+class TestRolling:
+    """滚动窗口内核测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        rng = np.random.default_rng(7)
+        self.values = rng.normal(100, 5, size=(600, 3))
+        self.values[rng.random(self.values.shape) < 0.1] = np.nan
+        self.frame = pd.DataFrame(self.values)
+
+    @pytest.mark.parametrize('name', ['sum', 'mean', 'max', 'min', 'std', 'var'])
+    @pytest.mark.parametrize('window,min_periods', [(1, None), (5, None), (20, None), (20, 1), (20, 10), (252, None)])
+    def test_matches_pandas_rolling(self, name, window, min_periods):
+        """测试与 pandas rolling 的结果一致（含缺失值与 min_periods）"""
+        # Arrange
+        kwargs = {} if min_periods is None else {'min_periods': min_periods}
+        expected = getattr(self.frame.rolling(window, **kwargs), name)().to_numpy()
+
+        # Act
+        result = getattr(rolling, f'rolling_{name}')(self.values, window, **kwargs)
+
+        # Assert
+        np.testing.assert_allclose(result, expected, rtol=1e-8, atol=1e-10, equal_nan=True)
+
+    @pytest.mark.parametrize('window,min_periods', [(1, None), (20, None), (20, 5), (252, None)])
+    def test_mean_abs_dev_is_exact_per_window(self, window, min_periods):
+        """测试平均绝对偏差以每个窗口自身的均值为基准"""
+        # Arrange
+        kwargs = {} if min_periods is None else {'min_periods': min_periods}
+
+        def mad(window_values):
+            window_values = window_values[~np.isnan(window_values)]
+            return np.abs(window_values - window_values.mean()).mean()
+
+        expected = self.frame.rolling(window, **kwargs).apply(mad, raw=True).to_numpy()
+
+        # Act
+        result = rolling.rolling_mean_abs_dev(self.values, window, **kwargs)
+
+        # Assert
+        np.testing.assert_allclose(result, expected, rtol=1e-10, atol=1e-12, equal_nan=True)
+
+    def test_std_stays_accurate_on_trending_series(self):
+        """测试长期大幅上涨的价格序列上滚动标准差没有大数相消误差"""
+        # Arrange
+        rng = np.random.default_rng(0)
+        prices = 10 * np.exp(np.cumsum(rng.normal(0.0005, 0.01, 20000)))
+        window = 252
+        expected = np.array([np.std(prices[i - window + 1:i + 1], ddof=1) for i in range(window - 1, len(prices))])
+
+        # Act
+        result = rolling.rolling_std(prices, window)[window - 1:]
+
+        # Assert
+        np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+    def test_one_dimensional_input_keeps_shape(self):
+        """测试一维输入返回一维结果"""
+        # Arrange
+        values = np.array([3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0])
+
+        # Act
+        result = rolling.rolling_max(values, 3)
+
+        # Assert
+        assert result.shape == (7,)
+        np.testing.assert_array_equal(result[2:], [4.0, 4.0, 5.0, 9.0, 9.0])
+        assert np.isnan(result[:2]).all()
+
+    def test_ema_matches_pandas(self):
+        """测试EMA与 pandas ewm(adjust=False) 一致，首个有效值之前为NaN"""
+        # Arrange
+        values = np.array([np.nan, np.nan, 10.0, 11.0, 12.5, 12.0, 13.0, 12.2])
+
+        # Act
+        result = rolling.ema(values, 3)
+
+        # Assert
+        expected = pd.Series(values[2:]).ewm(span=3, adjust=False).mean().to_numpy()
+        assert np.isnan(result[:2]).all()
+        np.testing.assert_allclose(result[2:], expected, rtol=1e-12)
+
+    def test_ema_matches_pandas_across_gaps(self):
+        """测试中间与末尾含缺失值时EMA与 pandas ewm(adjust=False) 一致"""
+        # Arrange
+        values = self.values.copy()
+        values[10:13, 0] = np.nan
+        values[40, 0] = np.nan
+        values[-5:, 1] = np.nan
+        values[:20, 2] = np.nan
+        values[30:32, 2] = np.nan
+
+        # Act
+        result = rolling.ema(values, 12)
+
+        # Assert
+        expected = pd.DataFrame(values).ewm(span=12, adjust=False).mean().to_numpy()
+        np.testing.assert_allclose(result, expected, rtol=1e-10)
+        np.testing.assert_allclose(rolling.ema(values[:, 0], 12), expected[:, 0], rtol=1e-10)
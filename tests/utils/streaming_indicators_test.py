@@ -0,0 +1,137 @@
+"""
+增量技术指标单元测试
+"""
+import json
+import pytest
+import numpy as np
+import pandas as pd
+
+from app.utils.streaming_indicators import (
+    StreamingIndicator, StreamingEMA, StreamingMACD, StreamingRSI, StreamingBollinger, StreamingATR,
+    StreamingOBV, StreamingRollingMax, StreamingRollingMin, restore_indicator
+)
+from app.utils.technical_indicators import TechnicalIndicators
+
+
+class TestStreamingIndicators:
+    """增量指标测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        rng = np.random.default_rng(11)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 400)))
+        close[100:104] = close[99]
+        self.close = pd.Series(close)
+        self.high = self.close * (1 + rng.uniform(0, 0.02, 400))
+        self.low = self.close * (1 - rng.uniform(0, 0.02, 400))
+        self.volume = pd.Series(rng.integers(1000, 5000, 400).astype(float))
+
+    def _stream(self, indicator, *columns):
+        """逐根K线更新，返回每一步的结果"""
+        return [indicator.update(*bar) for bar in zip(*columns)]
+
+    def test_single_value_indicators_match_batch(self):
+        """测试逐根更新结果与 TechnicalIndicators 全量计算一致"""
+        # Arrange
+        cases = [
+            (StreamingEMA(12), (self.close,), TechnicalIndicators.calculate_ema(self.close, 12)),
+            (StreamingRSI(14), (self.close,), TechnicalIndicators.calculate_rsi(self.close)),
+            (StreamingATR(14), (self.high, self.low, self.close),
+             TechnicalIndicators.calculate_atr(self.high, self.low, self.close)),
+            (StreamingOBV(), (self.close, self.volume), TechnicalIndicators.calculate_obv(self.close, self.volume)),
+            (StreamingRollingMax(20), (self.high,), self.high.rolling(window=20).max()),
+            (StreamingRollingMin(20), (self.low,), self.low.rolling(window=20).min()),
+        ]
+
+        for indicator, columns, expected in cases:
+            # Act
+            result = self._stream(indicator, *columns)
+
+            # Assert
+            np.testing.assert_allclose(result, expected.to_numpy(), rtol=1e-9, equal_nan=True,
+                                       err_msg=type(indicator).__name__)
+
+    def test_band_indicators_match_batch(self):
+        """测试MACD与布林带逐根更新结果一致"""
+        # Arrange
+        macd = TechnicalIndicators.calculate_macd(self.close)
+        bands = TechnicalIndicators.calculate_bollinger_bands(self.close)
+
+        # Act
+        macd_stream = self._stream(StreamingMACD(), self.close)
+        band_stream = self._stream(StreamingBollinger(), self.close)
+
+        # Assert
+        for key in ('macd', 'signal', 'histogram'):
+            np.testing.assert_allclose([row[key] for row in macd_stream], macd[key].to_numpy(), rtol=1e-9)
+        for key in ('upper', 'middle', 'lower'):
+            np.testing.assert_allclose([row[key] for row in band_stream], bands[key].to_numpy(),
+                                       rtol=1e-9, equal_nan=True)
+
+    def test_restore_from_serialized_state(self):
+        """测试状态经 JSON 序列化恢复后继续更新与不中断的结果一致"""
+        # Arrange
+        split = 250
+        continuous = [StreamingRSI(), StreamingMACD(), StreamingBollinger(), StreamingRollingMax(20)]
+        for indicator in continuous:
+            self._stream(indicator, self.close)
+        partial = [StreamingRSI(), StreamingMACD(), StreamingBollinger(), StreamingRollingMax(20)]
+        for indicator in partial:
+            self._stream(indicator, self.close[:split])
+
+        # Act
+        restored = [restore_indicator(json.loads(json.dumps(ind.to_state()))) for ind in partial]
+        for indicator in restored:
+            self._stream(indicator, self.close[split:])
+
+        # Assert
+        for expected, actual in zip(continuous, restored):
+            assert type(actual) is type(expected)
+            assert actual.value == pytest.approx(expected.value, rel=1e-12)
+            assert not hasattr(actual, '__dict__')
+
+    def test_nan_state_is_strict_json(self):
+        """测试尚未得到结果的指标状态中 NaN 保存为 None，严格 JSON 序列化后可恢复"""
+        # Arrange
+        indicators = [StreamingEMA(5), StreamingMACD(), StreamingRSI(), StreamingATR()]
+        indicators[2].update(10.0)
+
+        # Act
+        payloads = [json.dumps(ind.to_state(), allow_nan=False) for ind in indicators]
+        restored = [restore_indicator(json.loads(payload)) for payload in payloads]
+
+        # Assert
+        assert json.loads(payloads[0])['value'] is None
+        assert np.isnan(restored[0].value)
+        assert np.isnan(restored[3].prev_close)
+        assert restored[2].prev_close == 10.0
+        assert restored[0].update(11.0) == indicators[0].update(11.0) == 11.0
+
+    def test_base_class_is_abstract(self):
+        """测试增量指标基类不能直接实例化"""
+        with pytest.raises(TypeError):
+            StreamingIndicator()
+
+    def test_missing_bar_is_skipped(self):
+        """测试NaN输入不改变状态"""
+        # Arrange
+        ema = StreamingEMA(3)
+        ema.update(10.0)
+        before = ema.update(12.0)
+
+        # Act
+        result = ema.update(float('nan'))
+
+        # Assert
+        assert result == before
+
+    def test_restore_rejects_mismatched_state(self):
+        """测试状态类型不符时抛出异常"""
+        # Arrange
+        state = StreamingEMA(5).to_state()
+
+        # Act & Assert
+        with pytest.raises(ValueError):
+            StreamingRSI.from_state(state)
+        with pytest.raises(ValueError):
+            restore_indicator({'indicator': 'Unknown'})
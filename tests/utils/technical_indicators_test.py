@@ -0,0 +1,111 @@
+"""
+TechnicalIndicators 批量计算单元测试
+"""
+import pytest
+import numpy as np
+import pandas as pd
+
+from app.utils.technical_indicators import TechnicalIndicators
+
+
+class TestTechnicalIndicatorsBatch:
+    """批量技术指标测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化：3只股票，上市日期不同且有停牌缺失"""
+        rng = np.random.default_rng(21)
+        index = pd.bdate_range('2020-01-01', periods=250)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (250, 3)), axis=0))
+        close[:60, 1] = np.nan
+        close[rng.random((250, 3)) < 0.05] = np.nan
+        self.close = pd.DataFrame(close, index=index, columns=['AAPL', 'MSFT', 'NVDA'])
+        self.high = self.close * 1.01
+        self.low = self.close * 0.99
+
+    def _per_symbol(self, func, *frames):
+        """逐只股票在各自的有效数据上调用单序列方法"""
+        columns = {}
+        for symbol in self.close.columns:
+            series = [frame[symbol].dropna() for frame in frames]
+            columns[symbol] = func(*series)
+        return columns
+
+    def _assert_matches(self, result, expected):
+        for symbol, values in expected.items():
+            np.testing.assert_allclose(
+                result[symbol].to_numpy(), values.reindex(self.close.index).to_numpy(),
+                rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=symbol
+            )
+
+    def test_single_output_indicators_match_per_symbol(self):
+        """测试RSI、ATR、CCI、动量与逐只股票计算一致"""
+        # Arrange
+        prices = (self.high, self.low, self.close)
+        cases = [
+            (TechnicalIndicators.calculate_rsi_batch(self.close),
+             self._per_symbol(TechnicalIndicators.calculate_rsi, self.close)),
+            (TechnicalIndicators.calculate_atr_batch(*prices),
+             self._per_symbol(TechnicalIndicators.calculate_atr, *prices)),
+            (TechnicalIndicators.calculate_cci_batch(*prices),
+             self._per_symbol(TechnicalIndicators.calculate_cci, *prices)),
+            (TechnicalIndicators.calculate_momentum_batch(self.close),
+             self._per_symbol(TechnicalIndicators.calculate_momentum, self.close)),
+        ]
+
+        # Act & Assert
+        for result, expected in cases:
+            assert isinstance(result, pd.DataFrame)
+            self._assert_matches(result, expected)
+
+    def test_multi_output_indicators_match_per_symbol(self):
+        """测试MACD、布林带、随机指标与逐只股票计算一致"""
+        # Arrange
+        prices = (self.high, self.low, self.close)
+        cases = [
+            (TechnicalIndicators.calculate_macd_batch(self.close),
+             self._per_symbol(TechnicalIndicators.calculate_macd, self.close)),
+            (TechnicalIndicators.calculate_bollinger_bands_batch(self.close),
+             self._per_symbol(TechnicalIndicators.calculate_bollinger_bands, self.close)),
+            (TechnicalIndicators.calculate_stochastic_batch(*prices),
+             self._per_symbol(TechnicalIndicators.calculate_stochastic, *prices)),
+        ]
+
+        # Act & Assert
+        for result, expected in cases:
+            for key in result:
+                self._assert_matches(result[key], {s: values[key] for s, values in expected.items()})
+
+    def test_cci_uses_exact_mean_deviation(self):
+        """测试CCI的平均偏差为每个窗口相对自身均值的平均绝对偏差"""
+        # Arrange
+        high, low, close = self.high['AAPL'], self.low['AAPL'], self.close['AAPL']
+        typical_price = (high + low + close) / 3
+        mean_deviation = typical_price.rolling(20).apply(lambda v: np.abs(v - v.mean()).mean(), raw=True)
+        expected = (typical_price - typical_price.rolling(20).mean()) / (0.015 * mean_deviation)
+
+        # Act
+        result = TechnicalIndicators.calculate_cci(high, low, close)
+
+        # Assert
+        assert result.index.equals(close.index)
+        np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-9, equal_nan=True)
+
+    def test_ndarray_input_returns_ndarray(self):
+        """测试 ndarray 输入返回同形状 ndarray，缺失位置为NaN"""
+        # Arrange
+        close = self.close.to_numpy()
+
+        # Act
+        rsi = TechnicalIndicators.calculate_rsi_batch(close)
+
+        # Assert
+        assert isinstance(rsi, np.ndarray)
+        assert rsi.shape == close.shape
+        assert np.isnan(rsi[np.isnan(close)]).all()
+        oversold_days = (rsi < 30).sum(axis=0)
+        assert oversold_days.shape == (3,)
+
+    def test_momentum_rejects_non_positive_period(self):
+        """测试动量周期小于1时报错"""
+        with pytest.raises(ValueError):
+            TechnicalIndicators.calculate_momentum_batch(self.close, period=0)
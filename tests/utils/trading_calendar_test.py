@@ -0,0 +1,83 @@
+"""
+TradingCalendar 单元测试
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from app.utils.trading_calendar import TradingCalendar
+from app.utils.date_utils import to_day_number, day_numbers_to_strings
+
+
+class TestTradingCalendar:
+    """交易日历测试类"""
+
+    def setup_method(self):
+        """每个测试方法前的初始化"""
+        self.cache_dir = tempfile.mkdtemp()
+        self.calendar = TradingCalendar(start_date='2020-01-01', end_date='2025-12-31', cache_dir=self.cache_dir)
+
+    def teardown_method(self):
+        """每个测试方法后清理目录"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_sessions_exclude_holidays(self):
+        """测试交易日排除周末、节假日与临时休市"""
+        # Act
+        days = np.array([to_day_number(d) for d in [
+            '2024-01-01', '2024-01-02', '2024-01-15', '2024-03-29', '2024-06-19',
+            '2024-07-04', '2024-11-28', '2024-12-25', '2025-01-09', '2024-01-06'
+        ]])
+
+        # Assert
+        assert self.calendar.is_session(days).tolist() == [
+            False, True, False, False, False, False, False, False, False, False
+        ]
+        year_2023 = self.calendar.sessions_in_range(to_day_number('2023-01-01'), to_day_number('2023-12-31'))
+        assert len(year_2023) == 250
+
+    def test_sessions_cached_on_disk(self):
+        """测试交易日生成后保存到磁盘并可直接加载"""
+        sessions = self.calendar.sessions
+
+        files = os.listdir(self.cache_dir)
+        reloaded = TradingCalendar(start_date='2020-01-01', end_date='2025-12-31', cache_dir=self.cache_dir)
+
+        assert len(files) == 1 and files[0].endswith('.npy')
+        assert sessions.dtype == np.int64
+        assert np.array_equal(reloaded.sessions, sessions)
+
+    def test_next_sessions_bulk(self):
+        """测试批量顺延到下一个交易日，超出范围为-1"""
+        days = np.array([to_day_number('2024-01-13'), to_day_number('2024-01-16'), to_day_number('2030-01-01')])
+
+        result = self.calendar.next_sessions(days)
+
+        assert day_numbers_to_strings(result[:2]) == ['2024-01-16', '2024-01-16']
+        assert result[2] == -1
+
+    def test_schedule_monthly_clamps_and_rolls(self):
+        """测试月度计划：超过月末取月末，遇休市顺延，顺延超出结束日期的丢弃"""
+        result = self.calendar.schedule_strings('2024-01-01', '2024-06-30', 'monthly', day_of_month=31)
+
+        # 2024-03-31 为周日顺延到 04-01；2024-06-30 为周日，顺延后超出结束日期
+        assert result == ['2024-01-31', '2024-02-29', '2024-04-01', '2024-04-30', '2024-05-31']
+
+    def test_schedule_weekly_and_daily(self):
+        """测试每周与每日计划"""
+        weekly = self.calendar.schedule_strings('2024-01-01', '2024-01-31', 'weekly')
+        daily = self.calendar.schedule('2024-01-01', '2024-01-31', 'daily')
+
+        assert weekly == ['2024-01-02', '2024-01-08', '2024-01-16', '2024-01-22', '2024-01-29']
+        assert len(daily) == 21
+        assert self.calendar.schedule('2024-01-01', '2024-01-31', 'hourly').size == 0
+
+    def test_period_codes(self):
+        """测试月/季/年周期编号"""
+        days = np.array([to_day_number(d) for d in ['2024-01-31', '2024-02-01', '2024-04-01', '2025-01-02']])
+
+        assert np.diff(TradingCalendar.period_codes(days, 'monthly')).tolist() == [1, 2, 9]
+        assert np.diff(TradingCalendar.period_codes(days, 'quarterly')).tolist() == [0, 1, 3]
+        assert np.diff(TradingCalendar.period_codes(days, 'yearly')).tolist() == [0, 0, 1]
+        assert TradingCalendar.period_codes(days, 'none') is None